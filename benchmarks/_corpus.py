@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+
+def _vocabulary(size: int, rng: np.random.Generator, lexicon: str) -> np.ndarray:
+    """
+    Builds a vocabulary of the LabMT words, so that the lexicon based stages find scored words,
+    padded with synthetic words, in a random Zipf rank order.
+    """
+    words = pd.read_csv(lexicon, usecols=["Word"], keep_default_na=False)["Word"]
+    words = words.astype(str).drop_duplicates().to_numpy(dtype=object)
+    if len(words) < size:
+        synthetic = np.array([f"w{i}" for i in range(size - len(words))], dtype=object)
+        words = np.concatenate([words, synthetic])
+    return rng.permutation(words)[:size]
+
+
+def zipf_corpus(
+    n_docs: int,
+    vocab_size: int = 30000,
+    exponent: float = 1.1,
+    mean_length: int = 30,
+    seed: int = 42,
+    lexicon: str = "src/viz/LABMT.csv",
+) -> list:
+    """
+    Generates a synthetic corpus whose word frequencies follow a Zipf law.
+
+    Word ranks are drawn by inverse transform sampling of a truncated Zipf distribution and document
+    lengths from a lognormal distribution, so a few documents are long enough to be split into
+    several sentiment chunks. The same arguments always give the same corpus.
+
+    Args:
+        n_docs (int): The number of documents.
+        vocab_size (int, optional): The number of word types. Defaults to 30000.
+        exponent (float, optional): The exponent of the Zipf law. Defaults to 1.1.
+        mean_length (int, optional): The mean number of words per document. Defaults to 30.
+        seed (int, optional): The seed of the random generator. Defaults to 42.
+        lexicon (str, optional): The LabMT csv the vocabulary is drawn from. Defaults to "src/viz/LABMT.csv".
+
+    Returns:
+        list: The documents.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = _vocabulary(vocab_size, rng, lexicon)
+
+    sigma = 0.8
+    mu = np.log(mean_length) - sigma**2 / 2
+    lengths = np.clip(rng.lognormal(mu, sigma, n_docs).astype(np.int64), 1, 1000)
+
+    cdf = np.cumsum(1.0 / np.arange(1, vocab_size + 1) ** exponent)
+    cdf /= cdf[-1]
+    ranks = np.searchsorted(cdf, rng.random(lengths.sum()))
+    ranks = np.minimum(ranks, vocab_size - 1)
+
+    words = vocabulary[ranks]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return [
+        " ".join(words[bounds[i] : bounds[i + 1]]) + "." for i in range(n_docs)
+    ]
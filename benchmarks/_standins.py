@@ -0,0 +1,162 @@
+from types import SimpleNamespace
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+class HashingEmbedder:
+    """
+    A CPU-only stand-in for a sentence transformer.
+
+    Hashes the words of each document into a sparse vector and projects it to a small dense
+    embedding with a fixed random matrix, so documents sharing words land close together.
+
+    Args:
+        dim (int, optional): The embedding dimension. Defaults to 64.
+        n_features (int, optional): The number of hashed word features. Defaults to 2**14.
+        seed (int, optional): The seed of the projection. Defaults to 42.
+    """
+
+    # number of documents hashed at a time
+    BATCH_SIZE = 10000
+
+    def __init__(self, dim: int = 64, n_features: int = 2**14, seed: int = 42):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.vectorizer = HashingVectorizer(n_features=n_features, norm="l2")
+        self.projection = (
+            np.random.default_rng(seed)
+            .standard_normal((n_features, dim))
+            .astype(np.float32)
+        )
+
+    def encode(self, documents: list, show_progress_bar: bool = False) -> np.ndarray:
+        embeddings = np.empty((len(documents), self.projection.shape[1]), dtype=np.float32)
+        for start in range(0, len(documents), self.BATCH_SIZE):
+            hashed = self.vectorizer.transform(documents[start : start + self.BATCH_SIZE])
+            embeddings[start : start + hashed.shape[0]] = hashed @ self.projection
+        return embeddings
+
+
+class WhitespaceTokenizer:
+    """
+    A fast tokenizer stand-in splitting on spaces and reporting character offsets.
+    """
+
+    is_fast = True
+
+    def __init__(self, model_max_length: int = 128):
+        self.model_max_length = model_max_length
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+    def __call__(self, texts, return_offsets_mapping=False, **kwargs):
+        input_ids, offsets = [], []
+        for text in texts:
+            spans, position = [], 0
+            for word in text.split(" "):
+                if word:
+                    spans.append((position, position + len(word)))
+                position += len(word) + 1
+            input_ids.append(list(range(len(spans))))
+            offsets.append(spans)
+        encoded = {"input_ids": input_ids}
+        if return_offsets_mapping:
+            encoded["offset_mapping"] = offsets
+        return encoded
+
+
+class LexiconSentimentPipeline:
+    """
+    A text classification pipeline stand-in scoring a text by the mean LabMT happiness of its words.
+
+    Args:
+        lexicon (str, optional): The LabMT csv. Defaults to "src/viz/LABMT.csv".
+    """
+
+    def __init__(self, lexicon: str = "src/viz/LABMT.csv"):
+        labmt = pd.read_csv(lexicon, keep_default_na=False)
+        self.scores = dict(zip(labmt["Word"].astype(str), labmt["Happiness Score"] / 9))
+        self.tokenizer = WhitespaceTokenizer()
+        self.model = SimpleNamespace(
+            config=SimpleNamespace(_name_or_path="benchmark/labmt-standin")
+        )
+
+    def __call__(self, texts, batch_size=1, truncation=True):
+        results = []
+        for text in texts:
+            scores = [self.scores.get(word, 0.5) for word in text.split()]
+            score = sum(scores) / len(scores) if scores else 0.5
+            label = "POSITIVE" if score >= 0.5 else "NEGATIVE"
+            results.append({"label": label, "score": score})
+        return results
+
+
+class StandInTopicModel:
+    """
+    A CPU-only stand-in for BERTopic exposing the attributes and methods TopicDriver uses.
+
+    Reduces the embeddings with PCA, clusters them with mini-batch k-means and describes every topic
+    by the top words of its class-based TF-IDF, like BERTopic does with UMAP and HDBSCAN.
+
+    Args:
+        n_topics (int, optional): The number of clusters. Defaults to 20.
+        n_components (int, optional): The dimension of the reduction. Defaults to 5.
+        top_n_words (int, optional): The number of words describing a topic. Defaults to 10.
+        seed (int, optional): The seed of the reduction and the clustering. Defaults to 42.
+    """
+
+    def __init__(
+        self,
+        n_topics: int = 20,
+        n_components: int = 5,
+        top_n_words: int = 10,
+        seed: int = 42,
+    ):
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.decomposition import PCA
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        self.umap_model = PCA(n_components=n_components, random_state=seed)
+        self.hdbscan_model = MiniBatchKMeans(
+            n_clusters=n_topics, n_init=1, random_state=seed
+        )
+        self.vectorizer_model = CountVectorizer(max_features=20000)
+        self.top_n_words = top_n_words
+        self.topic_representations_ = {}
+
+    def fit_transform(self, documents: list, embeddings: np.ndarray = None):
+        from scipy.sparse import csr_matrix
+
+        reduced = self.umap_model.fit_transform(embeddings)
+        topics = self.hdbscan_model.fit_predict(reduced)
+
+        counts = self.vectorizer_model.fit_transform(documents)
+        n_topics = topics.max() + 1
+        membership = csr_matrix(
+            (np.ones(len(topics)), (topics, np.arange(len(topics)))),
+            shape=(n_topics, len(topics)),
+        )
+        tf = (membership @ counts).toarray()
+        tf /= np.maximum(tf.sum(axis=1, keepdims=True), 1)
+        idf = np.log(1 + tf.sum(axis=1).mean() / np.maximum(tf.sum(axis=0), 1e-12))
+        ctfidf = tf * idf
+
+        words = self.vectorizer_model.get_feature_names_out()
+        for topic in range(n_topics):
+            top = np.argsort(-ctfidf[topic])[: self.top_n_words]
+            self.topic_representations_[topic] = [
+                (words[i], float(ctfidf[topic, i])) for i in top
+            ]
+
+        return topics.tolist(), None
+
+    def get_topic(self, topic: int):
+        return self.topic_representations_.get(topic, False)
+
+    def save(self, path: str, serialization: str = "safetensors", **kwargs):
+        os.makedirs(path, exist_ok=True)
+        with open(f"{path}/topics.json", "w") as f:
+            json.dump(self.topic_representations_, f)
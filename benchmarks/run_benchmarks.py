@@ -0,0 +1,358 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# run from the repository root, like main.py
+cwd = os.getcwd()
+sys.path.append(cwd)
+sys.path.append(os.path.join(cwd, "src"))
+
+from benchmarks._corpus import zipf_corpus
+from benchmarks._standins import (
+    HashingEmbedder,
+    LexiconSentimentPipeline,
+    StandInTopicModel,
+)
+from src.drivers._tm_driver import TopicDriver
+from src.util._formatter import DataFormatter
+from src.util._profiler import StageProfiler
+from src.util._sentiment import SentimentScorer
+from util._session import Session
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+
+# stages faster than this in the baseline are too noisy to flag
+MIN_SECONDS = 0.05
+
+
+class BenchmarkDriver(TopicDriver):
+    """
+    A TopicDriver scoring sentiment with the lexicon stand-in instead of a Huggingface pipeline.
+    """
+
+    def _build_sentiment_scorer(self):
+        return SentimentScorer(
+            batch_size=self.session.sentiment_batch_size,
+            sentiment_pipeline=LexiconSentimentPipeline(),
+            workers=self.session.sentiment_workers,
+        )
+
+
+def _num_topics(n_docs: int) -> int:
+    return int(min(100, max(10, n_docs**0.5 / 5)))
+
+
+def run_size(
+    n_docs: int, seed: int = 42, sentiment_workers: int = 1, render_workers: int = 1
+) -> dict:
+    """
+    Runs every stage of a topic model run over a synthetic corpus with the stand-in models.
+
+    Args:
+        n_docs (int): The number of documents.
+        seed (int, optional): The seed of the corpus. Defaults to 42.
+        sentiment_workers (int, optional): The number of sentiment worker processes. Defaults to 1.
+        render_workers (int, optional): The number of word shift rendering processes. Defaults to 1.
+
+    Returns:
+        dict: The stage records of the StageProfiler, the peak memory and the stages that were skipped.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+    profiler = StageProfiler()
+    with profiler.stage("generate", n_docs):
+        documents = zipf_corpus(n_docs, seed=seed)
+
+    session = Session(data=documents)
+    session.cache_dir = None
+    session.sentiment_workers = sentiment_workers
+    session.render_workers = render_workers
+    factory = session.topic_model_factory
+    factory.embedding_model = HashingEmbedder(seed=seed)
+    factory.embedding_model_name = "benchmark/hashing-standin"
+
+    driver = BenchmarkDriver(session)
+    # the driver records its stages into the same profiler
+    driver.profiler = profiler
+    model = StandInTopicModel(n_topics=_num_topics(n_docs), seed=seed)
+    directory = tempfile.mkdtemp(prefix="bertcli-benchmark-")
+    skipped = []
+
+    try:
+        topics = driver._fit_model(model)
+        driver._process_save_dir_choice(model, f"save_dir {directory}", topics)
+
+        with profiler.stage("formatter", n_docs):
+            DataFormatter().zipf_data_to_dataframe(documents)
+
+        try:
+            from src.viz._tm_viz import _visualize_word_shifts
+        except ImportError as e:
+            skipped.append({"stage": "word_shifts", "reason": str(e)})
+        else:
+            with profiler.stage("word_shifts", len(set(topics))):
+                _visualize_word_shifts(session, directory)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "documents": n_docs,
+        "topics": len(set(topics)),
+        "total_wall_seconds": sum(s["wall_seconds"] for s in profiler.stages),
+        "peak_rss_mb": max(s["peak_rss_mb"] for s in profiler.stages),
+        "stages": profiler.stages,
+        "skipped": skipped,
+    }
+
+
+def run_benchmarks(sizes: list, seed: int = 42, **kwargs) -> dict:
+    """
+    Runs every size in a fresh process, so the peak memory of a size does not carry over.
+
+    Args:
+        sizes (list): The corpus sizes.
+        seed (int, optional): The seed of the corpora. Defaults to 42.
+        **kwargs: Worker counts passed to run_size.
+
+    Returns:
+        dict: The machine description and the results of every size.
+    """
+    results = []
+    for n_docs in sizes:
+        print(f"Benchmarking {n_docs} documents")
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            results.append(pool.submit(run_size, n_docs, seed, **kwargs).result())
+
+    return {
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float = 0.25) -> list:
+    """
+    Compares a report against a baseline.
+
+    A stage regresses when its throughput drops by more than the threshold or when it no longer
+    runs, and a size regresses when its peak memory grows by more than the threshold. Only sizes
+    present in both are compared.
+
+    Args:
+        report (dict): The report of run_benchmarks.
+        baseline (dict): An earlier report.
+        threshold (float, optional): The tolerated relative slowdown or memory growth. Defaults to 0.25.
+
+    Returns:
+        list: A description of every regression.
+    """
+    base_runs = {r["documents"]: r for r in baseline["results"]}
+    regressions = []
+
+    for result in report["results"]:
+        base = base_runs.get(result["documents"])
+        if base is None:
+            continue
+        base_stages = {s["stage"]: s for s in base["stages"]}
+
+        for stage in result["stages"]:
+            old = base_stages.get(stage["stage"])
+            if old is None or old["wall_seconds"] < MIN_SECONDS:
+                continue
+            if old["items_per_second"] and stage["items_per_second"]:
+                slowdown = old["items_per_second"] / stage["items_per_second"] - 1
+            else:
+                slowdown = stage["wall_seconds"] / old["wall_seconds"] - 1
+            if slowdown > threshold:
+                regressions.append(
+                    f"{stage['stage']} at {result['documents']} documents is {slowdown:.0%} slower"
+                )
+
+        # a stage that ran in the baseline but not now, e.g. word_shifts without shifterator
+        ran = {stage["stage"] for stage in result["stages"]}
+        for name in base_stages:
+            if name not in ran:
+                regressions.append(
+                    f"{name} at {result['documents']} documents did not run"
+                )
+
+        growth = result["peak_rss_mb"] / base["peak_rss_mb"] - 1
+        if growth > threshold:
+            regressions.append(
+                f"peak memory at {result['documents']} documents grew {growth:.0%}"
+            )
+
+    return regressions
+
+
+def print_report(report: dict):
+    """
+    Prints the throughput of every stage and the peak memory of every size.
+    """
+    sizes = [r["documents"] for r in report["results"]]
+    stages = []
+    for result in report["results"]:
+        for stage in result["stages"]:
+            if stage["stage"] not in stages:
+                stages.append(stage["stage"])
+
+    print(f"\n{'items/s':<18}" + "".join(f"{n:>14}" for n in sizes))
+    for name in stages:
+        row = f"{name:<18}"
+        for result in report["results"]:
+            stage = next((s for s in result["stages"] if s["stage"] == name), None)
+            if stage is None or stage["items_per_second"] is None:
+                row += f"{'-':>14}"
+            else:
+                row += f"{stage['items_per_second']:>14.1f}"
+        print(row)
+    print(
+        f"{'peak rss (MB)':<18}"
+        + "".join(f"{r['peak_rss_mb']:>14.1f}" for r in report["results"])
+    )
+    print(
+        f"{'total (s)':<18}"
+        + "".join(f"{r['total_wall_seconds']:>14.2f}" for r in report["results"])
+    )
+
+    for result in report["results"]:
+        for skipped in result["skipped"]:
+            print(
+                f"Skipped {skipped['stage']} at {result['documents']} documents: {skipped['reason']}"
+            )
+
+
+def plot_curves(report: dict, path: str):
+    """
+    Plots the throughput of every stage and the peak memory against the corpus size.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    sizes = [r["documents"] for r in report["results"]]
+    fig, (throughput, memory) = plt.subplots(1, 2, figsize=(14, 6))
+
+    curves = {}
+    for result in report["results"]:
+        for stage in result["stages"]:
+            if stage["items_per_second"]:
+                curves.setdefault(stage["stage"], []).append(
+                    (result["documents"], stage["items_per_second"])
+                )
+    for name, points in curves.items():
+        throughput.plot(*zip(*points), marker="o", label=name)
+    throughput.set_xscale("log")
+    throughput.set_yscale("log")
+    throughput.set_xlabel("documents")
+    throughput.set_ylabel("items/s")
+    throughput.set_title("Throughput")
+    throughput.legend(fontsize="small")
+
+    memory.plot(sizes, [r["peak_rss_mb"] for r in report["results"]], marker="o")
+    memory.set_xscale("log")
+    memory.set_xlabel("documents")
+    memory.set_ylabel("peak rss (MB)")
+    memory.set_title("Memory")
+
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the topic model stages on synthetic corpora"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=str,
+        default=",".join(str(n) for n in SIZES),
+        help="Comma separated corpus sizes",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the corpora")
+    parser.add_argument(
+        "--save_dir",
+        type=str,
+        default="benchmarks/output",
+        help="Directory of the report and the curves",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=DEFAULT_BASELINE,
+        help="Baseline report to compare against",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Tolerated relative slowdown or memory growth",
+    )
+    parser.add_argument(
+        "--save_baseline",
+        action="store_true",
+        help="Store this run as the baseline instead of comparing against it",
+    )
+    parser.add_argument(
+        "--sentiment_workers", type=int, default=1, help="Sentiment worker processes"
+    )
+    parser.add_argument(
+        "--render_workers", type=int, default=1, help="Word shift rendering processes"
+    )
+    args = parser.parse_args()
+
+    sizes = [int(n) for n in args.sizes.split(",")]
+    report = run_benchmarks(
+        sizes,
+        args.seed,
+        sentiment_workers=args.sentiment_workers,
+        render_workers=args.render_workers,
+    )
+
+    os.makedirs(args.save_dir, exist_ok=True)
+    with open(f"{args.save_dir}/benchmark.json", "w") as f:
+        json.dump(report, f, indent=4)
+    plot_curves(report, f"{args.save_dir}/benchmark_curves.png")
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if not os.path.isfile(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save_baseline to store one")
+        return
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -45,6 +45,159 @@ def main():
         "--sentiment", type=str, help="llm to generate sentiment analysis"
     )
 
+    parser.add_argument(
+        "--sentiment_batch_size", type=int, help="Number of text chunks per sentiment forward pass"
+    )
+
+    parser.add_argument(
+        "--sentiment_workers",
+        type=int,
+        help="Number of sentiment worker processes, each loading its own copy of the sentiment model",
+    )
+
+    parser.add_argument(
+        "--render_workers", type=int, help="Number of processes rendering per-topic figures"
+    )
+
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        help="Directory of the persistent caches, also caching fitted reducers; only use a directory you trust, reducers are unpickled from it",
+    )
+
+    parser.add_argument(
+        "--cache_max_gb",
+        type=float,
+        help="Evict the least recently used embeddings and reductions of the cache beyond this size",
+    )
+
+    parser.add_argument(
+        "--projection",
+        type=str,
+        choices=["auto", "umap", "knn", "reduced", "pca", "random"],
+        help="How to compute the 2d document layout",
+    )
+
+    parser.add_argument(
+        "--dedup",
+        type=str,
+        choices=["exact", "near"],
+        help="Model one representative per group of exact or near duplicate documents",
+    )
+
+    parser.add_argument(
+        "--sweep",
+        type=str,
+        help="Grid JSON file or ';' separated sequences to run in one process, sharing embeddings and reductions",
+    )
+
+    parser.add_argument(
+        "--recluster",
+        type=str,
+        help="Run directory to cluster again with the hdbscan_model of --tmconfig, reusing its cached reduction",
+    )
+
+    parser.add_argument(
+        "--infer",
+        type=str,
+        help="Model directory of an earlier run (<save_dir>/model) to label --data with, without refitting",
+    )
+
+    parser.add_argument(
+        "--serve",
+        type=str,
+        help="Model directory of an earlier run (<save_dir>/model) to serve topic and sentiment labels from",
+    )
+
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Host the server listens on"
+    )
+
+    parser.add_argument(
+        "--port", type=int, default=8000, help="TCP port the server listens on"
+    )
+
+    parser.add_argument(
+        "--socket", type=str, help="Unix socket the server listens on as well"
+    )
+
+    parser.add_argument(
+        "--max_batch_size",
+        type=int,
+        help="Number of documents that closes a micro batch of the server",
+    )
+
+    parser.add_argument(
+        "--max_latency_ms",
+        type=float,
+        help="How long a server request waits for its micro batch to fill",
+    )
+
+    parser.add_argument(
+        "--online",
+        action="store_true",
+        help="Fit the topic model batch by batch over --data with partial_fit, checkpointing as it goes",
+    )
+
+    parser.add_argument(
+        "--resume",
+        type=str,
+        help="Checkpoint of an online run (<save_dir>/checkpoint) to continue from or to update with --data",
+    )
+
+    parser.add_argument(
+        "--shard",
+        type=str,
+        choices=["split", "fit", "merge", "local"],
+        help="Phase of a sharded run: split --data into shards, fit one shard, merge the shard models, or local to run them all here",
+    )
+
+    parser.add_argument(
+        "--num_shards", type=int, help="Number of shards --shard=split divides --data into"
+    )
+
+    parser.add_argument(
+        "--shard_index",
+        type=int,
+        help="Shard fitted by --shard=fit, defaults to $SLURM_ARRAY_TASK_ID",
+    )
+
+    parser.add_argument(
+        "--query",
+        type=str,
+        help="Output directory of an earlier run to find the documents most similar to --text in",
+    )
+
+    parser.add_argument(
+        "--text",
+        type=str,
+        action="append",
+        help="Query text of --query, repeat it to run several queries",
+    )
+
+    parser.add_argument(
+        "--top_k", type=int, help="Number of similar documents returned per query"
+    )
+
+    parser.add_argument(
+        "--topic",
+        type=int,
+        help="Only return similar documents with this label of labeled_corpus.csv",
+    )
+
+    parser.add_argument(
+        "--output_format",
+        type=str,
+        choices=["csv", "parquet"],
+        help="Write the labeled corpus of a run as csv (default) or as parquet with dictionary encoded topic labels",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Dump a cProfile of every stage of a run next to run_profile.json, and print the timings of each stage",
+    )
+
     args = parser.parse_args()
 
     num_samples = args.num_samples if args.num_samples else 0
@@ -53,7 +206,7 @@ def main():
 
     sentiment = args.sentiment if args.sentiment else ''
 
-    cli = LNLPCLI(sentiment=sentiment, save_dir=args.save_dir, global_data_path=args.data, global_tm_config_path=args.tmconfig, global_ft_config_path=args.ftconfig, sequence=sequence, num_samples=num_samples)
+    cli = LNLPCLI(sentiment=sentiment, save_dir=args.save_dir, global_data_path=args.data, global_tm_config_path=args.tmconfig, global_ft_config_path=args.ftconfig, sequence=sequence, num_samples=num_samples, cache_dir=args.cache_dir, cache_max_gb=args.cache_max_gb, projection=args.projection, sentiment_batch_size=args.sentiment_batch_size, sentiment_workers=args.sentiment_workers, render_workers=args.render_workers, dedup=args.dedup, sweep=args.sweep, recluster=args.recluster, profile=args.profile, infer=args.infer, serve=args.serve, host=args.host, port=args.port, socket_path=args.socket, max_batch_size=args.max_batch_size, max_latency_ms=args.max_latency_ms, online=args.online, resume=args.resume, shard=args.shard, num_shards=args.num_shards, shard_index=args.shard_index, query=args.query, texts=args.text, top_k=args.top_k, topic=args.topic, output_format=args.output_format)
 
     cli.run()
 
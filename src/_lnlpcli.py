@@ -2,17 +2,38 @@ from src.drivers._driver import Driver
 from src.drivers._global_driver import GlobalDriver
 from src.drivers._tm_driver import TopicDriver
 from src.drivers._tu_driver import TunerDriver
+from src.drivers._sweep_driver import SweepDriver
+from src.drivers._inference_driver import InferenceDriver
+from src.drivers._serve_driver import ServeDriver
+from src.drivers._online_driver import OnlineDriver
+from src.drivers._shard_driver import ShardDriver
+from src.drivers._query_driver import QueryDriver
+from src.loading._dataloader import DataLoader
 from src.menus._menu import Menu
 from src.menus._landing import Landing
 from src.menus.topic._topic import TopicMenu
 from src.menus.finetune._finetune import FineTuneMenu
 from src.obj._finetuner import FineTuner
-from bertopic import BERTopic
+from src.util._cache import prune_cache
+from util._session import Session
 import datetime
+import json
+import sys
 import traceback
 from math import floor
 
 
+def _is_topic_model(obj) -> bool:
+    """
+    Check whether a menu returned a topic model, without importing bertopic.
+
+    bertopic is only imported once a topic model is built, so a BERTopic instance implies it is
+    already in sys.modules.
+    """
+    bertopic = sys.modules.get("bertopic")
+    return bertopic is not None and isinstance(obj, bertopic.BERTopic)
+
+
 class LNLPCLI:
     """
     The LNLPCLI class represents the command-line interface for the LNLP (Language and Natural Language Processing) system.
@@ -24,6 +45,33 @@ class LNLPCLI:
         global_optmization_path (str): The path to the global optimization file. Default is None.
         num_samples (int): The number of samples to use for optimization. Default is 0.
         debug (bool): Flag indicating whether to run in debug mode. Default is False.
+        cache_dir (str): The root directory of the persistent caches, which also enables the reduction cache. It must be trusted, fitted reducers are unpickled from it. Default is None.
+        cache_max_gb (float): Evict the least recently used entries of the cache beyond this size. Default is None.
+        projection (str): The mode used for the 2d document layout. Default is None.
+        sentiment_batch_size (int): The number of text chunks per sentiment forward pass. Default is None.
+        sentiment_workers (int): The number of sentiment worker processes, each loading its own copy of the model. Default is None.
+        render_workers (int): The number of processes rendering per-topic figures. Default is None.
+        dedup (str): Collapse "exact" or "near" duplicate documents before modeling. Default is None.
+        sweep (str): A grid JSON file or ";" separated sequences to run in one process. Default is None.
+        recluster (str): A run directory to cluster again with the clustering of the topic model config. Default is None.
+        profile (bool): Dump a cProfile of every stage of a run. Default is False.
+        infer (str): The model directory of an earlier run to label the data file with, without refitting. Default is None.
+        serve (str): The model directory of an earlier run to serve topic and sentiment labels from. Default is None.
+        host (str): The host the server listens on. Default is "127.0.0.1".
+        port (int): The TCP port the server listens on. Default is 8000.
+        socket_path (str): A Unix socket the server listens on as well. Default is None.
+        max_batch_size (int): The number of documents that closes a micro batch of the server. Default is None.
+        max_latency_ms (float): How long a server request waits for its micro batch to fill. Default is None.
+        online (bool): Fit the topic model batch by batch over the streamed data file. Default is False.
+        resume (str): A checkpoint of an online run to continue from, or to update with new data. Default is None.
+        shard (str): The phase of a sharded run, "split", "fit", "merge" or "local" for all of them. Default is None.
+        num_shards (int): The number of shards a sharded run splits the data file into. Default is None.
+        shard_index (int): The shard to fit, defaulting to the SLURM array task id. Default is None.
+        query (str): The output directory of a run to find documents similar to the query texts in. Default is None.
+        texts (list): The query texts. Default is None.
+        top_k (int): The number of similar documents returned per query. Default is None.
+        topic (int): Only return similar documents of this label of labeled_corpus.csv. Default is None.
+        output_format (str): Write the labeled corpus of a run as "csv" or "parquet". Default is None.
     """
 
     def __init__(
@@ -36,6 +84,33 @@ class LNLPCLI:
         debug: bool = False,
         sequence: str = "",
         sentiment="",
+        cache_dir: str = None,
+        cache_max_gb: float = None,
+        projection: str = None,
+        sentiment_batch_size: int = None,
+        sentiment_workers: int = None,
+        render_workers: int = None,
+        dedup: str = None,
+        sweep: str = None,
+        recluster: str = None,
+        profile: bool = False,
+        infer: str = None,
+        serve: str = None,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        socket_path: str = None,
+        max_batch_size: int = None,
+        max_latency_ms: float = None,
+        online: bool = False,
+        resume: str = None,
+        shard: str = None,
+        num_shards: int = None,
+        shard_index: int = None,
+        query: str = None,
+        texts: list = None,
+        top_k: int = None,
+        topic: int = None,
+        output_format: str = None,
     ):
         self.debug = debug
         self.global_data_path = global_data_path
@@ -45,30 +120,106 @@ class LNLPCLI:
         self.save_dir = save_dir
         self.sequence = sequence
         self.sentiment = sentiment
+        self.sweep = sweep
+        self.recluster = recluster
+        self.infer = infer
+        self.serve = serve
+        self.serve_options = {
+            "host": host,
+            "port": port,
+            "socket_path": socket_path,
+            "max_batch_size": max_batch_size,
+            "max_latency_ms": max_latency_ms,
+        }
+        self.online = online or resume is not None
+        self.resume = resume
+        self.shard = shard
+        self.num_shards = num_shards
+        self.shard_index = shard_index
+        self.query = query
+        self.query_options = {"queries": texts or [], "top_k": top_k, "topic": topic}
 
         print("\nWelcome to the LNLP CLI!")
 
         self.global_driver = GlobalDriver()
 
-        self.global_session = self.global_driver.initialize_session(
-            data_path=self.global_data_path,
-            config_path=self.global_tm_config_path,
-            ft_config_path=self.global_ft_config_path,
-            num_samples=self.num_samples,
-            save_dir=self.save_dir,
-        )
+        if (
+            self.infer is None
+            and self.serve is None
+            and not self.online
+            and self.shard is None
+            and self.query is None
+        ):
+            self.global_session = self.global_driver.initialize_session(
+                data_path=self.global_data_path,
+                config_path=self.global_tm_config_path,
+                ft_config_path=self.global_ft_config_path,
+                num_samples=self.num_samples,
+                save_dir=self.save_dir,
+            )
+        else:
+            # inference, online and sharded runs stream the data file themselves, and serving
+            # and queries read requests, instead of loading a data file into the session
+            self.global_session = Session(
+                save_dir=self.save_dir or "", data_path=self.global_data_path
+            )
+            if self.global_tm_config_path is not None:
+                self.global_session.config_topic_model = DataLoader()._load_config(
+                    self.global_tm_config_path
+                )
+            self.global_driver.session = self.global_session
 
         self.global_session.sentiment = self.sentiment
+        if cache_dir is not None:
+            self.global_session.cache_dir = cache_dir
+            self.global_session.cache_reductions = True
+        if cache_max_gb is not None and self.global_session.cache_dir:
+            prune_cache(self.global_session.cache_dir, int(cache_max_gb * 2**30))
+        if projection is not None:
+            self.global_session.projection_mode = projection
+        if sentiment_batch_size is not None:
+            self.global_session.sentiment_batch_size = sentiment_batch_size
+        if sentiment_workers is not None:
+            self.global_session.sentiment_workers = sentiment_workers
+        if render_workers is not None:
+            self.global_session.render_workers = render_workers
+        if dedup is not None:
+            self.global_session.deduplicate(dedup)
+        self.global_session.profile = profile
+        if output_format is not None:
+            self.global_session.output_format = output_format
 
         self.tm_driver = TopicDriver(session=self.global_session)
         self.tu_driver = TunerDriver(session=self.global_session)
+        self.sweep_driver = SweepDriver(session=self.global_session)
+        self.inference_driver = InferenceDriver(session=self.global_session)
+        self.serve_driver = ServeDriver(session=self.global_session)
+        self.online_driver = OnlineDriver(session=self.global_session)
+        self.shard_driver = ShardDriver(session=self.global_session)
+        self.query_driver = QueryDriver(session=self.global_session)
 
     def run(self):
         """
         Run the LNLPCLI command-line interface.
         """
         try:
-            if self.sequence != "":
+            if self.query:
+                self.query_driver.query(self.query, **self.query_options)
+            elif self.shard:
+                self.shard_driver.run_phase(
+                    self.shard, self.save_dir, self.num_shards, self.shard_index
+                )
+            elif self.online:
+                self.online_driver.run_online(directory=self.save_dir, resume=self.resume)
+            elif self.serve:
+                self.serve_driver.serve(self.serve, **self.serve_options)
+            elif self.infer:
+                self.inference_driver.infer(self.infer, directory=self.save_dir)
+            elif self.recluster:
+                self.tm_driver.recluster(self.recluster, self.save_dir)
+            elif self.sweep:
+                self._process_sweep(self.sweep)
+            elif self.sequence != "":
                 self._process_sequence(self.sequence)
             else:
                 self.landing = Landing(session=self.global_driver.session)
@@ -116,7 +267,7 @@ class LNLPCLI:
 
             self._process_responses(response, driver)
 
-        elif isinstance(response, BERTopic):
+        elif _is_topic_model(response):
             if self.global_session.config_topic_model != {}:
                 self.tm_driver.run_topic_model(from_file=True)
             else:
@@ -159,6 +310,64 @@ class LNLPCLI:
 
         self.global_driver.log("data", {"Topic": self.save_dir})
 
+        choice = self._replay_sequence(sequence)
+
+        if _is_topic_model(choice):
+            if self.global_session.config_topic_model != {}:
+                self.tm_driver.run_topic_model(from_file=True)
+            else:
+                self.tm_driver.run_topic_model()
+
+        elif isinstance(choice, FineTuner):
+            if self.global_session.config_fine_tune != {}:
+                self.tu_driver.run_tuner(from_file=True)
+            else:
+                self.tu_driver.run_tuner()
+
+    def _process_sweep(self, sweep: str):
+        """
+        Run a sweep of topic models in one process, sharing embeddings and reductions.
+
+        Args:
+            sweep (str): The path of a grid JSON file, or ";" separated sequences.
+
+        Example:
+            sweep = '1,11,21,31,9;1,11,22,31,9;1,12,21,31,9'
+                Every sequence ending in "Run Topic Model" is fitted and saved to output/<sequence>.
+
+            python main.py --sweep='1,11,21,31,9;1,11,22,31,9'
+            python main.py --sweep=grid.json
+        """
+        if self.save_dir is None:
+            self.save_dir = "output"
+
+        if sweep.endswith(".json"):
+            with open(sweep, "r") as f:
+                grid = json.load(f)
+            self.sweep_driver.run_grid(grid, self.save_dir)
+            return
+
+        sequences = [s.strip() for s in sweep.split(";") if s.strip() != ""]
+
+        for i, sequence in enumerate(sequences):
+            print(f"Sweep {i + 1}/{len(sequences)}: {sequence}")
+            # every sequence starts from a clean set of menu choices
+            self.global_session.logs["data"] = []
+            choice = self._replay_sequence(sequence)
+
+            if _is_topic_model(choice):
+                self.sweep_driver.run_model(choice, f"{self.save_dir}/{sequence}")
+
+    def _replay_sequence(self, sequence: str):
+        """
+        Replay a sequence of menu choices and return the final choice.
+
+        Args:
+            sequence (str): The comma separated sequence of choices.
+
+        Returns:
+            The final menu, or the built topic model or tuner.
+        """
         sequence = sequence.split(",")
 
         sequence = [int(x) for x in sequence]
@@ -191,14 +400,4 @@ class LNLPCLI:
             else:
                 choice = choice.handle_choice(s)
 
-        if isinstance(choice, BERTopic):
-            if self.global_session.config_topic_model != {}:
-                self.tm_driver.run_topic_model(from_file=True)
-            else:
-                self.tm_driver.run_topic_model()
-
-        elif isinstance(choice, FineTuner):
-            if self.global_session.config_fine_tune != {}:
-                self.tu_driver.run_tuner(from_file=True)
-            else:
-                self.tu_driver.run_tuner()
+        return choice
@@ -1,41 +1,125 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import TYPE_CHECKING
+
 import pandas as pd
+import numpy as np
 
-from umap import UMAP
-from sklearn.decomposition import PCA, TruncatedSVD, FastICA
-
-from hdbscan import HDBSCAN
-from sklearn.cluster import (
-    KMeans,
-    SpectralClustering,
-    DBSCAN,
-    AgglomerativeClustering,
-    Birch,
-    AffinityPropagation,
-    MeanShift,
-)
-from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import CountVectorizer
-from transformers import pipeline
+# the model backends (umap, hdbscan, sentence_transformers, transformers, bertopic) are imported
+# when a model is built, so that starting the CLI does not load them
 
 # set TOKENIZERS_PARALLELISM to False to avoid issues with transformers
-import os
-
 os.environ["TOKENIZERS_PARALLELISM"] = "False"
 
-from bertopic import BERTopic
-from bertopic.vectorizers import ClassTfidfTransformer
+from src.util._cache import EmbeddingCache, ReductionCache
+
+if TYPE_CHECKING:
+    from bertopic import BERTopic
+
+
+class PrecomputedReducer:
+    """
+    Wraps a dimensionality reduction model whose output on the training embeddings is already known.
+
+    Lets several topic models share one reduction: fitting is a no-op and transforming the training
+    embeddings returns the stored reduction, while other inputs go through the wrapped model.
+
+    Args:
+        reducer: The fitted dimensionality reduction model.
+        embeddings (np.ndarray): The embeddings the reducer was fitted on.
+        reduced (np.ndarray): The reduced training embeddings.
+        key (str, optional): The reduction cache key of the stored reduction.
+
+    Methods:
+        fit_reducer: Fits a reducer once and wraps it with its output.
+        fit: Does nothing, the reducer is already fitted.
+        transform: Returns the stored reduction for the training embeddings.
+    """
+
+    def __init__(
+        self, reducer, embeddings: np.ndarray, reduced: np.ndarray, key: str = None
+    ):
+        self.reducer = reducer
+        self.embeddings = embeddings
+        self.reduced = reduced
+        # the reduction cache key of the stored reduction, if it is cached
+        self.key = key
+
+    @classmethod
+    def fit_reducer(cls, reducer, embeddings: np.ndarray):
+        """
+        Fits a reducer once and wraps it with its output.
+
+        Args:
+            reducer: The dimensionality reduction model to fit.
+            embeddings (np.ndarray): The training embeddings.
+
+        Returns:
+            PrecomputedReducer: The wrapped reducer.
+        """
+        if isinstance(reducer, cls):
+            reducer = reducer.reducer
+        reduced = np.asarray(reducer.fit_transform(embeddings))
+        return cls(reducer, embeddings, reduced)
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        if X is self.embeddings or (
+            np.shape(X) == self.embeddings.shape and np.array_equal(X, self.embeddings)
+        ):
+            return self.reduced
+        return self.reducer.transform(X)
+
+    def __getattr__(self, name):
+        # expose the fitted attributes of the wrapped model, e.g. embedding_
+        if name == "reducer":
+            raise AttributeError(name)
+        return getattr(self.reducer, name)
+
+
+class CachedReducer(PrecomputedReducer):
+    """
+    Wraps a dimensionality reduction model with the persistent reduction cache.
+
+    Fitting looks the (embeddings, reducer config) pair up in the cache and only runs the reducer on
+    a miss, so a topic model that changes only its clustering goes straight to clustering.
+
+    Args:
+        reducer: The dimensionality reduction model to fit.
+        cache_dir (str): The root directory of the cache.
+
+    Methods:
+        fit: Loads the cached reduction, or fits the reducer and caches its output.
+        transform: Returns the stored reduction for the training embeddings.
+    """
+
+    def __init__(self, reducer, cache_dir: str):
+        super().__init__(reducer, None, None)
+        self.cache = ReductionCache(cache_dir)
+
+    def fit(self, X, y=None):
+        if self.reduced is not None and X is self.embeddings:
+            return self
 
-from bertopic.representation import (
-    KeyBERTInspired,
-    MaximalMarginalRelevance,
-    ZeroShotClassification,
-    PartOfSpeech,
-    TextGeneration,
-    LangChain,
-)
+        self.key = self.cache.key(X, self.reducer)
+        reduced, reducer = self.cache.get(self.key)
 
-from langchain.chains.question_answering import load_qa_chain
-from langchain.llms import OpenAI
+        if reduced is None or len(reduced) != len(X):
+            print("Reduction cache: miss")
+            reduced = np.asarray(self.reducer.fit_transform(X))
+            self.cache.put(self.key, reduced, self.reducer)
+        else:
+            print("Reduction cache: hit")
+            if reducer is not None:
+                self.reducer = reducer
+
+        self.embeddings = X
+        self.reduced = reduced
+        return self
 
 
 class TopicModelFactory:
@@ -53,19 +137,30 @@ class TopicModelFactory:
 
     Methods:
         upload_data: Uploads the input data for the topic model.
-        build_embedding_model: Builds the embedding model.
+        build_embedding_model: Builds the embedding model, reusing models that are already loaded.
+        open_embedding_cache: Opens the embedding cache of the embedding model.
+        embed_documents: Embeds documents, consulting the embedding cache first.
         build_dim_red_model: Builds the dimensionality reduction model.
         build_cluster_model: Builds the clustering model.
         build_vectorizer_model: Builds the vectorizer model.
         build_ctfidf_model: Builds the ctfidf model.
         build_fine_tune: Builds the fine-tuning models.
         build_topic_model: Builds the final topic model.
+        build_online_topic_model: Builds a topic model fitted batch by batch.
 
     """
 
+    # defaults of the online topic model, for configs whose models have no partial_fit
+    ONLINE_REDUCER = {"n_components": 5}
+    ONLINE_CLUSTERER = {"n_clusters": 50, "random_state": 42, "n_init": 3}
+    ONLINE_VECTORIZER = {"decay": 0.01, "stop_words": "english"}
+
     def __init__(self):
         self.data = None
         self.embedding_model = None
+        self.embedding_model_name = ""
+        self.embedding_revision = None
+        self._embedding_models = {}
         self.dimension_reduction_model = None
         self.clustering_model = None
         self.vectorizer_model = None
@@ -89,12 +184,13 @@ class TopicModelFactory:
         self.data = data
         return self.data
 
-    def build_embedding_model(self, model: str = ""):
+    def build_embedding_model(self, model: str = "", revision: str = None):
         """
         Builds the embedding model.
 
         Args:
             model (str, optional): The name of the embedding model to use. If not provided, a default model will be used.
+            revision (str, optional): The model revision to load. Defaults to the latest revision.
 
         Returns:
             The built embedding model.
@@ -102,9 +198,137 @@ class TopicModelFactory:
         """
         if model == "" or model == "Back":
             model = "all-MiniLM-L6-v2"
-        self.embedding_model = SentenceTransformer(model)
+
+        # keep loaded models so that rebuilding the topic model does not reload the weights
+        key = (model, revision)
+        if key not in self._embedding_models:
+            from sentence_transformers import SentenceTransformer
+
+            if revision:
+                embedding_model = SentenceTransformer(model, revision=revision)
+            else:
+                embedding_model = SentenceTransformer(model)
+            self._embedding_models[key] = (
+                embedding_model,
+                self._resolve_revision(model, revision),
+            )
+
+        self.embedding_model, self.embedding_revision = self._embedding_models[key]
+        self.embedding_model_name = model
         return self.embedding_model
 
+    @staticmethod
+    def _resolve_revision(model: str, revision: str = None) -> str:
+        """
+        Pins the revision of a loaded embedding model to its commit hash.
+
+        The embedding cache and the run manifest are keyed on this hash, so that a model updated
+        upstream gets new cache entries and a reloaded run gets the weights it was fitted with. The
+        hash is read from the Hugging Face cache the model was just loaded from, then asked of the
+        Hub unless HF_HUB_OFFLINE or TRANSFORMERS_OFFLINE is set. Local model directories keep the
+        given revision.
+
+        Args:
+            model (str): The name of the embedding model.
+            revision (str, optional): The requested revision. Defaults to the latest revision.
+
+        Returns:
+            str: The commit hash, or the requested revision if it cannot be resolved.
+        """
+        if revision and re.fullmatch(r"[0-9a-f]{40}", revision):
+            return revision
+        if os.path.isdir(model):
+            return revision
+
+        # sentence_transformers resolves bare model names in the sentence-transformers org
+        repo_id = model if "/" in model else f"sentence-transformers/{model}"
+        # the Hugging Face cache, laid out as huggingface_hub lays it out
+        hub_cache = os.environ.get("HF_HUB_CACHE") or os.path.join(
+            os.environ.get(
+                "HF_HOME", os.path.join(os.path.expanduser("~"), ".cache", "huggingface")
+            ),
+            "hub",
+        )
+        ref = os.path.join(
+            hub_cache, "models--" + repo_id.replace("/", "--"), "refs", revision or "main"
+        )
+        if os.path.isfile(ref):
+            with open(ref, "r") as f:
+                return f.read().strip()
+
+        floating = (
+            f"its embeddings are cached under the floating revision {revision or 'main'}"
+        )
+        # huggingface_hub refuses to reach the Hub under either variable, so do not ask it
+        if any(
+            os.environ.get(name, "").upper() in ("1", "ON", "YES", "TRUE")
+            for name in ("HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE")
+        ):
+            print(f"Not resolving the commit of {model} in offline mode, {floating}")
+            return revision
+
+        from huggingface_hub import model_info
+        from huggingface_hub.utils import HfHubHTTPError
+
+        try:
+            return model_info(repo_id, revision=revision).sha
+        # HTTP errors of the Hub, and connection errors, which requests raises as OSError
+        except (HfHubHTTPError, OSError):
+            print(f"Could not resolve the commit of {model}, {floating}")
+            return revision
+
+    def open_embedding_cache(self, cache_dir: str = None) -> EmbeddingCache:
+        """
+        Opens the embedding cache of the embedding model, to be reused across batches.
+
+        Args:
+            cache_dir (str, optional): The root directory of the embedding cache.
+
+        Returns:
+            EmbeddingCache: The cache, or None without a cache directory.
+
+        """
+        if self.embedding_model is None:
+            self.build_embedding_model()
+        if not cache_dir:
+            return None
+        return EmbeddingCache(
+            cache_dir, self.embedding_model_name, self.embedding_revision
+        )
+
+    def embed_documents(
+        self,
+        documents: list,
+        cache_dir: str = None,
+        cache: EmbeddingCache = None,
+        verbose: bool = True,
+    ) -> np.ndarray:
+        """
+        Embeds documents with the embedding model, consulting the embedding cache first.
+
+        Args:
+            documents (list): The documents to embed.
+            cache_dir (str, optional): The root directory of the embedding cache. If not provided, every document is encoded.
+            cache (EmbeddingCache, optional): An already opened cache, see open_embedding_cache, used instead of cache_dir.
+            verbose (bool, optional): Whether to show a progress bar and the cache hits. Defaults to True.
+
+        Returns:
+            np.ndarray: A float32 array with one row per document.
+
+        """
+        if self.embedding_model is None:
+            self.build_embedding_model()
+
+        def encode(docs):
+            return self.embedding_model.encode(docs, show_progress_bar=verbose)
+
+        if cache is None:
+            cache = self.open_embedding_cache(cache_dir)
+        if cache is None:
+            return np.asarray(encode(documents), dtype=np.float32)
+
+        return cache.get_or_compute(documents, encode, verbose)
+
     def build_dim_red_model(self, model: str = "", config: dict = {}):
         """
         Builds the dimensionality reduction model.
@@ -119,19 +343,32 @@ class TopicModelFactory:
         """
         model = model.lower()
         if model == "umap" or model == "":
+            from umap import UMAP
+
             self.dimension_reduction_model = UMAP(
                 init="tswspectral", verbose=True, **config
             )
 
         if model == "pca":
+            from sklearn.decomposition import PCA
+
             self.dimension_reduction_model = PCA(**config)
 
         if model == "truncated svd":
+            from sklearn.decomposition import TruncatedSVD
+
             self.dimension_reduction_model = TruncatedSVD(**config)
 
         if model == "independent component analysis":
+            from sklearn.decomposition import FastICA
+
             self.dimension_reduction_model = FastICA(**config)
 
+        if model == "incremental pca":
+            from sklearn.decomposition import IncrementalPCA
+
+            self.dimension_reduction_model = IncrementalPCA(**config)
+
         return self.dimension_reduction_model
 
     def build_cluster_model(self, model: str = "", config: dict = {}):
@@ -148,42 +385,74 @@ class TopicModelFactory:
         """
         model = model.lower()
         if model == "hdbscan" or model == "":
+            from hdbscan import HDBSCAN
+
             self.clustering_model = HDBSCAN(**config)
 
         if model == "kmeans":
+            from sklearn.cluster import KMeans
+
             self.clustering_model = KMeans(**config)
 
+        if model == "minibatch kmeans":
+            from sklearn.cluster import MiniBatchKMeans
+
+            self.clustering_model = MiniBatchKMeans(**config)
+
         if model == "spectral clustering":
+            from sklearn.cluster import SpectralClustering
+
             self.clustering_model = SpectralClustering(**config)
 
         if model == "dbscan":
+            from sklearn.cluster import DBSCAN
+
             self.clustering_model = DBSCAN(**config)
 
         if model == "agglomerative clustering":
+            from sklearn.cluster import AgglomerativeClustering
+
             self.clustering_model = AgglomerativeClustering(**config)
 
         if model == "birch":
+            from sklearn.cluster import Birch
+
             self.clustering_model = Birch(**config)
 
         if model == "affinity propagation":
+            from sklearn.cluster import AffinityPropagation
+
             self.clustering_model = AffinityPropagation(**config)
 
         if model == "mean shift":
+            from sklearn.cluster import MeanShift
+
             self.clustering_model = MeanShift(**config)
 
         return self.clustering_model
 
-    def build_vectorizer_model(self, config: dict = {}):
+    def build_vectorizer_model(self, config: dict = {}, online: bool = False):
         """
         Builds the vectorizer model.
 
         Args:
             config (dict, optional): Additional configuration parameters for the model.
+            online (bool, optional): Whether to build an OnlineCountVectorizer, whose vocabulary grows with every batch.
 
         Returns:
             The built vectorizer model.
 
         """
+        if online:
+            from bertopic.vectorizers import OnlineCountVectorizer
+
+            self.vectorizer_model = OnlineCountVectorizer(
+                **{**self.ONLINE_VECTORIZER, **config}
+            )
+            return self.vectorizer_model
+
+        from sklearn.feature_extraction.text import CountVectorizer
+
         self.vectorizer_model = CountVectorizer(**config)
         return self.vectorizer_model
 
@@ -198,6 +467,8 @@ class TopicModelFactory:
             The built ctfidf model.
 
         """
+        from bertopic.vectorizers import ClassTfidfTransformer
+
         self.ctfidf_model = ClassTfidfTransformer(**config)
         return self.ctfidf_model
 
@@ -212,6 +483,14 @@ class TopicModelFactory:
             list: The built fine-tuning models.
 
         """
+        from bertopic.representation import (
+            KeyBERTInspired,
+            MaximalMarginalRelevance,
+            ZeroShotClassification,
+            PartOfSpeech,
+            TextGeneration,
+        )
+
         self.fine_tune = []
         for log in tune:
             if isinstance(log, list):
@@ -230,6 +509,8 @@ class TopicModelFactory:
             if log == "Enable Part of Speech filtering":
                 self.fine_tune.append(PartOfSpeech())
             if log == "Enable Huggingface Text Generation":
+                from transformers import pipeline
+
                 generator = pipeline(
                     "text2text-generation", model="google/flan-t5-base"
                 )
@@ -237,20 +518,80 @@ class TopicModelFactory:
 
         return self.fine_tune
 
-    def build_topic_model(self, config: dict = {}) -> BERTopic:
+    def build_online_topic_model(self, config: dict = {}) -> BERTopic:
+        """
+        Builds a topic model that is fitted batch by batch with partial_fit.
+
+        The configured reducer and clusterer are kept when they support partial_fit, otherwise an
+        IncrementalPCA and a MiniBatchKMeans take their place. The vectorizer is an online one and
+        representation models are not used, since they do not support partial_fit.
+
+        Args:
+            config (dict, optional): Additional configuration parameters for the topic model.
+
+        Returns:
+            BERTopic: The built topic model.
+
+        """
+        from bertopic import BERTopic
+        from bertopic.vectorizers import ClassTfidfTransformer, OnlineCountVectorizer
+
+        reducer = self.dimension_reduction_model
+        if isinstance(reducer, PrecomputedReducer):
+            reducer = reducer.reducer
+        if not hasattr(reducer, "partial_fit"):
+            if reducer is not None:
+                print(f"{type(reducer).__name__} has no partial_fit, using IncrementalPCA")
+            self.build_dim_red_model("incremental pca", self.ONLINE_REDUCER)
+            reducer = self.dimension_reduction_model
+
+        if not hasattr(self.clustering_model, "partial_fit"):
+            if self.clustering_model is not None:
+                print(
+                    f"{type(self.clustering_model).__name__} has no partial_fit, using MiniBatchKMeans"
+                )
+            self.build_cluster_model("minibatch kmeans", self.ONLINE_CLUSTERER)
+
+        if not isinstance(self.vectorizer_model, OnlineCountVectorizer):
+            self.build_vectorizer_model(online=True)
+
+        if self.ctfidf_model is None:
+            # down weights words that are frequent in every batch
+            self.ctfidf_model = ClassTfidfTransformer(reduce_frequent_words=True)
+
+        return BERTopic(
+            embedding_model=self.embedding_model,
+            umap_model=reducer,
+            hdbscan_model=self.clustering_model,
+            vectorizer_model=self.vectorizer_model,
+            ctfidf_model=self.ctfidf_model,
+            verbose=True,
+            **config
+        )
+
+    def build_topic_model(self, config: dict = {}, cache_dir: str = None) -> BERTopic:
         """
         Builds the final topic model.
 
         Args:
             config (dict, optional): Additional configuration parameters for the topic model.
+            cache_dir (str, optional): The root directory of the reduction cache. If not provided, the reducer always runs.
 
         Returns:
             BERTopic: The built topic model.
 
         """
+        from bertopic import BERTopic
+
+        reducer = self.dimension_reduction_model
+        if cache_dir and reducer is not None and not isinstance(
+            reducer, PrecomputedReducer
+        ):
+            reducer = CachedReducer(reducer, cache_dir)
+
         return BERTopic(
             embedding_model=self.embedding_model,
-            umap_model=self.dimension_reduction_model,
+            umap_model=reducer,
             hdbscan_model=self.clustering_model,
             vectorizer_model=self.vectorizer_model,
             ctfidf_model=self.ctfidf_model,
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from src.drivers._tm_driver import TopicDriver
+from src.loading._dataloader import DataLoader
+from src.util._profiler import StageProfiler
+from util._session import Session
+from typing import TYPE_CHECKING
+import pandas as pd
+import numpy as np
+import json
+import os
+
+if TYPE_CHECKING:
+    from bertopic import BERTopic
+
+
+class InferenceDriver(TopicDriver):
+    """
+    The InferenceDriver class labels new documents with a topic model saved by an earlier run.
+
+    The data file is streamed in batches that are embedded, through the embedding cache, and passed
+    to the model's transform, and the assignments of every batch are appended to assignments.csv, so
+    memory does not grow with the size of the file and nothing is refitted.
+
+    Attributes:
+        session (Session): The session object associated with the driver.
+
+    Methods:
+        infer(model_dir, data_path, directory): Labels a data file with a saved topic model.
+        load_model(model_dir): Loads a saved topic model and its embedding model.
+        transform_file(model, data_path, directory): Streams the topic assignments of a data file.
+    """
+
+    # number of documents embedded and transformed at a time
+    BATCH_SIZE = 10000
+
+    def __init__(self, session: Session = None):
+        """
+        Initializes a new instance of the InferenceDriver class.
+
+        Args:
+            session (Session, optional): The session object associated with the driver. Defaults to None.
+        """
+        super().__init__(session)
+
+    def infer(self, model_dir: str, data_path: str = None, directory: str = None) -> str:
+        """
+        Labels a data file with a saved topic model.
+
+        Args:
+            model_dir (str): The model directory of an earlier run, e.g. output/model.
+            data_path (str, optional): The data file to label. Defaults to the session's data path.
+            directory (str, optional): The output directory. Defaults to <run>/inference.
+
+        Returns:
+            str: The path of the assignments file.
+        """
+        if data_path is None:
+            data_path = self.session.data_path
+        if data_path is None:
+            raise Exception("Inference needs a data file, pass it with --data")
+
+        model_dir = os.path.normpath(model_dir)
+        if directory is None or directory == "":
+            directory = os.path.join(os.path.dirname(model_dir), "inference")
+        os.makedirs(directory, exist_ok=True)
+
+        self.profiler = StageProfiler(detailed=self.session.profile)
+
+        with self.profiler.stage("load_model"):
+            model = self.load_model(model_dir)
+
+        path = self.transform_file(model, data_path, directory)
+
+        self._write_logs(directory)
+        self.profiler.write(directory)
+        return path
+
+    def load_model(self, model_dir: str) -> BERTopic:
+        """
+        Loads a saved topic model and its embedding model.
+
+        The embedding model is the one recorded in the run manifest next to the model, at the same
+        revision, falling back to the reference saved with the model.
+
+        Args:
+            model_dir (str): The model directory of an earlier run.
+
+        Returns:
+            BERTopic: The loaded topic model.
+        """
+        from bertopic import BERTopic
+
+        manifest_path = os.path.join(os.path.dirname(model_dir), "run_manifest.json")
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+            name = manifest.get("embedding_model") or ""
+            revision = manifest.get("embedding_revision")
+        else:
+            with open(os.path.join(model_dir, "config.json"), "r") as f:
+                name = json.load(f).get("embedding_model") or ""
+            revision = None
+
+        factory = self.session.topic_model_factory
+        embedding_model = factory.build_embedding_model(name, revision)
+
+        # hand over the loaded embedding model so that it is not loaded a second time
+        return BERTopic.load(model_dir, embedding_model=embedding_model)
+
+    def transform_file(self, model, data_path: str, directory: str) -> str:
+        """
+        Streams the topic assignments of a data file to directory/assignments.csv.
+
+        Labels follow labeled_corpus.csv: outliers get the label after the last topic.
+
+        Args:
+            model (BERTopic): A fitted or loaded topic model.
+            data_path (str): The data file to label.
+            directory (str): The output directory.
+
+        Returns:
+            str: The path of the assignments file.
+        """
+        outlier, topic_labels = self._model_topic_labels(model)
+
+        path = f"{directory}/assignments.csv"
+        if os.path.isfile(path):
+            os.remove(path)
+
+        # one cache for the whole file, rather than reading its index again for every batch
+        cache = self.session.topic_model_factory.open_embedding_cache(
+            self.session.cache_dir
+        )
+
+        with self.profiler.stage("infer") as stage:
+            stage["items"] = 0
+            for batch in self._iter_batches(data_path):
+                assignments = self._transform_batch(
+                    model, batch, outlier, topic_labels, cache
+                )
+                assignments.to_csv(
+                    path, mode="a", header=stage["items"] == 0, index=False
+                )
+                stage["items"] += len(batch)
+                print(f"Labeled {stage['items']} documents")
+
+        return path
+
+    def _model_topic_labels(self, model):
+        """
+        Describe every topic of a fitted or loaded model with the labels of labeled_corpus.csv.
+
+        Returns:
+            tuple: The label of the outliers and the top words of each label.
+        """
+        topics = model.get_topics()
+        outlier = len(topics)
+        labels = [outlier if topic == -1 else topic for topic in topics]
+        return outlier, self._topic_label_table(model, labels, outlier)
+
+    def _iter_batches(self, data_path: str):
+        """
+        Stream the cleaned documents of a data file in batches of BATCH_SIZE.
+        """
+        loader = DataLoader()
+        batch = []
+        for chunk in loader._iter_chunks(data_path, [loader.TEXT_COLUMN]):
+            batch.extend(loader._clean_text(chunk[loader.TEXT_COLUMN]))
+            while len(batch) >= self.BATCH_SIZE:
+                yield batch[: self.BATCH_SIZE]
+                batch = batch[self.BATCH_SIZE :]
+        if batch:
+            yield batch
+
+    def _transform_batch(
+        self,
+        model,
+        batch: list,
+        outlier: int,
+        topic_labels: dict,
+        cache=None,
+        verbose: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Embed one batch, through the embedding cache if one is open, and assign it to the topics of
+        the model, with the labels of _model_topic_labels.
+        """
+        embeddings = self.session.topic_model_factory.embed_documents(
+            batch, cache=cache, verbose=verbose
+        )
+        topics, probs = model.transform(batch, embeddings=embeddings)
+
+        if probs is None:
+            probs = np.full(len(batch), np.nan)
+        else:
+            probs = np.asarray(probs)
+            if probs.ndim == 2:
+                probs = probs.max(axis=1)
+
+        labels = np.asarray(topics, dtype=np.int64)
+        labels[labels == -1] = outlier
+
+        assignments = pd.DataFrame(
+            {"text": batch, "label": labels, "probability": probs}
+        )
+        assignments["topic_labels"] = assignments["label"].map(topic_labels)
+        return assignments
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+from src.drivers._inference_driver import InferenceDriver
+from src.util._profiler import StageProfiler
+from util._session import Session
+from typing import TYPE_CHECKING
+import datetime
+import json
+import os
+import pickle
+
+if TYPE_CHECKING:
+    from bertopic import BERTopic
+
+
+class OnlineDriver(InferenceDriver):
+    """
+    The OnlineDriver class fits a topic model batch by batch over a streamed data file.
+
+    Every batch is embedded, through the embedding cache, and passed to partial_fit, so only one
+    batch is held in memory and corpora larger than RAM can be modeled. The model is checkpointed
+    every CHECKPOINT_EVERY batches, and a run can resume from a checkpoint, either to finish an
+    interrupted file or to update the model with new data. Once fitted, the model is saved like a
+    regular run and the file is labeled in a second streamed pass.
+
+    Attributes:
+        session (Session): The session object associated with the driver.
+
+    Methods:
+        run_online(data_path, directory, resume): Fits, or updates, a topic model over a data file.
+        save_checkpoint(model, directory, state): Saves the model and the progress of a run.
+        load_checkpoint(checkpoint_dir): Loads a checkpoint.
+    """
+
+    # number of batches between two checkpoints
+    CHECKPOINT_EVERY = 10
+
+    # sub directory of a run holding the latest checkpoint
+    CHECKPOINT_DIR = "checkpoint"
+
+    def __init__(self, session: Session = None):
+        """
+        Initializes a new instance of the OnlineDriver class.
+
+        Args:
+            session (Session, optional): The session object associated with the driver. Defaults to None.
+        """
+        super().__init__(session)
+
+    def run_online(
+        self, data_path: str = None, directory: str = None, resume: str = None
+    ) -> str:
+        """
+        Fits, or updates, a topic model over a data file.
+
+        Args:
+            data_path (str, optional): The data file to fit. Defaults to the session's data path.
+            directory (str, optional): The output directory. Defaults to the session's save_dir, or "output".
+            resume (str, optional): A checkpoint directory to continue from.
+
+        Returns:
+            str: The output directory.
+        """
+        if data_path is None:
+            data_path = self.session.data_path
+        if data_path is None:
+            raise Exception("Online topic modeling needs a data file, pass it with --data")
+
+        if directory is None or directory == "":
+            directory = self.session.plot_dir if self.session.plot_dir != "" else "output"
+        os.makedirs(directory, exist_ok=True)
+
+        self.profiler = StageProfiler(detailed=self.session.profile)
+
+        if resume is not None:
+            with self.profiler.stage("load_checkpoint"):
+                model, state = self.load_checkpoint(resume)
+            # an interrupted file continues after its last checkpointed batch
+            if state["data_path"] == data_path and not state["complete"]:
+                skip = state["documents"]
+            else:
+                skip = 0
+                state.update({"data_path": data_path, "documents": 0, "complete": False})
+        else:
+            with self.profiler.stage("build"):
+                model = self._build_online_model()
+            factory = self.session.topic_model_factory
+            state = {
+                "data_path": data_path,
+                "documents": 0,
+                "complete": False,
+                "total_documents": 0,
+                "batches": 0,
+                "embedding_model": factory.embedding_model_name,
+                "embedding_revision": factory.embedding_revision,
+            }
+            skip = 0
+
+        model = self._partial_fit_file(model, data_path, directory, state, skip)
+
+        with self.profiler.stage("save_model"):
+            self._save_model(model, f"{directory}/{self.MODEL_DIR}")
+
+        self.transform_file(model, data_path, directory)
+
+        self._write_logs(directory)
+        self.profiler.write(directory)
+        return directory
+
+    def _build_online_model(self) -> BERTopic:
+        """
+        Build the online topic model from the topic model config, or from the online defaults.
+        """
+        if self.session.config_topic_model != {}:
+            return self.session.build_topic_model(from_file=True, online=True)
+
+        factory = self.session.topic_model_factory
+        factory.build_embedding_model()
+        return factory.build_online_topic_model()
+
+    def _partial_fit_file(
+        self, model, data_path: str, directory: str, state: dict, skip: int = 0
+    ):
+        """
+        Stream a data file through partial_fit, checkpointing every CHECKPOINT_EVERY batches.
+        """
+        # one cache for the whole file, rather than reading its index again for every batch
+        cache = self.session.topic_model_factory.open_embedding_cache(
+            self.session.cache_dir
+        )
+        factory = self.session.topic_model_factory
+
+        with self.profiler.stage("partial_fit") as stage:
+            stage["items"] = 0
+            batches = self._iter_batches(data_path)
+            if skip > 0:
+                print(f"Skipping the {skip} documents fitted before the checkpoint")
+                batches = self._skip_documents(batches, skip)
+
+            for batch in batches:
+                embeddings = factory.embed_documents(batch, cache=cache)
+                model.partial_fit(batch, embeddings=embeddings)
+
+                stage["items"] += len(batch)
+                state["documents"] += len(batch)
+                state["total_documents"] += len(batch)
+                state["batches"] += 1
+                print(f"Fitted {state['documents']} documents")
+
+                if state["batches"] % self.CHECKPOINT_EVERY == 0:
+                    self.save_checkpoint(model, directory, state)
+
+        state["complete"] = True
+        self.save_checkpoint(model, directory, state)
+        return model
+
+    def _skip_documents(self, batches, skip: int):
+        """
+        Drop the first `skip` documents of a stream of batches.
+        """
+        for batch in batches:
+            if skip >= len(batch):
+                skip -= len(batch)
+                continue
+            yield batch[skip:]
+            skip = 0
+
+    def save_checkpoint(self, model, directory: str, state: dict) -> str:
+        """
+        Saves the model and the progress of a run to directory/checkpoint.
+
+        The model is pickled without its embedding model, which is rebuilt from the name and
+        revision in the state on resume. Both files are replaced atomically, so an interrupted
+        write leaves the previous checkpoint intact.
+
+        Args:
+            model (BERTopic): The partially fitted topic model.
+            directory (str): The output directory of the run.
+            state (dict): The progress of the run.
+
+        Returns:
+            str: The checkpoint directory.
+        """
+        checkpoint_dir = f"{directory}/{self.CHECKPOINT_DIR}"
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+        embedding_model = getattr(model, "embedding_model", None)
+        model.embedding_model = None
+        try:
+            with open(f"{checkpoint_dir}/model.pkl.tmp", "wb") as f:
+                pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            model.embedding_model = embedding_model
+        os.replace(f"{checkpoint_dir}/model.pkl.tmp", f"{checkpoint_dir}/model.pkl")
+
+        state["saved"] = str(datetime.datetime.now())
+        with open(f"{checkpoint_dir}/state.json.tmp", "w") as f:
+            json.dump(state, f, indent=4)
+        os.replace(f"{checkpoint_dir}/state.json.tmp", f"{checkpoint_dir}/state.json")
+
+        return checkpoint_dir
+
+    def load_checkpoint(self, checkpoint_dir: str) -> tuple:
+        """
+        Loads a checkpoint and rebuilds its embedding model.
+
+        Args:
+            checkpoint_dir (str): The checkpoint directory, or the run directory holding it.
+
+        Returns:
+            tuple: The topic model and the progress of its run.
+        """
+        if os.path.isdir(f"{checkpoint_dir}/{self.CHECKPOINT_DIR}"):
+            checkpoint_dir = f"{checkpoint_dir}/{self.CHECKPOINT_DIR}"
+
+        with open(f"{checkpoint_dir}/state.json", "r") as f:
+            state = json.load(f)
+        with open(f"{checkpoint_dir}/model.pkl", "rb") as f:
+            model = pickle.load(f)
+
+        factory = self.session.topic_model_factory
+        if factory.embedding_model is None:
+            factory.build_embedding_model(
+                state.get("embedding_model") or "", state.get("embedding_revision")
+            )
+
+        print(
+            f"Resuming from {checkpoint_dir} after {state['total_documents']} documents"
+        )
+        return model, state
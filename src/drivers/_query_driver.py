@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from src.drivers._tm_driver import TopicDriver
+from src.util._ann import IVFIndex
+from src.util._labeled_corpus import read_labeled_corpus
+from util._session import Session
+import json
+import os
+import time
+
+
+class QueryDriver(TopicDriver):
+    """
+    The QueryDriver class finds the documents of a run most similar to a query.
+
+    The query is embedded with the embedding model of the run, searched in the similarity index the
+    run saved next to labeled_corpus.csv, and joined with the labeled corpus. The index, the
+    embedding model and the corpus are loaded once, so every later query only costs a search.
+
+    Attributes:
+        session (Session): The session object associated with the driver.
+
+    Methods:
+        load(run_dir): Loads the similarity index, embedding model and labeled corpus of a run.
+        search(queries, top_k, topic): Returns the documents most similar to each query.
+        query(run_dir, queries, top_k, topic): Loads a run and prints the results of each query.
+    """
+
+    # number of documents returned per query
+    TOP_K = 10
+
+    # columns of labeled_corpus.csv returned with every result
+    COLUMNS = ["text", "label", "topic_labels", "sentiment"]
+
+    def __init__(self, session: Session = None):
+        """
+        Initializes a new instance of the QueryDriver class.
+
+        Args:
+            session (Session, optional): The session object associated with the driver. Defaults to None.
+        """
+        super().__init__(session)
+        self.run_dir = None
+        self.index = None
+        self.corpus = None
+
+    def load(self, run_dir: str):
+        """
+        Loads the similarity index, embedding model and labeled corpus of a run.
+
+        Args:
+            run_dir (str): The output directory of the run.
+        """
+        self.index = IVFIndex.load(f"{run_dir}/{self.ANN_DIR}")
+
+        factory = self.session.topic_model_factory
+        if factory.embedding_model is None:
+            with open(f"{run_dir}/run_manifest.json", "r") as f:
+                manifest = json.load(f)
+            factory.build_embedding_model(
+                manifest.get("embedding_model") or "", manifest.get("embedding_revision")
+            )
+
+        self.corpus = read_labeled_corpus(run_dir, self.COLUMNS)
+        self.run_dir = run_dir
+
+    def search(self, queries: list, top_k: int = None, topic: int = None) -> list:
+        """
+        Returns the documents most similar to each query.
+
+        Args:
+            queries (list): The query texts.
+            top_k (int, optional): The number of documents per query. Defaults to TOP_K.
+            topic (int, optional): Only return documents of this label of labeled_corpus.csv.
+
+        Returns:
+            list: A DataFrame per query with the similarity and the labeled_corpus.csv columns of each document.
+        """
+        embeddings = self.session.topic_model_factory.embed_documents(queries)
+
+        results = []
+        for ids, scores in self.index.search(embeddings, top_k or self.TOP_K, label=topic):
+            result = self.corpus.iloc[ids].reset_index().rename(columns={"index": "row"})
+            result.insert(1, "similarity", scores)
+            results.append(result)
+        return results
+
+    def query(
+        self, run_dir: str, queries: list, top_k: int = None, topic: int = None
+    ) -> list:
+        """
+        Loads a run and prints the documents most similar to each query.
+
+        Args:
+            run_dir (str): The output directory of the run.
+            queries (list): The query texts.
+            top_k (int, optional): The number of documents per query. Defaults to TOP_K.
+            topic (int, optional): Only return documents of this label of labeled_corpus.csv.
+
+        Returns:
+            list: A DataFrame per query, see search.
+        """
+        if not os.path.isdir(f"{run_dir}/{self.ANN_DIR}"):
+            raise Exception(
+                f"{run_dir} has no similarity index, it was run before indexes were saved"
+            )
+
+        start = time.perf_counter()
+        self.load(run_dir)
+        print(f"Loaded {len(self.index)} indexed documents in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        results = self.search(queries, top_k, topic)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        for text, result in zip(queries, results):
+            print(f"\n{text}")
+            print(result.to_string(index=False, max_colwidth=100))
+        print(f"\nAnswered {len(queries)} queries in {elapsed:.1f} ms")
+
+        return results
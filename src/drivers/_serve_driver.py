@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from src.drivers._inference_driver import InferenceDriver
+from src.util._batcher import MicroBatcher
+from src.util._server import make_servers
+from util._session import Session
+import math
+import os
+import threading
+
+
+class ServeDriver(InferenceDriver):
+    """
+    The ServeDriver class serves topic and sentiment labels of a saved topic model from a long-running process.
+
+    The topic model, its embedding model and the sentiment pipeline are loaded once. Concurrent
+    requests over HTTP or a Unix socket are coalesced into micro batches, which are embedded,
+    transformed and scored on a single worker thread. Request text is never written to the
+    embedding cache, which would otherwise grow with every request the server answers.
+
+    Attributes:
+        session (Session): The session object associated with the driver.
+
+    Methods:
+        load(model_dir): Loads the topic model and the sentiment pipeline.
+        start(max_batch_size, max_latency_ms): Starts the micro batcher.
+        label(documents): Labels documents, batched with the concurrent requests.
+        metrics(): Returns the latency percentiles and queue depth of the server.
+        serve(model_dir, host, port, socket_path): Loads the models and serves until interrupted.
+    """
+
+    # number of documents that closes a micro batch
+    MAX_BATCH_SIZE = 64
+
+    # how long the oldest request waits for a micro batch to fill
+    MAX_LATENCY_MS = 10.0
+
+    def __init__(self, session: Session = None):
+        """
+        Initializes a new instance of the ServeDriver class.
+
+        Args:
+            session (Session, optional): The session object associated with the driver. Defaults to None.
+        """
+        super().__init__(session)
+        self.model = None
+        self.model_dir = None
+        self.outlier = None
+        self.topic_labels = {}
+        self.scorer = None
+        self.batcher = None
+
+    def load(self, model_dir: str, model=None):
+        """
+        Loads the topic model and the sentiment pipeline.
+
+        Args:
+            model_dir (str): The model directory of an earlier run, e.g. output/model.
+            model (BERTopic, optional): An already loaded model to serve instead.
+        """
+        self.model_dir = model_dir
+        self.model = model if model is not None else self.load_model(model_dir)
+        self.outlier, self.topic_labels = self._model_topic_labels(self.model)
+
+        # forking sentiment workers from a process running server threads is unsafe, and a micro
+        # batch is too small to be worth sharding anyway
+        self.scorer = self._build_sentiment_scorer()
+        self.scorer.workers = 1
+        self.scorer.build_pipeline()
+
+    def start(self, max_batch_size: int = None, max_latency_ms: float = None):
+        """
+        Starts the micro batcher.
+
+        Args:
+            max_batch_size (int, optional): The number of documents that closes a batch. Defaults to MAX_BATCH_SIZE.
+            max_latency_ms (float, optional): How long a request waits for its batch to fill. Defaults to MAX_LATENCY_MS.
+        """
+        self.batcher = MicroBatcher(
+            self._label_batch,
+            max_batch_size or self.MAX_BATCH_SIZE,
+            max_latency_ms if max_latency_ms is not None else self.MAX_LATENCY_MS,
+        ).start()
+        return self
+
+    def stop(self):
+        """
+        Stops the micro batcher once the pending requests are answered.
+        """
+        if self.batcher is not None:
+            self.batcher.stop()
+
+    def label(self, documents: list) -> list:
+        """
+        Labels documents, batched with the concurrent requests.
+
+        Args:
+            documents (list): The documents of one request.
+
+        Returns:
+            list: The topic, topic_label, probability and sentiment of each document.
+        """
+        return self.batcher.submit(documents)
+
+    def metrics(self) -> dict:
+        """
+        Returns the latency percentiles and queue depth of the server.
+
+        Returns:
+            dict: The statistics of the micro batcher and the served model.
+        """
+        stats = self.batcher.stats()
+        stats["model_dir"] = self.model_dir
+        return stats
+
+    def serve(
+        self,
+        model_dir: str,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        socket_path: str = None,
+        max_batch_size: int = None,
+        max_latency_ms: float = None,
+    ):
+        """
+        Loads the models and serves until interrupted.
+
+        Args:
+            model_dir (str): The model directory of an earlier run, e.g. output/model.
+            host (str, optional): The host to listen on. Defaults to "127.0.0.1".
+            port (int, optional): The TCP port, None to only listen on the socket. Defaults to 8000.
+            socket_path (str, optional): The path of a Unix socket to listen on as well.
+            max_batch_size (int, optional): The number of documents that closes a batch.
+            max_latency_ms (float, optional): How long a request waits for its batch to fill.
+        """
+        self.load(model_dir)
+        self.start(max_batch_size, max_latency_ms)
+
+        servers = make_servers(self, host, port, socket_path)
+        if not servers:
+            raise Exception("Nothing to serve on, pass a port or a socket path")
+
+        threads = [threading.Thread(target=s.serve_forever, daemon=True) for s in servers]
+        for thread in threads:
+            thread.start()
+        for server in servers:
+            address = server.server_address
+            if isinstance(address, tuple):
+                address = f"http://{address[0]}:{address[1]}"
+            print(f"Serving {model_dir} on {address}")
+
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            print("Shutting down")
+        finally:
+            for server in servers:
+                server.shutdown()
+                server.server_close()
+            self.stop()
+            if socket_path is not None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    def _label_batch(self, documents: list) -> list:
+        """
+        Labels one micro batch with its topics and sentiment.
+        """
+        assignments = self._transform_batch(
+            self.model, documents, self.outlier, self.topic_labels, cache=None, verbose=False
+        )
+        sentiment = self.scorer.score(documents)
+
+        return [
+            {
+                "topic": int(label),
+                "topic_label": topic_label,
+                "probability": None if math.isnan(probability) else float(probability),
+                "sentiment": float(score),
+            }
+            for label, topic_label, probability, score in zip(
+                assignments["label"],
+                assignments["topic_labels"],
+                assignments["probability"],
+                sentiment,
+            )
+        ]
@@ -0,0 +1,475 @@
+from __future__ import annotations
+
+from src.drivers._inference_driver import InferenceDriver
+from src.util._profiler import StageProfiler
+from util._session import Session
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+import pandas as pd
+import numpy as np
+import multiprocessing
+import datetime
+import json
+import os
+import shutil
+
+if TYPE_CHECKING:
+    from bertopic import BERTopic
+
+
+def _fit_shard(driver_class, options: dict, directory: str, index: int):
+    """
+    Fit one shard in a worker process, with a fresh session built from the options of the parent.
+    """
+    session = Session(
+        config_topic_model=options["config_topic_model"],
+        save_dir=directory,
+        data_path=options["data_path"],
+    )
+    session.cache_dir = options["cache_dir"]
+    session.profile = options["profile"]
+    driver_class(session).fit_shard(directory, index)
+
+
+class ShardDriver(InferenceDriver):
+    """
+    The ShardDriver class fits a topic model over a corpus too large for one job, shard by shard.
+
+    A run has three phases, coordinated only through files under <save_dir>/shards so that each
+    phase can run as a separate process or SLURM job:
+        split: streams the data file round robin into num_shards shard files, so every shard is a
+            sample of the whole corpus, and writes plan.json once all of them are complete.
+        fit: fits and saves a topic model on one shard, then writes the shard's DONE marker. A
+            shard that is already done is skipped, so failed array tasks can simply be requeued.
+        merge: merges the shard models into one topic space with BERTopic.merge_models,
+            reassigns every document to the merged topics and writes the same outputs as a
+            regular run to <save_dir>. Its memory still grows with the corpus, see merge.
+
+    Attributes:
+        session (Session): The session object associated with the driver.
+
+    Methods:
+        run_phase(phase, directory, num_shards, index): Runs one phase, or all of them locally.
+        split(data_path, directory, num_shards): Splits a data file into shards.
+        fit_shard(directory, index): Fits the topic model of one shard.
+        merge(directory): Merges the shard models and labels every document.
+        run_local(data_path, directory, num_shards, workers): Runs every phase on this machine.
+    """
+
+    PHASES = ["split", "fit", "merge", "local"]
+
+    # number of shards when none is given
+    NUM_SHARDS = 4
+
+    # sub directory of a run holding the shards, their models and markers
+    SHARD_DIR = "shards"
+
+    # topics of later shards closer than this to a topic of the merged model are folded into it
+    MIN_SIMILARITY = 0.7
+
+    def __init__(self, session: Session = None):
+        """
+        Initializes a new instance of the ShardDriver class.
+
+        Args:
+            session (Session, optional): The session object associated with the driver. Defaults to None.
+        """
+        super().__init__(session)
+
+    def run_phase(
+        self,
+        phase: str,
+        directory: str = None,
+        num_shards: int = None,
+        index: int = None,
+    ) -> str:
+        """
+        Runs one phase of a sharded run, or all of them locally.
+
+        Args:
+            phase (str): "split", "fit", "merge" or "local".
+            directory (str, optional): The output directory. Defaults to the session's save_dir, or "output".
+            num_shards (int, optional): The number of shards to split into. Defaults to NUM_SHARDS.
+            index (int, optional): The shard to fit. Defaults to $SLURM_ARRAY_TASK_ID.
+
+        Returns:
+            str: The output directory.
+        """
+        if phase not in self.PHASES:
+            raise ValueError(f"Unknown shard phase {phase}, expected one of {self.PHASES}")
+
+        if directory is None or directory == "":
+            directory = self.session.plot_dir if self.session.plot_dir != "" else "output"
+
+        if phase == "split":
+            self.split(self.session.data_path, directory, num_shards)
+        elif phase == "fit":
+            if index is None:
+                if "SLURM_ARRAY_TASK_ID" not in os.environ:
+                    raise Exception(
+                        "Fitting a shard needs --shard_index, or a SLURM array task"
+                    )
+                index = int(os.environ["SLURM_ARRAY_TASK_ID"])
+            self.fit_shard(directory, index)
+        elif phase == "merge":
+            self.merge(directory)
+        else:
+            self.run_local(self.session.data_path, directory, num_shards)
+
+        return directory
+
+    def split(self, data_path: str, directory: str, num_shards: int = None) -> dict:
+        """
+        Splits a data file round robin into shard files, streaming it in batches.
+
+        Any earlier shards of the directory are removed, and plan.json is only written once every
+        shard file is complete, so the fit phase never reads a partial split.
+
+        Args:
+            data_path (str): The data file to split.
+            directory (str): The output directory.
+            num_shards (int, optional): The number of shards. Defaults to NUM_SHARDS.
+
+        Returns:
+            dict: The plan of the split.
+        """
+        if data_path is None:
+            raise Exception("Splitting needs a data file, pass it with --data")
+        num_shards = num_shards or self.NUM_SHARDS
+
+        shard_dir = f"{directory}/{self.SHARD_DIR}"
+        if os.path.isdir(shard_dir):
+            shutil.rmtree(shard_dir)
+        os.makedirs(shard_dir)
+
+        self.profiler = StageProfiler(detailed=self.session.profile)
+
+        counts = np.zeros(num_shards, dtype=np.int64)
+        with self.profiler.stage("split") as stage:
+            stage["items"] = 0
+            for batch in self._iter_batches(data_path):
+                offset = stage["items"]
+                for i in range(num_shards):
+                    # document j of the file goes to shard j % num_shards
+                    documents = batch[(i - offset) % num_shards :: num_shards]
+                    if not documents:
+                        continue
+                    pd.DataFrame({"text": documents}).to_csv(
+                        self._shard_path(directory, i),
+                        mode="a",
+                        header=counts[i] == 0,
+                        index=False,
+                    )
+                    counts[i] += len(documents)
+                stage["items"] += len(batch)
+                print(f"Split {stage['items']} documents")
+
+        if counts.min() == 0:
+            raise Exception(
+                f"Cannot split {counts.sum()} documents into {num_shards} shards"
+            )
+
+        plan = {
+            "data_path": data_path,
+            "num_shards": num_shards,
+            "documents": int(counts.sum()),
+            "shard_documents": counts.tolist(),
+            "created": str(datetime.datetime.now()),
+        }
+        self._write_json(f"{shard_dir}/plan.json", plan)
+        self.profiler.write(shard_dir)
+        return plan
+
+    def fit_shard(self, directory: str, index: int) -> str:
+        """
+        Fits the topic model of one shard and saves it to shards/<index>/model.
+
+        Args:
+            directory (str): The output directory of the split.
+            index (int): The shard to fit.
+
+        Returns:
+            str: The directory of the shard.
+        """
+        plan = self.load_plan(directory)
+        if not 0 <= index < plan["num_shards"]:
+            raise ValueError(f"Shard {index} is not one of the {plan['num_shards']} shards")
+
+        shard_dir = f"{directory}/{self.SHARD_DIR}/{index}"
+        if os.path.isfile(f"{shard_dir}/DONE"):
+            print(f"Shard {index} is already fitted")
+            return shard_dir
+        os.makedirs(shard_dir, exist_ok=True)
+
+        self.profiler = StageProfiler(detailed=self.session.profile)
+
+        documents = pd.read_csv(
+            self._shard_path(directory, index), dtype={"text": str}, keep_default_na=False
+        )["text"].tolist()
+        self.session.data = documents
+
+        with self.profiler.stage("build"):
+            model = self._build_shard_model()
+
+        factory = self.session.topic_model_factory
+        with self.profiler.stage("embed", len(documents)):
+            embeddings = factory.embed_documents(documents, self.session.cache_dir)
+        with self.profiler.stage("fit", len(documents)):
+            model.fit_transform(documents, embeddings=embeddings)
+
+        with self.profiler.stage("save_model"):
+            self._save_model(model, f"{shard_dir}/{self.MODEL_DIR}")
+
+        self.profiler.write(shard_dir)
+        self._write_json(
+            f"{shard_dir}/DONE",
+            {
+                "index": index,
+                "documents": len(documents),
+                "topics": len(model.get_topics()),
+                "embedding_model": factory.embedding_model_name,
+                "embedding_revision": factory.embedding_revision,
+                "finished": str(datetime.datetime.now()),
+            },
+        )
+        print(f"Fitted shard {index} on {len(documents)} documents")
+        return shard_dir
+
+    def merge(self, directory: str) -> str:
+        """
+        Merges the shard models and writes the outputs of a regular run to the directory.
+
+        The documents are read back from the shards in the order of the data file and assigned
+        to the merged topics in batches, embedding them through the embedding cache the fit phase
+        filled. The embeddings are written to a memory mapped file rather than held, and the 2d
+        layout is a linear projection, see _resolve_projection_mode.
+
+        The documents and their labeled corpus are still held in memory to write the outputs of a
+        regular run, so the merge job needs memory for the text of the whole corpus.
+
+        Args:
+            directory (str): The output directory of the split.
+
+        Returns:
+            str: The output directory.
+        """
+        plan = self.load_plan(directory)
+        shard_root = f"{directory}/{self.SHARD_DIR}"
+
+        markers = []
+        missing = []
+        for i in range(plan["num_shards"]):
+            if os.path.isfile(f"{shard_root}/{i}/DONE"):
+                with open(f"{shard_root}/{i}/DONE", "r") as f:
+                    markers.append(json.load(f))
+            else:
+                missing.append(i)
+        if missing:
+            raise Exception(f"Shards {missing} of {directory} are not fitted yet")
+
+        self.profiler = StageProfiler(detailed=self.session.profile)
+
+        factory = self.session.topic_model_factory
+        if factory.embedding_model is None:
+            factory.build_embedding_model(
+                markers[0]["embedding_model"] or "", markers[0]["embedding_revision"]
+            )
+
+        with self.profiler.stage("load_models", plan["num_shards"]):
+            models = [
+                self._load_shard_model(f"{shard_root}/{i}/{self.MODEL_DIR}")
+                for i in range(plan["num_shards"])
+            ]
+        with self.profiler.stage("merge", plan["num_shards"]):
+            model = self._merge_models(models)
+        print(
+            f"Merged {sum(m['topics'] for m in markers)} shard topics into {len(model.get_topics())} topics"
+        )
+
+        documents = [None] * plan["documents"]
+        for i in range(plan["num_shards"]):
+            documents[i :: plan["num_shards"]] = pd.read_csv(
+                self._shard_path(directory, i), dtype={"text": str}, keep_default_na=False
+            )["text"].tolist()
+        self.session.data = documents
+        self.session.projection = None
+
+        embeddings_path = f"{shard_root}/embeddings.npy"
+        with self.profiler.stage("transform", len(documents)):
+            topics = self._assign_topics(model, documents, embeddings_path)
+        self.session.embeddings = np.load(embeddings_path, mmap_mode="r")
+
+        self._process_save_dir_choice(model, f"save_dir {directory}", topics)
+
+        with self.profiler.stage("visualize", len(documents)):
+            self._visualize(model, directory)
+
+        self._write_logs(directory)
+        self.profiler.write(directory)
+
+        self.session.embeddings = None
+        os.remove(embeddings_path)
+        return directory
+
+    def run_local(
+        self,
+        data_path: str,
+        directory: str,
+        num_shards: int = None,
+        workers: int = None,
+    ) -> str:
+        """
+        Runs every phase on this machine, fitting the shards in a pool of processes.
+
+        Each worker is spawned and builds its own session from the topic model config, as a SLURM
+        array task would, so a local run exercises the same file based coordination as a cluster
+        run.
+
+        Args:
+            data_path (str): The data file to model.
+            directory (str): The output directory.
+            num_shards (int, optional): The number of shards. Defaults to NUM_SHARDS.
+            workers (int, optional): The number of worker processes. Defaults to one per shard.
+
+        Returns:
+            str: The output directory.
+        """
+        plan = self.split(data_path, directory, num_shards)
+        num_shards = plan["num_shards"]
+
+        options = {
+            "config_topic_model": self.session.config_topic_model,
+            "data_path": data_path,
+            "cache_dir": self.session.cache_dir,
+            "profile": self.session.profile,
+        }
+        # every worker builds its own session and models, so nothing is lost by spawning them
+        # rather than forking a process whose thread pools may already be running
+        with ProcessPoolExecutor(
+            max_workers=min(workers or num_shards, num_shards),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            futures = [
+                pool.submit(_fit_shard, type(self), options, directory, i)
+                for i in range(num_shards)
+            ]
+            for future in futures:
+                future.result()
+
+        return self.merge(directory)
+
+    def load_plan(self, directory: str) -> dict:
+        """
+        Loads the plan of a split.
+
+        Args:
+            directory (str): The output directory of the split.
+
+        Returns:
+            dict: The plan written by split.
+        """
+        path = f"{directory}/{self.SHARD_DIR}/plan.json"
+        if not os.path.isfile(path):
+            raise Exception(f"{directory} has not been split, run --shard=split first")
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _shard_path(self, directory: str, index: int) -> str:
+        return f"{directory}/{self.SHARD_DIR}/shard_{index}.csv"
+
+    def _write_json(self, path: str, payload: dict):
+        """
+        Write a JSON file atomically, so a marker never exists half written.
+        """
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(payload, f, indent=4)
+        os.replace(f"{path}.tmp", path)
+
+    def _build_shard_model(self) -> BERTopic:
+        """
+        Build the topic model of a shard from the topic model config, or from the defaults.
+        """
+        return self.session.build_topic_model(
+            from_file=self.session.config_topic_model != {}
+        )
+
+    def _load_shard_model(self, model_dir: str) -> BERTopic:
+        """
+        Load the saved model of a shard with the session's embedding model.
+        """
+        from bertopic import BERTopic
+
+        return BERTopic.load(
+            model_dir, embedding_model=self.session.topic_model_factory.embedding_model
+        )
+
+    def _merge_models(self, models: list) -> BERTopic:
+        """
+        Merge the shard models into one topic space.
+        """
+        from bertopic import BERTopic
+
+        return BERTopic.merge_models(
+            models,
+            min_similarity=self.MIN_SIMILARITY,
+            embedding_model=self.session.topic_model_factory.embedding_model,
+        )
+
+    def _assign_topics(self, model, documents: list, path: str) -> list:
+        """
+        Embed documents and assign them to the merged topics in batches, moving outliers after the
+        last topic. The embeddings are written to a .npy file at path as each batch is embedded.
+        """
+        factory = self.session.topic_model_factory
+        # one cache for the whole corpus, rather than reading its index again for every batch
+        cache = factory.open_embedding_cache(self.session.cache_dir)
+
+        outlier = len(model.get_topics())
+        embeddings = None
+        topics = []
+        for start in range(0, len(documents), self.BATCH_SIZE):
+            batch = documents[start : start + self.BATCH_SIZE]
+            batch_embeddings = factory.embed_documents(batch, cache=cache)
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(
+                    path,
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(len(documents), batch_embeddings.shape[1]),
+                )
+            embeddings[start : start + len(batch)] = batch_embeddings
+
+            batch_topics, _ = model.transform(batch, embeddings=batch_embeddings)
+            topics.extend(outlier if t == -1 else int(t) for t in batch_topics)
+            print(f"Labeled {len(topics)} documents")
+
+        embeddings.flush()
+        return topics
+
+    def _resolve_projection_mode(self, embeddings, reducer=None):
+        """
+        Resolve the projection mode of a merged run, which cannot reuse the fitted reducer.
+
+        The reducer of the merged model was fitted on a single shard, so the knn and reduced modes
+        would lay out that shard rather than the corpus, and auto would fit a UMAP over the whole
+        corpus in one job. All three fall back to pca.
+        """
+        mode = getattr(self.session, "projection_mode", "auto")
+        if mode in ["auto", "knn", "reduced"]:
+            return "pca"
+        return super()._resolve_projection_mode(embeddings, reducer)
+
+    def _append_topic_labels(self, session_data, topics, model: BERTopic):
+        # the merged model keeps topics no document is assigned to, so the outlier label
+        # follows the model rather than the assigned topics, as in inference
+        _, topic_labels = self._model_topic_labels(model)
+        session_data["topic_labels"] = session_data["label"].map(topic_labels)
+        return session_data
+
+    def _visualize(self, model: BERTopic, directory: str):
+        """
+        Write the visualizations of the merged run.
+        """
+        from src.viz._tm_viz import visualize
+
+        visualize(model, self.session, directory, self.session.get_logs("data"))
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from src.drivers._tm_driver import TopicDriver
+from src.builders._tm_factory import PrecomputedReducer, CachedReducer
+from src.util._cache import ReductionCache
+from util._session import Session
+from itertools import product
+from typing import TYPE_CHECKING
+import re
+
+if TYPE_CHECKING:
+    from bertopic import BERTopic
+
+
+class SweepDriver(TopicDriver):
+    """
+    The SweepDriver class runs a grid of topic models in one process, sharing the expensive stages.
+
+    Documents are embedded once per embedding model and reduced once per reducer configuration, and
+    every clustering configuration is fitted on the shared reduction. Each combination still writes
+    its own output directory.
+
+    Attributes:
+        session (Session): The session object associated with the driver.
+
+    Methods:
+        expand_grid(grid): Expands a grid of topic model configurations into its combinations.
+        run_grid(grid, save_dir): Runs every combination of a grid.
+        run_model(model, directory): Runs one topic model with the shared embeddings and reductions.
+    """
+
+    # keys of the topic model configuration that may hold a list of choices in a grid
+    GRID_KEYS = ["embedding_model", "umap_model", "hdbscan_model"]
+
+    def __init__(self, session: Session = None):
+        """
+        Initializes a new instance of the SweepDriver class.
+
+        Args:
+            session (Session, optional): The session object associated with the driver. Defaults to None.
+        """
+        super().__init__(session)
+        self._embeddings = {}
+        self._reductions = {}
+        self._projections = {}
+
+    def expand_grid(self, grid: dict) -> list:
+        """
+        Expands a grid of topic model configurations into its combinations.
+
+        The grid follows the topic model configuration file, except that "embedding_model",
+        "umap_model" and "hdbscan_model" may be lists of choices:
+
+            {
+                "embedding_model": ["all-MiniLM-L6-v2", "all-mpnet-base-v2"],
+                "umap_model": [{"umap": {"n_components": 5}}, {"pca": {"n_components": 5}}],
+                "hdbscan_model": [{"hdbscan": {"min_cluster_size": 10}}, {"kmeans": {"n_clusters": 20}}]
+            }
+
+        Args:
+            grid (dict): The grid of configurations.
+
+        Returns:
+            list: (name, config) pairs, one per combination.
+        """
+        choices = []
+        for key in self.GRID_KEYS:
+            values = grid.get(key, [""] if key == "embedding_model" else [{"": {}}])
+            choices.append(values if isinstance(values, list) else [values])
+
+        combinations = []
+        for embedding_model, umap_model, hdbscan_model in product(*choices):
+            config = {k: v for k, v in grid.items() if k not in self.GRID_KEYS}
+            config.setdefault("vectorizer_model", {})
+            config.setdefault("ctfidf_model", {})
+            config["embedding_model"] = embedding_model
+            config["umap_model"] = umap_model
+            config["hdbscan_model"] = hdbscan_model
+
+            parts = [
+                embedding_model or "default",
+                list(umap_model.keys())[0] or "default",
+                list(hdbscan_model.keys())[0] or "default",
+            ]
+            name = "_".join(re.sub(r"[^\w.-]+", "-", part) for part in parts)
+            # several configurations of the same models need distinct directories
+            if any(name == n for n, _ in combinations):
+                name = f"{name}_{len(combinations)}"
+            combinations.append((name, config))
+
+        return combinations
+
+    def run_grid(self, grid: dict, save_dir: str = "output"):
+        """
+        Runs every combination of a grid, writing each to save_dir/<name>.
+
+        Args:
+            grid (dict): The grid of configurations, see expand_grid.
+            save_dir (str, optional): The root output directory. Defaults to "output".
+        """
+        combinations = self.expand_grid(grid)
+        base_config = self.session.config_topic_model
+
+        for i, (name, config) in enumerate(combinations):
+            print(f"Sweep {i + 1}/{len(combinations)}: {name}")
+            self.session.config_topic_model = config
+            model = self.session.build_topic_model(from_file=True)
+            self.run_model(model, f"{save_dir}/{name}")
+
+        self.session.config_topic_model = base_config
+
+    def run_model(self, model: BERTopic, directory: str):
+        """
+        Runs one topic model with the shared embeddings and reductions.
+
+        Args:
+            model (BERTopic): The topic model built by the session's factory.
+            directory (str): The output directory of this combination.
+        """
+        factory = self.session.topic_model_factory
+        embedding_key = (factory.embedding_model_name, factory.embedding_revision)
+        if embedding_key not in self._embeddings:
+            self._embeddings[embedding_key] = factory.embed_documents(
+                self.session.data, self.session.cache_dir
+            )
+        embeddings = self._embeddings[embedding_key]
+
+        reducer = model.umap_model
+        inner = reducer.reducer if isinstance(reducer, PrecomputedReducer) else reducer
+        reducer_key = (embedding_key, ReductionCache.describe(inner))
+        if reducer_key not in self._reductions:
+            print(f"Fitting {type(inner).__name__} for the sweep")
+            if isinstance(reducer, CachedReducer):
+                self._reductions[reducer_key] = reducer.fit(embeddings)
+            else:
+                self._reductions[reducer_key] = PrecomputedReducer.fit_reducer(
+                    inner, embeddings
+                )
+        model.umap_model = self._reductions[reducer_key]
+
+        # combinations sharing a reduction share its 2d layout
+        self.session.embeddings = embeddings
+        self.session.projection = self._projections.get(reducer_key)
+
+        self.run_topic_model(model=model, directory=directory, embeddings=embeddings)
+
+        self._projections[reducer_key] = self.session.projection
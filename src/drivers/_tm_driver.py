@@ -1,17 +1,28 @@
+from __future__ import annotations
+
 from src.drivers._driver import Driver
-from src.viz._tm_viz import visualize
 from src.util._formatter import DataFormatter
+from src.util._sentiment import SentimentScorer
+from src.util._cache import SentimentCache, ReductionCache, DEFAULT_CACHE_DIR
+from src.builders._tm_factory import PrecomputedReducer
+from src.loading._dedup import DuplicateGroups
+from src.util._profiler import StageProfiler
+from src.util._ann import IVFIndex
+from src.util._labeled_corpus import write_labeled_corpus, read_labeled_corpus
 from util._session import Session
-from transformers import pipeline
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from umap import UMAP
-from bertopic import BERTopic
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 import json
 import os
 import sys
 
+# umap, sklearn, matplotlib, scipy and the visualizations are imported where they are used, so
+# that starting the CLI does not load them
+if TYPE_CHECKING:
+    from bertopic import BERTopic
+
 
 class TopicDriver(Driver):
     """
@@ -28,6 +39,21 @@ class TopicDriver(Driver):
         _write_logs(self, directory): Writes the logs to a JSON file.
     """
 
+    # modes for the 2d projection written to labeled_corpus.csv
+    PROJECTION_MODES = ["auto", "umap", "knn", "reduced", "pca", "random"]
+
+    # corpora at least this large fall back to a linear projection in "auto" mode
+    LARGE_CORPUS = 250000
+
+    # number of threads writing per-topic Zipf tables
+    ZIPF_WRITERS = 8
+
+    # sub directory of a run holding the fitted model
+    MODEL_DIR = "model"
+
+    # sub directory of a run holding the similarity index of its documents
+    ANN_DIR = "ann_index"
+
     def __init__(self, session: Session = None):
         """
         Initializes a new instance of the GlobalDriver class.
@@ -40,24 +66,51 @@ class TopicDriver(Driver):
         else:
             self.file = "file://"
         super().__init__(session)
-
-    def run_topic_model(self, from_file: bool = False):
+        # created when a stage is first measured, since a new profiler resets the memory peak
+        self._profiler = None
+
+    @property
+    def profiler(self) -> StageProfiler:
+        if self._profiler is None:
+            self._profiler = StageProfiler(detailed=self.session.profile)
+        return self._profiler
+
+    @profiler.setter
+    def profiler(self, profiler: StageProfiler):
+        self._profiler = profiler
+
+    def run_topic_model(
+        self,
+        from_file: bool = False,
+        model: BERTopic = None,
+        directory: str = None,
+        embeddings: np.ndarray = None,
+    ):
         """
         Runs the topic modeling process.
 
         Args:
             from_file (bool, optional): Indicates whether to load data from a file. Defaults to False.
+            model (BERTopic, optional): An already built topic model. Defaults to building one from the session.
+            directory (str, optional): The output directory, overriding the logged save_dir choices.
+            embeddings (np.ndarray, optional): Precomputed document embeddings. Defaults to embedding the session data.
         """
 
         data = self.session.get_logs("data")
-        directory = ""
         # remove all logs that contain "Back" in the values
         data = [log for log in data if "Back" not in log.values()]
         # gather data where "Topic" is a key
         topic_choices = [log for log in data if "Topic" in log.keys()]
+        if directory is not None:
+            topic_choices = [{"Topic": f"save_dir {directory}"}]
+        directory = ""
+
+        self.profiler = StageProfiler(detailed=self.session.profile)
 
-        model = self.session.build_topic_model(from_file=from_file)
-        topics = self._fit_model(model)
+        if model is None:
+            with self.profiler.stage("build"):
+                model = self.session.build_topic_model(from_file=from_file)
+        topics = self._fit_model(model, embeddings)
 
         for log in topic_choices:
             value = str(list(log.values())[0])
@@ -65,21 +118,41 @@ class TopicDriver(Driver):
             if save_dir != "":
                 directory = save_dir
 
-        visualize(model, self.session, directory, data)
+        from src.viz._tm_viz import visualize
+
+        with self.profiler.stage("visualize", len(self.session.data)):
+            visualize(model, self.session, directory, data)
 
         self._write_logs(directory)
+        self.profiler.write(directory)
 
-    def _fit_model(self, model):
+    def _fit_model(self, model, embeddings=None):
         """
         Fits the topic model to the session data and extracts the topics.
 
         Args:
             model: The topic model object.
+            embeddings (np.ndarray, optional): Precomputed document embeddings.
 
         Returns:
             list: The extracted topics.
         """
-        topics, _ = model.fit_transform(self.session.data)
+        n_docs = len(self.session.data)
+
+        # embed once and share the array with the save, projection and visualization stages
+        if embeddings is None:
+            with self.profiler.stage("embed", n_docs):
+                embeddings = self.session.topic_model_factory.embed_documents(
+                    self.session.data, self.session.cache_dir
+                )
+        # the 2d layout only carries over when the same embeddings are passed back in
+        if embeddings is not self.session.embeddings:
+            self.session.projection = None
+        self.session.embeddings = embeddings
+        with self.profiler.stage("fit", n_docs):
+            topics, _ = model.fit_transform(
+                self.session.data, embeddings=self.session.embeddings
+            )
         # set -1 cluster to num_clusters+1
         num_topics = len(set(topics))
 
@@ -109,29 +182,57 @@ class TopicDriver(Driver):
         # Setup directory for saving results
         directory = self._setup_directory(value)
 
+        n_docs = len(topics)
+        profiler = self.profiler
+
         # Map topics to documents and process session data
-        session_data, embeddings = self._map_topics_to_documents(topics, model)
+        with profiler.stage("map_topics", n_docs):
+            session_data, embeddings = self._map_topics_to_documents(topics, model)
 
         # Reduce embeddings dimensions if necessary
-        embeddings = self._reduce_embeddings_dimensions(embeddings)
+        reducer = model.umap_model
+        if isinstance(reducer, PrecomputedReducer):
+            reducer = reducer.reducer
+        with profiler.stage("projection", n_docs):
+            embeddings = self._reduce_embeddings_dimensions(
+                embeddings, reducer, directory
+            )
         session_data = pd.concat([session_data, embeddings], axis=1)
 
-        session_data = self._label_text_with_sentiment(session_data)
+        with profiler.stage("sentiment", n_docs):
+            session_data = self._label_text_with_sentiment(session_data)
+
+        with profiler.stage("topic_labels", n_docs):
+            session_data = self._append_topic_labels(session_data, topics, model)
+
+            # Give every duplicate the results of its representative
+            corpus, weights = self._broadcast_duplicates(session_data)
+
+        with profiler.stage("save_corpus", len(corpus)):
+            # Save the session data to CSV
+            self._save_session_data(corpus, directory)
 
-        session_data = self._append_topic_labels(session_data, topics, model)
+            # Save the topic model configuration
+            self._save_topic_model_config(directory)
 
-        # Save the session data to CSV
-        self._save_session_data(session_data, directory)
+            # Record how to find the cached stages of this run
+            self._save_run_manifest(model, directory)
 
-        # Save the topic model configuration
-        self._save_topic_model_config(directory)
+        with profiler.stage("save_model"):
+            self._save_model(model, f"{directory}/{self.MODEL_DIR}")
+
+        # Index the embeddings for similar document queries
+        with profiler.stage("ann_index", n_docs):
+            self._save_ann_index(topics, directory)
 
         # Plot and save the topic size distribution
-        self._plot_topic_size_distribution(session_data, directory)
+        with profiler.stage("size_distribution", len(corpus)):
+            self._plot_topic_size_distribution(corpus, directory)
 
         # Save Zipf distribution for each topic and a sample
-        formatter = DataFormatter()  # Assuming DataFormatter is defined elsewhere
-        self._save_zipf_distribution(session_data, directory, formatter)
+        with profiler.stage("zipf", n_docs):
+            formatter = DataFormatter()  # Assuming DataFormatter is defined elsewhere
+            self._save_zipf_distribution(session_data, directory, formatter, weights)
 
         return directory
 
@@ -141,81 +242,275 @@ class TopicDriver(Driver):
         """
         directory = self.session.plot_dir if self.session.plot_dir != "" else ""
         if value.startswith("save_dir"):
-            directory = value.split(" ")[1].strip()
+            directory = value.split(" ", 1)[1].strip()
         if not os.path.isdir(directory):
             os.makedirs(directory)
         return directory
 
     def _append_topic_labels(self, session_data, topics, model: BERTopic):
         unique_topics = list(set(topics))
-        topic_labels = [0] * len(unique_topics)  # Initialize topic_labels with zeros
+        # _fit_model moves the -1 outliers to the label after the last topic
+        topic_labels = self._topic_label_table(model, unique_topics, len(unique_topics))
+
+        session_data["topic_labels"] = session_data["label"].map(topic_labels)
+        return session_data
 
-        for topic in unique_topics:
-            words = []
-            data = model.get_topic(topic)
+    def _topic_label_table(self, model: BERTopic, labels, outlier: int) -> dict:
+        """
+        Map each label of labeled_corpus.csv to the top words of its topic.
+
+        Args:
+            model (BERTopic): The fitted topic model.
+            labels: The labels to describe.
+            outlier (int): The label the -1 outlier topic was moved to.
+
+        Returns:
+            dict: The space separated top words of each label, "" for labels without words.
+        """
+        topic_labels = {}
+        for label in labels:
+            data = model.get_topic(-1 if label == outlier else label)
             if isinstance(data, bool):
+                topic_labels[label] = ""
                 continue
-            for tup in data:
-                words.append(tup[0])
-            topic_labels[topic] = " ".join(words)
+            topic_labels[label] = " ".join(tup[0] for tup in data)
+        return topic_labels
 
-        session_data["topic_labels"] = session_data["label"].map(
-            lambda x: topic_labels[x] if x < len(topic_labels) else topic_labels[0]
+    def _save_model(self, model, directory):
+        """
+        Save the fitted model to the directory with safetensors.
+
+        The embedding model is stored as a reference to its name rather than as weights, and is
+        reloaded at the revision recorded in the run manifest by the inference driver. The reducer
+        and clusterer are not saved, so a loaded model assigns topics by similarity to the topic
+        embeddings.
+        """
+        name = self.session.topic_model_factory.embedding_model_name
+        model.save(
+            directory,
+            serialization="safetensors",
+            save_ctfidf=True,
+            save_embedding_model=name if name != "" else False,
         )
-        return session_data
 
-    def _save_model(self, model, directory):
+    def _save_ann_index(self, topics, directory):
         """
-        Save the model to the directory.
+        Save a similarity index over the document embeddings, returning rows of labeled_corpus.csv.
+
+        A deduplicated corpus is indexed once per group, through the row of its representative.
         """
-        model.save(directory, serialization="pytorch", save_embedding_model=True)
+        ids = None
+        duplicates = self.session.duplicates
+        if duplicates is not None and len(duplicates) == len(topics):
+            ids = duplicates.representatives
+
+        IVFIndex.build(self.session.embeddings, labels=topics, ids=ids).save(
+            f"{directory}/{self.ANN_DIR}"
+        )
 
     def _map_topics_to_documents(self, topics, model):
         """
         Process topics and map them to documents.
         """
         topics_df = pd.DataFrame(data=topics, columns=["label"]).astype(int)
-        embeddings = pd.DataFrame(model._extract_embeddings(self.session.data))
+        embeddings = self.session.embeddings
+        if embeddings is None:
+            embeddings = np.asarray(
+                model._extract_embeddings(self.session.data), dtype=np.float32
+            )
+            self.session.embeddings = embeddings
         session_data = pd.DataFrame(self.session.data, columns=["text"])
         session_data = pd.concat([session_data, topics_df], axis=1)
         return session_data, embeddings
 
-    def _reduce_embeddings_dimensions(self, embeddings):
+    def _reduce_embeddings_dimensions(self, embeddings, reducer=None, directory=""):
+        """
+        Reduce the dimensionality of embeddings to 2d if necessary.
+
+        The projection mode is read from the session ("auto" by default):
+            umap: fit a new 2d UMAP on the embeddings.
+            knn: fit a 2d UMAP that reuses the nearest neighbour graph of the fitted reducer.
+            reduced: run PCA on the output of the fitted reducer.
+            pca / random: project the embeddings linearly, for very large corpora.
+            auto: knn for a fitted UMAP, pca for large corpora, reduced for other fitted reducers, else umap.
+
+        Args:
+            embeddings: The document embeddings.
+            reducer (optional): The dimensionality reduction model fitted by the topic model.
+            directory (str, optional): The run directory to cache the 2d layout in.
+
+        Returns:
+            pd.DataFrame: The "x" and "y" columns of the projection.
+        """
+        if embeddings.shape[1] <= 2:
+            if not isinstance(embeddings, pd.DataFrame):
+                embeddings = pd.DataFrame(embeddings, columns=["x", "y"])
+            return embeddings
+
+        projection = None
+        if self.session is not None:
+            projection = getattr(self.session, "projection", None)
+
+        if projection is None or len(projection) != len(embeddings):
+            mode = self._resolve_projection_mode(embeddings, reducer)
+            print(f"Projecting embeddings to 2d with mode '{mode}'")
+            projection = self._project_embeddings(embeddings, reducer, mode)
+            if self.session is not None:
+                self.session.projection = projection
+
+        if directory != "":
+            np.save(f"{directory}/projection_2d.npy", projection)
+
+        return pd.DataFrame(projection, columns=["x", "y"])
+
+    def _resolve_projection_mode(self, embeddings, reducer=None):
+        """
+        Resolve the "auto" projection mode against the fitted reducer and corpus size.
+        """
+        mode = "auto"
+        if self.session is not None:
+            mode = getattr(self.session, "projection_mode", "auto")
+        if mode not in self.PROJECTION_MODES:
+            raise ValueError(
+                f"Unknown projection mode {mode}, expected one of {self.PROJECTION_MODES}"
+            )
+
+        # a UMAP instance implies umap is already imported
+        umap = sys.modules.get("umap")
+        fitted_umap = (
+            umap is not None
+            and isinstance(reducer, umap.UMAP)
+            and getattr(reducer, "_knn_indices", None) is not None
+        )
+        fitted = fitted_umap or hasattr(reducer, "embedding_") or hasattr(
+            reducer, "components_"
+        )
+
+        if mode == "knn" and not fitted_umap:
+            mode = "umap"
+        if mode == "reduced" and not fitted:
+            mode = "umap"
+
+        if mode == "auto":
+            if fitted_umap:
+                mode = "knn"
+            elif len(embeddings) >= self.LARGE_CORPUS:
+                mode = "pca"
+            elif fitted:
+                mode = "reduced"
+            else:
+                mode = "umap"
+
+        return mode
+
+    def _project_embeddings(self, embeddings, reducer, mode):
         """
-        Reduce the dimensionality of embeddings if necessary.
+        Compute the 2d projection of the embeddings with the given mode.
         """
-        if embeddings.shape[1] > 2:
-            umap = UMAP(n_components=2)
-            embeddings = pd.DataFrame(
-                umap.fit_transform(embeddings), columns=["x", "y"]
+        from sklearn.decomposition import PCA
+
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        if mode == "knn":
+            from umap import UMAP
+
+            umap = UMAP(
+                n_components=2,
+                n_neighbors=reducer.n_neighbors,
+                metric=reducer.metric,
+                precomputed_knn=(
+                    reducer._knn_indices,
+                    reducer._knn_dists,
+                    reducer._knn_search_index,
+                ),
             )
-        return embeddings
+            projection = umap.fit_transform(embeddings)
+
+        elif mode == "reduced":
+            if hasattr(reducer, "embedding_"):
+                reduced = reducer.embedding_
+            else:
+                reduced = reducer.transform(embeddings)
+            if reduced.shape[1] > 2:
+                reduced = PCA(n_components=2).fit_transform(reduced)
+            projection = reduced
+
+        elif mode == "pca":
+            projection = PCA(
+                n_components=2, svd_solver="randomized", random_state=42
+            ).fit_transform(embeddings)
+
+        elif mode == "random":
+            from sklearn.random_projection import GaussianRandomProjection
+
+            projection = GaussianRandomProjection(
+                n_components=2, random_state=42
+            ).fit_transform(embeddings)
+
+        else:
+            from umap import UMAP
+
+            projection = UMAP(n_components=2).fit_transform(embeddings)
+
+        return np.asarray(projection, dtype=np.float32)
+
+    def _broadcast_duplicates(self, session_data):
+        """
+        Expand the results of the deduplicated corpus back to every original document.
+
+        Each copy receives the row of its group with its own text, a "dup_group" column holding the
+        group and a "weight" column holding the size of the group.
+
+        Returns:
+            tuple: One row per original document, or session_data if the corpus was not deduplicated, and the weight of each row of session_data, or None.
+        """
+        duplicates = self.session.duplicates
+        if duplicates is None:
+            return session_data, None
+        if len(duplicates) != len(session_data):
+            raise Exception(
+                f"The corpus has {len(session_data)} documents but was deduplicated into "
+                f"{len(duplicates)} groups, deduplicate it again after changing the data"
+            )
+
+        corpus = session_data.iloc[duplicates.inverse].reset_index(drop=True)
+        corpus["text"] = duplicates.documents
+        corpus["dup_group"] = duplicates.inverse
+        corpus["weight"] = duplicates.counts[duplicates.inverse]
+        return corpus, duplicates.counts
 
     def _save_session_data(self, session_data, directory):
         """
-        Save the session data to a CSV file.
+        Save the session data to labeled_corpus.csv, or labeled_corpus.parquet.
         """
-        session_data.to_csv(f"{directory}/labeled_corpus.csv", index=False)
+        write_labeled_corpus(session_data, directory, self.session.output_format)
 
     def _label_text_with_sentiment(self, session_data):
-        if self.session.sentiment != "":
-            sentiment = pipeline(self.session.sentiment)
+        """
+        Label each document with the mean sentiment score of its chunks, reusing cached scores.
+        """
+        scorer = self._build_sentiment_scorer()
+        texts = session_data["text"].tolist()
+
+        if self.session.cache_dir:
+            cache = SentimentCache(self.session.cache_dir, scorer.model_id)
+            session_data["sentiment"] = cache.get_or_compute(texts, scorer.score)
+            cache.close()
         else:
-            sentiment = pipeline("sentiment-analysis")
-
-        # for each entry in the "text" column, if any entry is too long, split it into smaller chunks and analyze sentiment and then pool
-        # the sentiment scores
-        for i, row in session_data.iterrows():
-            if len(row["text"]) > 512:
-                text = row["text"]
-                chunks = [text[i : i + 512] for i in range(0, len(text), 512)]
-                scores = [sentiment(chunk)[0]["score"] for chunk in chunks]
-                session_data.at[i, "sentiment"] = sum(scores) / len(scores)
-            else:
-                session_data.at[i, "sentiment"] = sentiment(row["text"])[0]["score"]
+            session_data["sentiment"] = scorer.score(texts)
 
         return session_data
 
+    def _build_sentiment_scorer(self):
+        """
+        Build the sentiment scorer configured by the session.
+        """
+        return SentimentScorer(
+            self.session.sentiment,
+            self.session.sentiment_batch_size,
+            workers=self.session.sentiment_workers,
+        )
+
     def _save_topic_model_config(self, directory):
         """
         Save the topic model configuration.
@@ -225,10 +520,106 @@ class TopicDriver(Driver):
             with open(f"{directory}/tm_config.json", "w") as f:
                 json.dump(tm_config, f)
 
+    def _save_run_manifest(self, model, directory):
+        """
+        Save the run manifest, which lets recluster find the embeddings and reduction of this run.
+        """
+        factory = self.session.topic_model_factory
+        reducer = model.umap_model
+        inner = reducer.reducer if isinstance(reducer, PrecomputedReducer) else reducer
+
+        manifest = {
+            "data_path": self.session.data_path,
+            "documents": len(self.session.data),
+            "embedding_model": factory.embedding_model_name,
+            "embedding_revision": factory.embedding_revision,
+            "reducer": json.loads(ReductionCache.describe(inner)),
+            "reduction_key": getattr(reducer, "key", None),
+            "cache_dir": self.session.cache_dir,
+            "model_dir": self.MODEL_DIR,
+            "config_topic_model": self.session.config_topic_model,
+        }
+
+        with open(f"{directory}/run_manifest.json", "w") as f:
+            json.dump(manifest, f, indent=4, default=str)
+
+    def recluster(self, run_dir: str, directory: str = None):
+        """
+        Cluster the cached reduction of an earlier run again with the session's clustering config.
+
+        The documents are read back from the run's labeled corpus, their embeddings come from the
+        embedding cache and the reduction from the reduction cache, so only clustering and the
+        outputs are recomputed.
+
+        Args:
+            run_dir (str): The output directory of the earlier run.
+            directory (str, optional): The output directory. Defaults to run_dir/recluster.
+        """
+        with open(f"{run_dir}/run_manifest.json", "r") as f:
+            manifest = json.load(f)
+
+        config = self.session.config_topic_model
+        if "hdbscan_model" not in config:
+            raise Exception("recluster needs a topic model config with an hdbscan_model")
+        if manifest.get("reduction_key") is None:
+            raise Exception(
+                f"{run_dir} was run without a reduction cache, fit it again with --cache_dir"
+            )
+
+        if manifest.get("cache_dir") and self.session.cache_dir == DEFAULT_CACHE_DIR:
+            self.session.cache_dir = manifest["cache_dir"]
+        if self.session.data_path is None:
+            self.session.data_path = manifest.get("data_path")
+
+        corpus = read_labeled_corpus(run_dir, ["text", "dup_group"])
+        if "dup_group" in corpus:
+            self.session.duplicates = DuplicateGroups(
+                corpus["text"].tolist(), corpus["dup_group"].to_numpy()
+            )
+            self.session.data = self.session.duplicates.unique()
+        else:
+            self.session.duplicates = None
+            self.session.data = corpus["text"].tolist()
+
+        factory = self.session.topic_model_factory
+        factory.build_embedding_model(
+            manifest["embedding_model"], manifest["embedding_revision"]
+        )
+        embeddings = factory.embed_documents(self.session.data, self.session.cache_dir)
+
+        reduced, reducer = ReductionCache(self.session.cache_dir).get(
+            manifest["reduction_key"]
+        )
+        if reduced is None or len(reduced) != len(embeddings):
+            raise Exception(f"The reduced embeddings of {run_dir} are not in the cache")
+
+        cluster_name = list(config["hdbscan_model"].keys())[0]
+        factory.build_cluster_model(cluster_name, config["hdbscan_model"][cluster_name])
+        factory.build_vectorizer_model(config.get("vectorizer_model", {}))
+        factory.build_ctfidf_model(config.get("ctfidf_model", {}))
+        factory.fine_tune = []
+        factory.dimension_reduction_model = PrecomputedReducer(
+            reducer, embeddings, reduced, manifest["reduction_key"]
+        )
+        model = factory.build_topic_model()
+
+        # reuse the 2d layout of the earlier run
+        self.session.embeddings = embeddings
+        projection_path = f"{run_dir}/projection_2d.npy"
+        if os.path.isfile(projection_path):
+            self.session.projection = np.load(projection_path)
+
+        if directory is None or directory == "":
+            directory = f"{run_dir}/recluster"
+
+        self.run_topic_model(model=model, directory=directory, embeddings=embeddings)
+
     def _plot_topic_size_distribution(self, session_data, directory):
         """
         Plot and save the topic size distribution.
         """
+        import matplotlib.pyplot as plt
+
         label_distribution = session_data["label"].value_counts().reset_index()
         os.makedirs(directory, exist_ok=True)
         label_distribution.to_csv(
@@ -243,18 +634,57 @@ class TopicDriver(Driver):
         plt.ylabel("log size")
         plt.savefig(f"{directory}/topic_size_distribution.png")
 
-    def _save_zipf_distribution(self, session_data, directory, formatter):
+    def _save_zipf_distribution(self, session_data, directory, formatter, weights=None):
         """
         Save the Zipf distribution for each topic and a sample.
+
+        The corpus is tokenized once into a sparse document-term matrix. Topic counts are a sparse
+        group-by over the labels and sample counts are sums of randomly chosen rows. The weights of
+        a deduplicated corpus count each row as that many documents.
         """
-        for label in session_data["label"].unique():
-            data = session_data[session_data["label"] == label]
-            if len(data) > 1:
-                topic_dir = f"{directory}/topics/"
-                if not os.path.isdir(topic_dir):
-                    os.makedirs(topic_dir)
-                df = formatter.zipf_data_to_dataframe(data["text"].tolist())
-                sample = session_data.sample(n=len(data) - 1)
-                sample_df = formatter.zipf_data_to_dataframe(sample["text"].tolist())
-                df.to_csv(f"{topic_dir}/{label}_zipf.csv", index=False)
-                sample_df.to_csv(f"{topic_dir}/{label}_sample_zipf.csv", index=False)
+        from scipy.sparse import csr_matrix
+
+        matrix, types = formatter.document_term_matrix(session_data["text"].tolist())
+
+        codes, labels = pd.factorize(session_data["label"])
+        n_docs = len(codes)
+        if weights is None:
+            weights = np.ones(n_docs, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.int64)
+        sizes = np.bincount(codes, weights=weights, minlength=len(labels)).astype(np.int64)
+        membership = csr_matrix(
+            (weights, (codes, np.arange(n_docs))),
+            shape=(len(labels), n_docs),
+        )
+        topic_counts = (membership @ matrix).tocsr()
+
+        topic_dir = f"{directory}/topics/"
+        if np.any(sizes > 1) and not os.path.isdir(topic_dir):
+            os.makedirs(topic_dir)
+
+        rng = np.random.default_rng()
+
+        # draw the samples up front, the generator is not thread safe
+        samples = {}
+        for k in range(len(labels)):
+            if sizes[k] > 1:
+                if n_docs == weights.sum():
+                    rows = rng.choice(n_docs, size=sizes[k] - 1, replace=False)
+                    samples[k] = (rows, np.ones(len(rows), dtype=np.int64))
+                else:
+                    # sample documents without replacement from the weighted rows
+                    draws = rng.multivariate_hypergeometric(weights, sizes[k] - 1)
+                    rows = np.flatnonzero(draws)
+                    samples[k] = (rows, draws[rows])
+
+        def write(k):
+            label = labels[k]
+            rows, multiplicity = samples[k]
+            sample_counts = np.asarray(matrix[rows].T @ multiplicity).ravel()
+            df = formatter.counts_to_dataframe(topic_counts[k], types)
+            sample_df = formatter.counts_to_dataframe(sample_counts, types)
+            df.to_csv(f"{topic_dir}/{label}_zipf.csv", index=False)
+            sample_df.to_csv(f"{topic_dir}/{label}_sample_zipf.csv", index=False)
+
+        with ThreadPoolExecutor(max_workers=self.ZIPF_WRITERS) as pool:
+            list(pool.map(write, samples.keys()))
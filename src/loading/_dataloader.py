@@ -1,7 +1,10 @@
+import gzip
+import io
 import json
+import os
 import pandas as pd
 from src.util._session import Session
-from random import shuffle
+from src.loading._sampler import ReservoirSampler
 
 
 class DataLoader:
@@ -17,6 +20,16 @@ class DataLoader:
     - initialize_session: Initialize a session with data, configurations, and optimization settings.
     """
 
+    # name of the column holding the documents
+    TEXT_COLUMN = "text"
+
+    # number of rows read at a time when streaming a data file
+    CHUNK_SIZE = 100000
+
+    # formats that may be gzip or zstd compressed, read through a decompressing stream
+    COMPRESSIONS = (".gz", ".zst")
+    STREAMED_FORMATS = (".csv", ".json", ".jsonl", ".ndjson")
+
     def __init__(self):
         pass
 
@@ -55,11 +68,6 @@ class DataLoader:
         if data_bool.lower() == "y":
             data_path = input("Please enter the path to the data file: ")
 
-            if num_samples > 0:
-                data = self._load_data(data_path, num_samples)
-            else:
-                data = self._load_data(data_path)
-
             sample_bool = self.prompt_yes_no(
                 "Would you like to sample the data? (y/n): "
             )
@@ -72,8 +80,12 @@ class DataLoader:
                 except ValueError:
                     print("Invalid input. Defaulting to 10000")
 
-                shuffle(data)
-                data = data[:sample_size]
+                if num_samples > 0:
+                    sample_size = min(sample_size, num_samples)
+
+                num_samples = sample_size
+
+            data = self._load_data(data_path, num_samples)
 
         return data
 
@@ -163,6 +175,10 @@ class DataLoader:
         """
         Load data from a file.
 
+        Only the text column is read, in chunks, and null or empty rows are dropped chunk by chunk,
+        so peak memory follows the size of the text rather than the size of the file. When sampling,
+        a reservoir sampler draws the documents during the same pass.
+
         Args:
         - data_path: The path to the data file.
         - num_samples: The number of samples to load from the data file (default: 0).
@@ -170,31 +186,201 @@ class DataLoader:
         Returns:
         - data: The loaded data.
         """
-        data = None
+        chunks = (
+            self._clean_text(chunk[self.TEXT_COLUMN])
+            for chunk in self._iter_chunks(data_path, [self.TEXT_COLUMN])
+        )
 
-        flag = True
+        if num_samples > 0:
+            # sample while streaming so only the reservoir is held in memory
+            return ReservoirSampler.sample_from(chunks, num_samples)
 
-        if data_path.endswith(".csv"):
-            data = pd.read_csv(data_path)
-            flag = False
+        data = []
+        for chunk in chunks:
+            data.extend(chunk)
+
+        return data
+
+    def _file_format(self, data_path: str) -> str:
+        """
+        Find the format of a data file from its extension, ignoring a compression suffix.
 
-        elif data_path.endswith(".json"):
+        Args:
+        - data_path: The path to the data file.
+
+        Returns:
+        - format: The extension of the data file, e.g. ".csv" or ".parquet".
+        """
+        path = data_path.lower()
+        compressed = path.endswith(self.COMPRESSIONS)
+        if compressed:
+            path = os.path.splitext(path)[0]
+
+        file_format = os.path.splitext(path)[1]
+
+        if compressed and file_format not in self.STREAMED_FORMATS:
+            raise Exception("File type not supported")
+
+        return file_format
+
+    def _iter_chunks(self, data_path: str, columns: list):
+        """
+        Stream a data file in chunks, reading only the given columns.
+
+        Parquet and Arrow IPC (Feather) files are memory mapped and yield Arrow record batches, so
+        the text column is never converted to pandas. The other formats yield DataFrames.
+
+        Args:
+        - data_path: The path to the data file.
+        - columns: The columns to read. Columns missing from the file are skipped.
+
+        Returns:
+        - chunks: An iterator of DataFrames or Arrow record batches.
+        """
+        file_format = self._file_format(data_path)
+
+        if file_format == ".csv":
+            # fix the dtype so that type inference cannot differ between chunks
+            yield from pd.read_csv(
+                data_path,
+                usecols=lambda c: c in columns,
+                dtype={c: str for c in columns},
+                chunksize=self.CHUNK_SIZE,
+            )
+
+        elif file_format == ".json":
+            # a json array cannot be streamed, but only the projected columns are kept
             data = pd.read_json(data_path)
-            flag = False
+            yield data[[c for c in columns if c in data.columns]]
 
-        if flag:
+        elif file_format in (".jsonl", ".ndjson"):
+            yield from self._iter_json_lines(data_path, columns)
+
+        elif file_format == ".parquet":
+            import pyarrow.parquet as pq
+
+            parquet = pq.ParquetFile(data_path, memory_map=True)
+            names = parquet.schema_arrow.names
+            yield from parquet.iter_batches(
+                batch_size=self.CHUNK_SIZE,
+                columns=[c for c in columns if c in names],
+            )
+
+        elif file_format in (".arrow", ".feather", ".ipc"):
+            import pyarrow as pa
+
+            with pa.memory_map(data_path, "r") as source:
+                try:
+                    reader = pa.ipc.open_file(source)
+                    batches = (
+                        reader.get_batch(i) for i in range(reader.num_record_batches)
+                    )
+                except pa.ArrowInvalid:
+                    source.seek(0)
+                    batches = pa.ipc.open_stream(source)
+
+                for batch in batches:
+                    yield batch.select([c for c in columns if c in batch.schema.names])
+
+        else:
             raise Exception("File type not supported")
 
-        if num_samples > 0:
-            data = data.sample(num_samples)
+    def _open_text(self, data_path: str):
+        """
+        Open a text file, decompressing gzip and zstd files as a stream.
 
-        # extract the text column
-        data = data["text"].to_list()
+        Args:
+        - data_path: The path to the file.
 
-        # remove any null values and empty strings
-        data = [x for x in data if str(x) != "nan" and str(x) != ""]
+        Returns:
+        - file: A text file object.
+        """
+        if data_path.lower().endswith(".gz"):
+            return gzip.open(data_path, "rt", encoding="utf-8")
 
-        return data
+        if data_path.lower().endswith(".zst"):
+            import zstandard
+
+            stream = zstandard.ZstdDecompressor().stream_reader(open(data_path, "rb"))
+            return io.TextIOWrapper(stream, encoding="utf-8")
+
+        return open(data_path, "r", encoding="utf-8")
+
+    def _iter_json_lines(self, data_path: str, columns: list):
+        """
+        Stream a JSON Lines file in chunks, keeping only the given fields of each record.
+
+        Args:
+        - data_path: The path to the data file.
+        - columns: The fields to read.
+
+        Returns:
+        - chunks: An iterator of DataFrames.
+        """
+        chunk = {c: [] for c in columns}
+        size = 0
+
+        with self._open_text(data_path) as file:
+            for line in file:
+                if not line.strip():
+                    continue
+
+                record = json.loads(line)
+                for c in columns:
+                    chunk[c].append(record.get(c))
+                size += 1
+
+                if size == self.CHUNK_SIZE:
+                    yield pd.DataFrame(chunk)
+                    chunk = {c: [] for c in columns}
+                    size = 0
+
+        if size > 0:
+            yield pd.DataFrame(chunk)
+
+    def _read_columns(self, data_path: str, columns: list) -> pd.DataFrame:
+        """
+        Read the given columns of a data file of any supported format into a DataFrame.
+
+        Args:
+        - data_path: The path to the data file.
+        - columns: The columns to read.
+
+        Returns:
+        - data: The projected data.
+        """
+        frames = [
+            chunk if isinstance(chunk, pd.DataFrame) else chunk.to_pandas()
+            for chunk in self._iter_chunks(data_path, columns)
+        ]
+
+        if not frames:
+            return pd.DataFrame(columns=columns)
+
+        return pd.concat(frames, ignore_index=True)
+
+    def _clean_text(self, texts) -> list:
+        """
+        Remove null values and empty strings from a chunk of the text column.
+
+        Args:
+        - texts: A chunk of the text column, as a pandas Series or an Arrow array.
+
+        Returns:
+        - texts: The remaining texts.
+        """
+        if not isinstance(texts, pd.Series):
+            # filter the arrow column in place of a pandas round trip
+            import pyarrow as pa
+            import pyarrow.compute as pc
+
+            texts = texts.drop_null().cast(pa.string())
+            keep = pc.invert(pc.is_in(texts, value_set=pa.array(["", "nan"])))
+            return texts.filter(keep).to_pylist()
+
+        texts = texts[texts.notna()]
+        as_str = texts.astype(str)
+        return texts[(as_str != "") & (as_str != "nan")].tolist()
 
     def _load_config(self, config_path: str):
         """
@@ -0,0 +1,229 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.util._cache import hash_text
+
+
+def _dedup_key(text) -> str:
+    """
+    Normalizes a document for duplicate detection, ignoring case and runs of whitespace.
+    """
+    return " ".join(str(text).split()).casefold()
+
+
+def _renumber(labels: np.ndarray) -> np.ndarray:
+    """
+    Renumbers group labels 0..n-1 in the order in which each group first occurs.
+    """
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind="stable")] = np.arange(len(first))
+    return rank[inverse.ravel()]
+
+
+class DuplicateGroups:
+    """
+    Maps every document of a corpus to the group of copies it belongs to.
+
+    Groups are numbered in order of first occurrence and represented by their first document, so the
+    unique documents keep the order of the corpus.
+
+    Args:
+        documents (list): The original corpus.
+        inverse (np.ndarray): The group of each document.
+
+    Attributes:
+        documents (list): The original corpus.
+        inverse (np.ndarray): The group of each document.
+        counts (np.ndarray): The number of documents in each group, used as weights downstream.
+        representatives (np.ndarray): The index of the first document of each group.
+
+    Methods:
+        unique: Returns the representative document of each group.
+    """
+
+    def __init__(self, documents: list, inverse: np.ndarray):
+        self.documents = documents
+        self.inverse = _renumber(np.asarray(inverse, dtype=np.int64))
+        self.counts = np.bincount(self.inverse)
+        self.representatives = np.full(len(self.counts), len(documents), dtype=np.int64)
+        np.minimum.at(self.representatives, self.inverse, np.arange(len(documents)))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def unique(self) -> list:
+        """
+        Returns the representative document of each group.
+
+        Returns:
+            list: One document per group, in corpus order.
+        """
+        return [self.documents[i] for i in self.representatives]
+
+
+class MinHashLSH:
+    """
+    Groups near-duplicate documents with MinHash signatures over character shingles and banded LSH.
+
+    Documents sharing a band become candidates, and a candidate is merged into a group only when the
+    share of equal signature values, an estimate of the Jaccard similarity, reaches the threshold.
+
+    Args:
+        threshold (float, optional): The estimated Jaccard similarity above which two documents are merged. Defaults to 0.8.
+        num_perm (int, optional): The number of hash permutations. Defaults to 128.
+        bands (int, optional): The number of LSH bands, which must divide num_perm. Defaults to 16.
+        shingle_size (int, optional): The number of characters per shingle. Defaults to 5.
+        seed (int, optional): The seed of the hash permutations. Defaults to 42.
+
+    Methods:
+        signatures: Computes the MinHash signature of every document.
+        groups: Labels every document with its near-duplicate group.
+    """
+
+    # multiply-shift hashing: the high 32 bits of a * x + b modulo 2**64
+    SHIFT = np.uint64(32)
+
+    # number of shingles permuted at a time, bounding the (num_perm, shingles) work array
+    BLOCK_SHINGLES = 65536
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 5,
+        seed: int = 42,
+    ):
+        if num_perm % bands != 0:
+            raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm})")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self.base = rng.integers(0, 1 << 63, size=shingle_size, dtype=np.uint64) * 2 + 1
+        self.a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) * 2 + 1
+        self.b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    def _shingles(self, text: str) -> np.ndarray:
+        """
+        Hashes the distinct character shingles of a document to 32 bit values.
+        """
+        codes = np.frombuffer(
+            _dedup_key(text).encode("utf-32-le"), dtype=np.uint32
+        ).astype(np.uint64)
+        if len(codes) < self.shingle_size:
+            windows = codes[None, :]
+        else:
+            windows = sliding_window_view(codes, self.shingle_size)
+        return np.unique((windows @ self.base[: windows.shape[1]]) >> self.SHIFT)
+
+    def signatures(self, documents: list) -> np.ndarray:
+        """
+        Computes the MinHash signature of every document.
+
+        Args:
+            documents (list): The documents to sign.
+
+        Returns:
+            np.ndarray: A uint32 array of shape (len(documents), num_perm).
+        """
+        n = len(documents)
+        signatures = np.empty((n, self.num_perm), dtype=np.uint32)
+
+        start = 0
+        while start < n:
+            # permute the shingles of a block of documents at once and reduce per document
+            hashes, offsets, end = [], [0], start
+            while end < n and offsets[-1] < self.BLOCK_SHINGLES:
+                hashes.append(self._shingles(documents[end]))
+                offsets.append(offsets[-1] + len(hashes[-1]))
+                end += 1
+
+            hashes = np.concatenate(hashes)
+            permuted = np.multiply(self.a[:, None], hashes[None, :])
+            permuted += self.b[:, None]
+            permuted >>= self.SHIFT
+            signatures[start:end] = np.minimum.reduceat(permuted, offsets[:-1], axis=1).T
+            start = end
+
+        return signatures
+
+    def groups(self, documents: list) -> np.ndarray:
+        """
+        Labels every document with its near-duplicate group.
+
+        Args:
+            documents (list): The documents to group.
+
+        Returns:
+            np.ndarray: The group label of each document.
+        """
+        signatures = self.signatures(documents)
+        n = len(documents)
+        parent = np.arange(n)
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        rows = self.num_perm // self.bands
+        for band in range(self.bands):
+            block = np.ascontiguousarray(signatures[:, band * rows : (band + 1) * rows])
+            keys = block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel()
+            _, buckets = np.unique(keys, return_inverse=True)
+            buckets = buckets.ravel()
+
+            # pair every document with the first member of its bucket
+            order = np.argsort(buckets, kind="stable")
+            starts = np.r_[0, np.flatnonzero(np.diff(buckets[order])) + 1]
+            heads = np.repeat(order[starts], np.diff(np.r_[starts, n]))
+            candidates = heads != order
+            heads, members = heads[candidates], order[candidates]
+            if len(members) == 0:
+                continue
+
+            similarity = (signatures[heads] == signatures[members]).mean(axis=1)
+            for head, member in zip(
+                heads[similarity >= self.threshold], members[similarity >= self.threshold]
+            ):
+                root_head, root_member = find(head), find(member)
+                if root_head != root_member:
+                    parent[max(root_head, root_member)] = min(root_head, root_member)
+
+        return np.array([find(i) for i in range(n)], dtype=np.int64)
+
+
+def find_duplicates(documents: list, near: bool = False, **lsh_params) -> DuplicateGroups:
+    """
+    Groups the exact, and optionally near, duplicates of a corpus.
+
+    Exact duplicates share the hash of their case and whitespace normalized text. Near duplicates
+    are then grouped among the exact representatives with MinHash/LSH.
+
+    Args:
+        documents (list): The corpus.
+        near (bool, optional): Whether to also group near duplicates. Defaults to False.
+        **lsh_params: Parameters of MinHashLSH.
+
+    Returns:
+        DuplicateGroups: The duplicate group of every document.
+    """
+    keys = {}
+    inverse = np.fromiter(
+        (keys.setdefault(hash_text(_dedup_key(d)), len(keys)) for d in documents),
+        dtype=np.int64,
+        count=len(documents),
+    )
+    groups = DuplicateGroups(documents, inverse)
+
+    if near and len(groups) > 1:
+        near_labels = MinHashLSH(**lsh_params).groups(groups.unique())
+        groups = DuplicateGroups(documents, near_labels[groups.inverse])
+
+    return groups
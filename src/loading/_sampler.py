@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class ReservoirSampler:
+    """
+    Draws a uniform random sample of a fixed size from a stream in a single pass.
+
+    Implements reservoir sampling (Algorithm R) with the random draws vectorized per chunk, so only
+    the reservoir is held in memory no matter how long the stream is.
+
+    Args:
+        size (int): The number of items to sample.
+        seed (int, optional): The seed of the random generator. Defaults to 42.
+
+    Methods:
+        extend: Feeds a chunk of the stream to the sampler.
+        sample: Returns the current sample.
+        sample_from: Samples an iterable of chunks or a list in one call.
+    """
+
+    def __init__(self, size: int, seed: int = 42):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.reservoir = []
+        self.seen = 0
+
+    def extend(self, items: list):
+        """
+        Feeds a chunk of the stream to the sampler.
+
+        Args:
+            items (list): The next items of the stream.
+        """
+        fill = max(0, min(len(items), self.size - len(self.reservoir)))
+        self.reservoir.extend(items[:fill])
+
+        rest = len(items) - fill
+        if rest > 0:
+            # item j of the stream replaces a random slot with probability size / (j + 1)
+            positions = self.seen + fill + np.arange(rest)
+            slots = self.rng.integers(0, positions + 1)
+            for i in np.flatnonzero(slots < self.size):
+                self.reservoir[slots[i]] = items[fill + i]
+
+        self.seen += len(items)
+
+    def sample(self) -> list:
+        """
+        Returns the current sample.
+
+        Returns:
+            list: Up to `size` items drawn uniformly from everything seen so far.
+        """
+        return list(self.reservoir)
+
+    @classmethod
+    def sample_from(cls, items, size: int, seed: int = 42) -> list:
+        """
+        Samples a list, or an iterable of list chunks, in one call.
+
+        Args:
+            items: A list, or an iterator of lists.
+            size (int): The number of items to sample.
+            seed (int, optional): The seed of the random generator. Defaults to 42.
+
+        Returns:
+            list: The sample.
+        """
+        sampler = cls(size, seed)
+        if isinstance(items, list):
+            sampler.extend(items)
+        else:
+            for chunk in items:
+                sampler.extend(chunk)
+        return sampler.sample()
@@ -6,7 +6,7 @@ from menus.topic._cluster import ClusterMenu
 from menus.topic._fine_tune import FineTuneMenu
 from menus.topic._plotting import TopicPlottingMenu
 from menus._configmenu import ConfigMenu
-from random import shuffle
+from loading._sampler import ReservoirSampler
 
 
 class TopicMenu(Menu):
@@ -53,10 +53,16 @@ class TopicMenu(Menu):
             elif choice == 6:
                 sample_size = self.prompt_numeric("Please enter the sample size: ")
 
-                data = self.session.data
-
-                shuffle(data)
-                self.session.data = data[:sample_size]
+                if self.session.duplicates is not None:
+                    # sample the original documents and group the copies in the sample again
+                    self.session.data = ReservoirSampler.sample_from(
+                        self.session.duplicates.documents, sample_size
+                    )
+                    self.session.deduplicate(self.session.dedup_mode)
+                else:
+                    self.session.data = ReservoirSampler.sample_from(
+                        self.session.data, sample_size
+                    )
 
                 return self
             elif choice == 7:
@@ -1,20 +1,11 @@
-import torch
-from transformers import (
-    LlamaForCausalLM,
-    LlamaTokenizer,
-    default_data_collator,
-    Trainer,
-    TrainingArguments,
-    DataCollatorForLanguageModeling,
-)
-from datasets import load_dataset
 from pathlib import Path
 import json
 from datetime import datetime
-from peft import get_peft_model, LoraConfig, TaskType
-from transformers import TrainerCallback
 from contextlib import nullcontext
 
+# torch, transformers, datasets and peft are imported by the methods that use them, so that the CLI
+# can build a FineTuner without loading them
+
 """
 Tuning Logic from https://github.com/jstonge/kitty-llama/
 """
@@ -40,6 +31,9 @@ class FineTuner:
         self.output_path = output_path
 
     def load_model(self, model_filepath):
+        import torch
+        from transformers import LlamaForCausalLM, LlamaTokenizer
+
         tokenizer = LlamaTokenizer.from_pretrained(model_filepath)
         model = LlamaForCausalLM.from_pretrained(
             model_filepath, device_map="auto", torch_dtype=torch.float16
@@ -47,6 +41,8 @@ class FineTuner:
         return model, tokenizer
 
     def split_data(self, data_filepath, train_test_split_ratio=0.5):
+        from datasets import load_dataset
+
         dataset = load_dataset("json", data_files=data_filepath)
         dataset = dataset["train"].train_test_split(
             test_size=train_test_split_ratio, seed=42, shuffle=True
@@ -67,6 +63,10 @@ class FineTuner:
         return tokenizer(formatting_func(prompt, format_str))
 
     def initialize_training(self, model):
+        import torch
+        from peft import get_peft_model, LoraConfig, TaskType
+        from transformers import TrainerCallback
+
         peft_config = LoraConfig(
             task_type=TaskType.CAUSAL_LM,
             inference_mode=False,
@@ -137,6 +137,12 @@ class FineTuner:
         config,
         total_steps,
     ):
+        from transformers import (
+            Trainer,
+            TrainingArguments,
+            DataCollatorForLanguageModeling,
+        )
+
         # Define training args
         training_args = TrainingArguments(
             output_dir=self.output_path,
@@ -0,0 +1,232 @@
+import json
+import os
+
+import numpy as np
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale rows to unit length, so that dot products are cosine similarities.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class IVFIndex:
+    """
+    An inverted file index for cosine similarity search over document embeddings, in NumPy.
+
+    Vectors are normalized and bucketed by their closest k-means centroid. A query scores the
+    centroids, then scores the vectors of its n_probe closest lists exactly, so it only touches a
+    fraction of a large corpus. The vectors are stored as float16 in list order and memory mapped on
+    load, so opening the index of a large run reads almost nothing.
+
+    Args:
+        centroids (np.ndarray): The unit length centroid of every list.
+        offsets (np.ndarray): Where each list starts in vectors, with the total count appended.
+        vectors (np.ndarray): The unit length vectors, grouped by list.
+        ids (np.ndarray): The id of every vector, e.g. its row in labeled_corpus.csv.
+        labels (np.ndarray, optional): The topic of every vector, to search within a topic.
+
+    Methods:
+        build: Builds an index over embeddings.
+        save: Saves the index to a directory.
+        load: Loads an index saved to a directory.
+        search: Returns the ids and similarities of the closest vectors to each query.
+    """
+
+    # corpora smaller than this are one list, searched exactly
+    EXACT_SIZE = 10000
+
+    # number of vectors the centroids are trained on
+    TRAIN_SIZE = 100000
+
+    # number of lists searched per query
+    N_PROBE = 8
+
+    # number of vectors normalized and assigned at a time
+    CHUNK_SIZE = 65536
+
+    def __init__(self, centroids, offsets, vectors, ids, labels=None):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.ids = ids
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        labels: np.ndarray = None,
+        ids: np.ndarray = None,
+        n_lists: int = None,
+        random_state: int = 42,
+    ):
+        """
+        Builds an index over embeddings.
+
+        Args:
+            embeddings (np.ndarray): One row per document.
+            labels (np.ndarray, optional): The topic of every document.
+            ids (np.ndarray, optional): The id returned for every document. Defaults to its position.
+            n_lists (int, optional): The number of lists. Defaults to the square root of the corpus size, or one list for small corpora.
+            random_state (int, optional): The seed of the centroid training. Defaults to 42.
+
+        Returns:
+            IVFIndex: The built index.
+        """
+        n_docs = len(embeddings)
+        if n_lists is None:
+            n_lists = 1 if n_docs < cls.EXACT_SIZE else int(np.sqrt(n_docs))
+        n_lists = max(1, min(n_lists, n_docs))
+
+        if n_lists == 1:
+            centroids = _normalize(np.mean(embeddings, axis=0, keepdims=True))
+            assignments = np.zeros(n_docs, dtype=np.int64)
+        else:
+            from sklearn.cluster import MiniBatchKMeans
+
+            rng = np.random.default_rng(random_state)
+            sample = rng.choice(n_docs, size=min(n_docs, cls.TRAIN_SIZE), replace=False)
+            kmeans = MiniBatchKMeans(
+                n_clusters=n_lists, n_init=1, random_state=random_state
+            ).fit(_normalize(embeddings[np.sort(sample)]))
+            centroids = _normalize(kmeans.cluster_centers_)
+
+            assignments = np.empty(n_docs, dtype=np.int64)
+            for start in range(0, n_docs, cls.CHUNK_SIZE):
+                chunk = _normalize(embeddings[start : start + cls.CHUNK_SIZE])
+                assignments[start : start + len(chunk)] = np.argmax(
+                    chunk @ centroids.T, axis=1
+                )
+
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignments, minlength=n_lists))
+
+        # copy the vectors over in list order a chunk at a time, without a float32 copy of the corpus
+        vectors = np.empty((n_docs, embeddings.shape[1]), dtype=np.float16)
+        for start in range(0, n_docs, cls.CHUNK_SIZE):
+            rows = order[start : start + cls.CHUNK_SIZE]
+            vectors[start : start + len(rows)] = _normalize(embeddings[rows])
+
+        ids = np.arange(n_docs) if ids is None else np.asarray(ids)
+        if labels is not None:
+            labels = np.asarray(labels, dtype=np.int64)[order]
+
+        return cls(centroids, offsets, vectors, ids[order].astype(np.int64), labels)
+
+    def save(self, directory: str) -> str:
+        """
+        Saves the index to a directory.
+
+        Args:
+            directory (str): The index directory.
+
+        Returns:
+            str: The index directory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(f"{directory}/centroids.npy", self.centroids)
+        np.save(f"{directory}/offsets.npy", self.offsets)
+        np.save(f"{directory}/vectors.npy", self.vectors)
+        np.save(f"{directory}/ids.npy", self.ids)
+        if self.labels is not None:
+            np.save(f"{directory}/labels.npy", self.labels)
+
+        with open(f"{directory}/index.json", "w") as f:
+            json.dump(
+                {
+                    "type": "ivf",
+                    "metric": "cosine",
+                    "documents": len(self.ids),
+                    "dimension": int(self.vectors.shape[1]),
+                    "n_lists": len(self.centroids),
+                },
+                f,
+                indent=4,
+            )
+        return directory
+
+    @classmethod
+    def load(cls, directory: str):
+        """
+        Loads an index saved to a directory, memory mapping its vectors.
+
+        Args:
+            directory (str): The index directory.
+
+        Returns:
+            IVFIndex: The loaded index.
+        """
+        if not os.path.isfile(f"{directory}/index.json"):
+            raise Exception(f"No similarity index in {directory}")
+
+        labels = None
+        if os.path.isfile(f"{directory}/labels.npy"):
+            labels = np.load(f"{directory}/labels.npy")
+
+        return cls(
+            np.load(f"{directory}/centroids.npy"),
+            np.load(f"{directory}/offsets.npy"),
+            np.load(f"{directory}/vectors.npy", mmap_mode="r"),
+            np.load(f"{directory}/ids.npy"),
+            labels,
+        )
+
+    def search(
+        self, queries: np.ndarray, k: int = 10, n_probe: int = None, label: int = None
+    ) -> list:
+        """
+        Returns the ids and similarities of the closest vectors to each query.
+
+        Args:
+            queries (np.ndarray): One embedding, or one row per query.
+            k (int, optional): The number of results per query. Defaults to 10.
+            n_probe (int, optional): The number of lists searched. Defaults to N_PROBE.
+            label (int, optional): Only search the vectors of this topic, exactly.
+
+        Returns:
+            list: An (ids, similarities) pair of arrays per query, most similar first.
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        n_probe = min(n_probe or self.N_PROBE, len(self.centroids))
+
+        if label is not None:
+            if self.labels is None:
+                raise Exception("The index was built without topic labels")
+            members = np.flatnonzero(self.labels == label)
+
+        results = []
+        for query in queries:
+            if label is not None:
+                candidates = members
+                scores = self.vectors[candidates].astype(np.float32) @ query
+            else:
+                lists = np.argsort(-(self.centroids @ query))[:n_probe]
+                candidates = np.concatenate(
+                    [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+                )
+                scores = np.concatenate(
+                    [
+                        self.vectors[self.offsets[i] : self.offsets[i + 1]].astype(np.float32)
+                        @ query
+                        for i in lists
+                    ]
+                )
+
+            top = min(k, len(scores))
+            if top == 0:
+                best = np.zeros(0, dtype=np.int64)
+            else:
+                best = np.argpartition(-scores, top - 1)[:top]
+                best = best[np.argsort(-scores[best], kind="stable")]
+            results.append((self.ids[candidates[best]], scores[best]))
+
+        return results
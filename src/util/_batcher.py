@@ -0,0 +1,195 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class _Request:
+    """
+    The documents of one caller, waiting for their results.
+    """
+
+    def __init__(self, items: list):
+        self.items = items
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests into batches for a single model worker.
+
+    A batch is closed once it holds max_batch_size documents or once its oldest request has waited
+    max_latency_ms, whichever comes first, and is processed by one call on the worker thread, so the
+    model is never called concurrently. Each caller blocks until the results of its own documents
+    are back.
+
+    Args:
+        process (callable): Maps a list of documents to a list with one result per document.
+        max_batch_size (int, optional): The number of documents that closes a batch. Defaults to 64.
+        max_latency_ms (float, optional): How long the oldest request waits for a batch to fill. Defaults to 10.
+        window (int, optional): The number of recent requests the latency percentiles are computed over. Defaults to 10000.
+
+    Methods:
+        start: Starts the worker thread.
+        stop: Processes the pending requests and stops the worker thread.
+        submit: Submits documents and waits for their results.
+        stats: Returns the latency percentiles, queue depth and batch counts.
+    """
+
+    def __init__(
+        self,
+        process,
+        max_batch_size: int = 64,
+        max_latency_ms: float = 10.0,
+        window: int = 10000,
+    ):
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self._latencies = deque(maxlen=window)
+        self._queue_depth = 0
+        self._max_queue_depth = 0
+        self._requests = 0
+        self._documents = 0
+        self._batches = 0
+
+    def start(self):
+        """
+        Starts the worker thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Processes the pending requests and stops the worker thread.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, items: list) -> list:
+        """
+        Submits documents and waits for their results.
+
+        Args:
+            items (list): The documents of this request.
+
+        Returns:
+            list: One result per document.
+        """
+        if len(items) == 0:
+            return []
+        if self._thread is None:
+            raise Exception("The batcher is not running, call start first")
+
+        request = _Request(items)
+        with self._lock:
+            self._queue_depth += len(items)
+            self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+        self._queue.put(request)
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def stats(self) -> dict:
+        """
+        Returns the latency percentiles, queue depth and batch counts.
+
+        Returns:
+            dict: The p50 and p99 latency in ms over the recent requests, the number of documents
+            waiting, the most that ever waited, and the request, document and batch counts.
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            batches = self._batches
+            return {
+                "requests": self._requests,
+                "documents": self._documents,
+                "batches": batches,
+                "mean_batch_size": self._documents / batches if batches else 0.0,
+                "queue_depth": self._queue_depth,
+                "max_queue_depth": self._max_queue_depth,
+                "latency_ms": {
+                    "p50": float(np.percentile(latencies, 50)) if len(latencies) else None,
+                    "p99": float(np.percentile(latencies, 99)) if len(latencies) else None,
+                },
+            }
+
+    def _collect(self, first: _Request) -> tuple:
+        """
+        Collects requests after the first one until the batch is full or the deadline passes.
+
+        Returns:
+            tuple: The requests of the batch and whether the batcher was asked to stop.
+        """
+        batch = [first]
+        size = len(first.items)
+        deadline = first.enqueued + self.max_latency
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+            size += len(request.items)
+
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+
+            items = [item for request in batch for item in request.items]
+            with self._lock:
+                self._queue_depth -= len(items)
+
+            try:
+                results = list(self.process(items))
+                if len(results) != len(items):
+                    raise ValueError(
+                        f"process returned {len(results)} results for {len(items)} documents"
+                    )
+                error = None
+            except Exception as e:
+                error = e
+
+            start = 0
+            now = time.perf_counter()
+            for request in batch:
+                if error is None:
+                    request.results = results[start : start + len(request.items)]
+                else:
+                    request.error = error
+                start += len(request.items)
+                request.done.set()
+
+            with self._lock:
+                self._latencies.extend(now - request.enqueued for request in batch)
+                self._requests += len(batch)
+                self._documents += len(items)
+                self._batches += 1
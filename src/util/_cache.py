@@ -0,0 +1,615 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import sqlite3
+import unicodedata
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - locking is best effort off POSIX
+    fcntl = None
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "lnlp")
+
+
+def normalize_text(text) -> str:
+    """
+    Normalizes a document before hashing so that trivially different copies share a key.
+
+    Args:
+        text: The document to normalize.
+
+    Returns:
+        str: The NFC normalized document with surrounding whitespace removed.
+    """
+    return unicodedata.normalize("NFC", str(text)).strip()
+
+
+def hash_text(text) -> str:
+    """
+    Computes the content hash of a normalized document.
+
+    Args:
+        text: The document to hash.
+
+    Returns:
+        str: A 32 character hex digest.
+    """
+    return hashlib.blake2b(
+        normalize_text(text).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+def hash_texts(texts) -> list:
+    """
+    Computes the content hash of every document in a corpus.
+
+    Args:
+        texts (list): The documents to hash.
+
+    Returns:
+        list: The hex digest of each document, in order.
+    """
+    return [hash_text(text) for text in texts]
+
+
+def _cache_entries(cache_dir: str) -> list:
+    """
+    List the evictable entries of a cache root: one per (model, revision) embedding directory and
+    one per cached reduction, with their size in bytes, last use and the lock writers hold.
+    """
+    entries = []
+    embeddings = os.path.join(cache_dir, "embeddings")
+    if os.path.isdir(embeddings):
+        for slug in sorted(os.listdir(embeddings)):
+            for revision in sorted(os.listdir(os.path.join(embeddings, slug))):
+                directory = os.path.join(embeddings, slug, revision)
+                if not os.path.isdir(directory):
+                    continue
+                files = [os.path.join(directory, name) for name in os.listdir(directory)]
+                entries.append(
+                    {
+                        "name": f"embeddings/{slug}/{revision}",
+                        "paths": [directory],
+                        "bytes": sum(os.path.getsize(f) for f in files if os.path.isfile(f)),
+                        "used": os.path.getmtime(directory),
+                        "lock": os.path.join(directory, ".lock"),
+                    }
+                )
+
+    reductions = os.path.join(cache_dir, "reductions")
+    if os.path.isdir(reductions):
+        for name in sorted(os.listdir(reductions)):
+            if not name.endswith(".npy"):
+                continue
+            key = name[: -len(".npy")]
+            paths = [
+                os.path.join(reductions, f"{key}{ext}")
+                for ext in [".npy", ".pkl"]
+                if os.path.isfile(os.path.join(reductions, f"{key}{ext}"))
+            ]
+            entries.append(
+                {
+                    "name": f"reductions/{key}",
+                    "paths": paths,
+                    "bytes": sum(os.path.getsize(p) for p in paths),
+                    "used": max(os.path.getmtime(p) for p in paths),
+                    "lock": None,
+                }
+            )
+    return entries
+
+
+def cache_usage(cache_dir: str) -> dict:
+    """
+    Reports the disk usage of a cache root.
+
+    Args:
+        cache_dir (str): The root directory of the cache.
+
+    Returns:
+        dict: The size in bytes of every embedding directory and of the reductions and sentiment scores.
+    """
+    usage = {}
+    for entry in _cache_entries(cache_dir):
+        name = entry["name"] if entry["name"].startswith("embeddings/") else "reductions"
+        usage[name] = usage.get(name, 0) + entry["bytes"]
+
+    sentiment = os.path.join(cache_dir, "sentiment.sqlite")
+    for path in [sentiment, f"{sentiment}-wal"]:
+        if os.path.isfile(path):
+            usage["sentiment.sqlite"] = usage.get("sentiment.sqlite", 0) + os.path.getsize(path)
+    return usage
+
+
+def prune_cache(cache_dir: str, max_bytes: int) -> list:
+    """
+    Evicts the least recently used embedding directories and reductions of a cache root until the
+    evictable entries fit in max_bytes, and prints the usage of the cache.
+
+    The sentiment scores are reported but never evicted, they are small and keyed by model. An
+    embedding directory another job is writing to is skipped rather than waited for.
+
+    Args:
+        cache_dir (str): The root directory of the cache.
+        max_bytes (int): The size the embeddings and reductions are pruned to.
+
+    Returns:
+        list: The names of the evicted entries.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+
+    evicted = []
+    with _locked(os.path.join(cache_dir, ".prune.lock")):
+        entries = sorted(_cache_entries(cache_dir), key=lambda entry: entry["used"])
+        total = sum(entry["bytes"] for entry in entries)
+        for entry in entries:
+            if total <= max_bytes:
+                break
+            lock = entry["lock"]
+            with _locked(lock, blocking=False) if lock else nullcontext(True) as acquired:
+                if not acquired:
+                    print(f"Not evicting {entry['name']}, another job is writing to it")
+                    continue
+                for path in entry["paths"]:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    elif os.path.isfile(path):
+                        os.remove(path)
+            total -= entry["bytes"]
+            evicted.append(entry["name"])
+
+    for name, size in sorted(cache_usage(cache_dir).items()):
+        print(f"Cache {name}: {size / 2**20:.1f} MB")
+    if evicted:
+        print(f"Evicted {len(evicted)} cache entries to fit {max_bytes / 2**30:.2f} GB")
+    return evicted
+
+
+@contextmanager
+def _locked(path: str, blocking: bool = True):
+    """
+    Holds an exclusive lock on `path` so concurrent jobs sharing a cache do not interleave writes.
+
+    Yields whether the lock was acquired, which is always the case unless blocking is False and
+    another job holds it.
+    """
+    with open(path, "a") as handle:
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class EmbeddingCache:
+    """
+    A persistent, content-addressed store of document embeddings.
+
+    Vectors are appended as raw float32 rows to a single file per (model, revision) and read back
+    through a memory map, so a corpus that has been embedded once is never sent to the encoder again.
+    The revision should be the commit hash the model was loaded at, as resolved by
+    TopicModelFactory.build_embedding_model; a floating name such as "main" keeps serving the
+    vectors of whichever commit first filled the cache.
+
+    Args:
+        cache_dir (str): The root directory of the cache.
+        model_name (str): The name of the embedding model.
+        revision (str, optional): The commit hash of the embedding model. Defaults to "main".
+
+    Methods:
+        lookup: Finds the cached rows of a list of document hashes.
+        get: Reads cached vectors by row.
+        put: Appends new vectors to the cache.
+        get_or_compute: Returns the embeddings of a corpus, encoding only the cache misses.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, revision: str = "main"):
+        self.model_name = model_name
+        self.revision = revision if revision else "main"
+        slug = re.sub(r"[^\w.-]+", "__", model_name)
+        self.directory = os.path.join(
+            cache_dir, "embeddings", slug, re.sub(r"[^\w.-]+", "__", self.revision)
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        # the modification time of the directory records its last use, for prune_cache
+        os.utime(self.directory)
+
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.keys_path = os.path.join(self.directory, "keys.txt")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock_path = os.path.join(self.directory, ".lock")
+
+        self._index = {}
+        self._dim = None
+        # how far keys.txt has been read, so that later reads only parse appended keys
+        self._keys_offset = 0
+        self._read_index()
+
+    def _read_index(self):
+        if not os.path.isfile(self.keys_path):
+            # nothing was cached yet, or prune_cache evicted the directory since it was read
+            self._index = {}
+            self._keys_offset = 0
+            self._dim = None
+        if self._dim is None and os.path.isfile(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                self._dim = json.load(f)["dim"]
+        if not os.path.isfile(self.keys_path):
+            return
+        if os.path.getsize(self.keys_path) < self._keys_offset:
+            # the cache was evicted and filled again since it was read
+            self._index = {}
+            self._keys_offset = 0
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # a key another job is still writing
+                    break
+                self._keys_offset += len(line)
+                parts = line.split()
+                if len(parts) == 2:
+                    self._index[parts[0].decode("ascii")] = int(parts[1])
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def dim(self):
+        return self._dim
+
+    def lookup(self, hashes: list) -> np.ndarray:
+        """
+        Finds the cached rows of a list of document hashes.
+
+        Args:
+            hashes (list): The document hashes to look up.
+
+        Returns:
+            np.ndarray: The row of each hash in the vector file, or -1 for a miss.
+        """
+        return np.fromiter(
+            (self._index.get(h, -1) for h in hashes), dtype=np.int64, count=len(hashes)
+        )
+
+    def get(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Reads cached vectors by row.
+
+        Args:
+            rows (np.ndarray): The rows to read.
+
+        Returns:
+            np.ndarray: A float32 array of shape (len(rows), dim).
+        """
+        if len(rows) == 0 or self._dim is None:
+            return np.empty((len(rows), self._dim or 0), dtype=np.float32)
+        n_rows = os.path.getsize(self.vectors_path) // (self._dim * 4)
+        vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, self._dim)
+        )
+        return np.asarray(vectors[rows], dtype=np.float32)
+
+    def put(self, hashes: list, vectors: np.ndarray):
+        """
+        Appends new vectors to the cache.
+
+        Args:
+            hashes (list): The hashes of the embedded documents.
+            vectors (np.ndarray): The embeddings, one row per hash.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(hashes) == 0:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        with _locked(self.lock_path):
+            # another job may have appended since this cache was last read
+            self._read_index()
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+                with open(self.meta_path, "w") as f:
+                    json.dump(
+                        {
+                            "dim": self._dim,
+                            "dtype": "float32",
+                            "model": self.model_name,
+                            "revision": self.revision,
+                        },
+                        f,
+                    )
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match cached dimension {self._dim}"
+                )
+
+            new = {}
+            for i, h in enumerate(hashes):
+                if h not in self._index and h not in new:
+                    new[h] = i
+            if not new:
+                return
+
+            start = (
+                os.path.getsize(self.vectors_path) // (self._dim * 4)
+                if os.path.isfile(self.vectors_path)
+                else 0
+            )
+            positions = list(new.values())
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[positions].tobytes())
+            with open(self.keys_path, "a") as f:
+                for offset, h in enumerate(new.keys()):
+                    f.write(f"{h} {start + offset}\n")
+                    self._index[h] = start + offset
+            self._keys_offset = os.path.getsize(self.keys_path)
+
+    def get_or_compute(self, documents: list, encode, verbose: bool = True) -> np.ndarray:
+        """
+        Returns the embeddings of a corpus, encoding only the documents missing from the cache.
+
+        Args:
+            documents (list): The documents to embed.
+            encode (callable): Encodes a list of documents into a 2d array.
+            verbose (bool, optional): Whether to print the hits and misses. Defaults to True.
+
+        Returns:
+            np.ndarray: A float32 array with one row per document.
+        """
+        hashes = hash_texts(documents)
+        # pick up the keys other jobs appended, or an eviction, since the index was last read
+        self._read_index()
+        rows = self.lookup(hashes)
+        missing = np.flatnonzero(rows < 0)
+
+        if len(missing) > 0:
+            # encode each distinct missing document once
+            unique = {}
+            for i in missing:
+                unique.setdefault(hashes[i], i)
+            vectors = np.asarray(
+                encode([documents[i] for i in unique.values()]), dtype=np.float32
+            )
+            self.put(list(unique.keys()), vectors)
+            rows = self.lookup(hashes)
+
+        if verbose:
+            print(
+                f"Embedding cache: {len(documents) - len(missing)} hits, {len(missing)} misses"
+            )
+
+        return self.get(rows)
+
+
+class SentimentCache:
+    """
+    A persistent store of sentiment scores keyed by (sentiment model id, document hash).
+
+    Scores live in a single SQLite database under the cache root, so every run of a sweep over the
+    same corpus reads the scores computed by the first one.
+
+    Args:
+        cache_dir (str): The root directory of the cache.
+        model_id (str): The identifier of the sentiment model.
+
+    Methods:
+        lookup: Reads the cached scores of a list of document hashes.
+        put: Stores new scores.
+        get_or_compute: Returns the scores of a corpus, scoring only the cache misses.
+    """
+
+    # number of hashes bound per lookup query, below SQLite's variable limit
+    QUERY_BATCH = 500
+
+    def __init__(self, cache_dir: str, model_id: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.model_id = model_id
+        self.path = os.path.join(cache_dir, "sentiment.sqlite")
+        self.connection = sqlite3.connect(self.path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "model TEXT NOT NULL, hash TEXT NOT NULL, score REAL NOT NULL, "
+            "PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def lookup(self, hashes: list) -> np.ndarray:
+        """
+        Reads the cached scores of a list of document hashes.
+
+        Args:
+            hashes (list): The document hashes to look up.
+
+        Returns:
+            np.ndarray: The score of each hash, or NaN for a miss.
+        """
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), self.QUERY_BATCH):
+            batch = unique[start : start + self.QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.connection.execute(
+                f"SELECT hash, score FROM scores WHERE model = ? AND hash IN ({placeholders})",
+                [self.model_id, *batch],
+            )
+            found.update(rows)
+        return np.fromiter(
+            (found.get(h, np.nan) for h in hashes), dtype=np.float64, count=len(hashes)
+        )
+
+    def put(self, hashes: list, scores):
+        """
+        Stores new scores.
+
+        Args:
+            hashes (list): The hashes of the scored documents.
+            scores: The score of each document.
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO scores (model, hash, score) VALUES (?, ?, ?)",
+            ((self.model_id, h, float(score)) for h, score in zip(hashes, scores)),
+        )
+        self.connection.commit()
+
+    def get_or_compute(self, texts: list, score) -> np.ndarray:
+        """
+        Returns the scores of a corpus, scoring only the documents missing from the cache.
+
+        Args:
+            texts (list): The documents to score.
+            score (callable): Scores a list of documents.
+
+        Returns:
+            np.ndarray: The score of each document.
+        """
+        hashes = hash_texts(texts)
+        scores = self.lookup(hashes)
+        missing = np.flatnonzero(np.isnan(scores))
+
+        if len(missing) > 0:
+            unique = {}
+            for i in missing:
+                unique.setdefault(hashes[i], i)
+            computed = score([texts[i] for i in unique.values()])
+            self.put(list(unique.keys()), computed)
+            scores = self.lookup(hashes)
+
+        print(
+            f"Sentiment cache: {len(texts) - len(missing)} hits, {len(missing)} misses"
+        )
+
+        return scores
+
+
+class ReductionCache:
+    """
+    A persistent store of reduced embeddings keyed by (embeddings, reducer class, reducer config).
+
+    Re-running a topic model that only changes the clustering finds the reduction of the previous
+    run and skips the reducer. The fitted reducer is pickled next to its output when possible, so
+    that new documents can still be transformed.
+
+    Loading a reducer unpickles it, which runs arbitrary code from the file, so the cache directory
+    must only be writable by users you trust. Sessions only use this cache when a cache directory
+    is given explicitly, and prune_cache evicts its least recently used entries.
+
+    Args:
+        cache_dir (str): The root directory of the cache.
+
+    Methods:
+        key: Computes the cache key of a reducer fitted on a set of embeddings.
+        get: Reads a cached reduction and its fitted reducer.
+        put: Stores a reduction and its fitted reducer.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.directory = os.path.join(cache_dir, "reductions")
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def describe(reducer) -> str:
+        """
+        Describes a reducer by its class and parameters.
+
+        Args:
+            reducer: The dimensionality reduction model.
+
+        Returns:
+            str: A JSON description, stable across runs.
+        """
+        params = reducer.get_params() if hasattr(reducer, "get_params") else {}
+        return json.dumps(
+            {"class": type(reducer).__name__, "params": params},
+            sort_keys=True,
+            default=str,
+        )
+
+    def key(self, embeddings: np.ndarray, reducer) -> str:
+        """
+        Computes the cache key of a reducer fitted on a set of embeddings.
+
+        Args:
+            embeddings (np.ndarray): The training embeddings.
+            reducer: The dimensionality reduction model.
+
+        Returns:
+            str: A 32 character hex digest.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        digest.update(str(embeddings.shape).encode("utf-8"))
+        digest.update(embeddings.data)
+        digest.update(self.describe(reducer).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """
+        Reads a cached reduction and its fitted reducer.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            tuple: The reduced embeddings, or None on a miss, and the fitted reducer, or None if it could not be stored.
+        """
+        path = os.path.join(self.directory, f"{key}.npy")
+        if not os.path.isfile(path):
+            return None, None
+
+        reduced = np.load(path)
+        reducer = None
+        reducer_path = os.path.join(self.directory, f"{key}.pkl")
+        if os.path.isfile(reducer_path):
+            try:
+                with open(reducer_path, "rb") as f:
+                    reducer = pickle.load(f)
+            except Exception:
+                reducer = None
+        return reduced, reducer
+
+    def put(self, key: str, reduced: np.ndarray, reducer=None):
+        """
+        Stores a reduction and its fitted reducer.
+
+        Args:
+            key (str): The cache key.
+            reduced (np.ndarray): The reduced embeddings.
+            reducer (optional): The fitted dimensionality reduction model.
+        """
+        path = os.path.join(self.directory, f"{key}.npy")
+        # write to a temporary file first so that concurrent readers never see a partial array
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(reduced))
+        os.replace(tmp, path)
+
+        if reducer is not None:
+            reducer_path = os.path.join(self.directory, f"{key}.pkl")
+            tmp = f"{reducer_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    pickle.dump(reducer, f)
+                os.replace(tmp, reducer_path)
+            except Exception as e:
+                print(f"Could not cache the fitted reducer: {e}")
+                if os.path.isfile(tmp):
+                    os.remove(tmp)
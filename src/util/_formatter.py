@@ -1,4 +1,4 @@
-from collections import defaultdict
+from collections import Counter
 import numpy as np
 import pandas as pd
 import re
@@ -18,6 +18,15 @@ class DataFormatter:
 
     DATE_FIELD = "date"
 
+    # characters dropped from lowercased tokens
+    PUNCTUATION = re.compile(r"[^\w\s]")
+
+    # tokens are split on spaces, newlines and tabs
+    DELIMITERS = str.maketrans("\n\t", "  ")
+
+    # number of documents tokenized in one pass by count_words
+    BLOCK_SIZE = 1000
+
     def __init__(self):
         self.word_freq_zipf = np.empty(0, dtype=self.dtypes)
         self.group_size_zipf = np.empty(0, dtype=self.dtypes)
@@ -53,21 +62,116 @@ class DataFormatter:
         else:
             corpus = posts
 
-        # Calculate word frequency
-        word_freq = defaultdict(int)
-        total_words = []
-        for text in corpus:
-            # Replace \n and \t with space
-            cleaned_text = re.sub(r"[\n\t]", " ", text.lower())
-            # Remove punctuation
-            cleaned_text = re.sub(r"[^\w\s]", "", cleaned_text)
-            # split into words
-            words = cleaned_text.split(" ")
-            total_words += words
-        for word in total_words:
+        return dict(self.count_words(corpus))
+
+    def _raw_tokens(self, text: str) -> list:
+        """
+        Lowercases a text and splits it on spaces, newlines and tabs, keeping punctuation.
+        """
+        return text.lower().translate(self.DELIMITERS).split(" ")
+
+    def _strip_punctuation(self, token: str) -> str:
+        return self.PUNCTUATION.sub("", token)
+
+    def count_words(self, corpus: list) -> Counter:
+        """
+        Counts the tokens of a corpus without materializing the list of all its tokens.
+
+        Raw tokens are counted first and punctuation is then stripped once per distinct type, which
+        gives the same counts as cleaning every document but touches far fewer strings.
+
+        Args:
+            corpus (list): The texts to count.
+
+        Returns:
+            Counter: The count of each token, in order of first occurrence.
+        """
+        raw_freq = Counter()
+        # documents are joined on a delimiter in blocks, so tokens never span two documents
+        for start in range(0, len(corpus), self.BLOCK_SIZE):
+            block = "\n".join(corpus[start : start + self.BLOCK_SIZE])
+            raw_freq.update(self._raw_tokens(block))
+
+        word_freq = Counter()
+        for token, count in raw_freq.items():
+            word = self._strip_punctuation(token)
             if word != "":
-                word_freq[word] += 1
-        return dict(word_freq)
+                word_freq[word] += count
+        return word_freq
+
+    def document_term_matrix(self, corpus: list):
+        """
+        Builds the sparse document-term count matrix of a corpus.
+
+        Args:
+            corpus (list): The texts to count.
+
+        Returns:
+            tuple: A csr_matrix of shape (documents, types) and the array of types, in order of first occurrence.
+        """
+        vocabulary = {}
+        # raw token -> column of its cleaned form, or -1 when nothing is left after cleaning
+        columns = {}
+        indptr = [0]
+        indices = []
+        data = []
+
+        for text in corpus:
+            row = {}
+            raw_freq = Counter(self._raw_tokens(str(text)))
+            for token, count in raw_freq.items():
+                column = columns.get(token)
+                if column is None:
+                    word = self._strip_punctuation(token)
+                    column = (
+                        vocabulary.setdefault(word, len(vocabulary)) if word != "" else -1
+                    )
+                    columns[token] = column
+                if column >= 0:
+                    row[column] = row.get(column, 0) + count
+            indices.extend(row.keys())
+            data.extend(row.values())
+            indptr.append(len(indices))
+
+        from scipy.sparse import csr_matrix
+
+        matrix = csr_matrix(
+            (
+                np.asarray(data, dtype=np.int64),
+                np.asarray(indices, dtype=np.int64),
+                np.asarray(indptr, dtype=np.int64),
+            ),
+            shape=(len(corpus), len(vocabulary)),
+        )
+        types = np.empty(len(vocabulary), dtype=object)
+        types[:] = list(vocabulary.keys())
+        return matrix, types
+
+    def counts_to_dataframe(self, counts, types: np.ndarray) -> pd.DataFrame:
+        """
+        Converts a row of type counts into a Zipfian distrubition DataFrame.
+
+        Args:
+            counts: A dense array or a sparse row of counts, one entry per type.
+            types (np.ndarray): The types of the document-term matrix.
+
+        Returns:
+            pd.DataFrame: A DataFrame containing the Zipfian distrubition.
+        """
+        if hasattr(counts, "tocsr"):
+            counts = counts.tocsr()
+            columns, values = counts.indices, counts.data
+            keep = values > 0
+            columns, values = columns[keep], values[keep]
+        else:
+            counts = np.asarray(counts).ravel()
+            columns = np.flatnonzero(counts)
+            values = counts[columns]
+
+        # descending counts, ties in order of first occurrence
+        order = np.lexsort((columns, -values))
+        table = self._zipf_table(types[columns[order]], values[order].astype(int))
+        return pd.DataFrame(table)
 
     def sort_data(self, data):
         """
@@ -91,11 +195,23 @@ class DataFormatter:
         Returns:
             np.array: An array containing Zipfian distrubition statistics.
         """
-        total = np.sum(val for _, val in sorted_data)
-        return np.array(
-            [(item, val, (val / total), len(sorted_data)) for item, val in sorted_data],
-            dtype=self.dtypes,
+        types = np.empty(len(sorted_data), dtype=object)
+        types[:] = [item for item, _ in sorted_data]
+        counts = np.fromiter(
+            (val for _, val in sorted_data), dtype=int, count=len(sorted_data)
         )
+        return self._zipf_table(types, counts)
+
+    def _zipf_table(self, types: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """
+        Builds the Zipf table of types already sorted by descending count.
+        """
+        table = np.empty(len(counts), dtype=self.dtypes)
+        table["types"] = types
+        table["counts"] = counts
+        table["probs"] = counts / counts.sum() if len(counts) > 0 else counts
+        table["total_unique"] = len(counts)
+        return table
 
     def text_data_to_zipf(self, posts, comments=None):
         """
@@ -108,9 +224,16 @@ class DataFormatter:
         Returns:
             np.array: An array containing the Zipfian distrubition for the text data.
         """
-        word_freq = self.format_text_data(posts, comments)
-        sorted_word_freq = self.sort_data(word_freq)
-        self.word_freq_zipf = self.compute_zipf(sorted_word_freq)
+        corpus = posts + comments if comments is not None else posts
+        word_freq = self.count_words(corpus)
+
+        types = np.empty(len(word_freq), dtype=object)
+        types[:] = list(word_freq.keys())
+        counts = np.fromiter(word_freq.values(), dtype=int, count=len(word_freq))
+
+        # a stable sort keeps ties in order of first occurrence
+        order = np.argsort(-counts, kind="stable")
+        self.word_freq_zipf = self._zipf_table(types[order], counts[order])
         return self.word_freq_zipf
 
     def zipf_data_to_dataframe(self, posts, comments=None):
@@ -0,0 +1,183 @@
+import glob
+import os
+
+import pandas as pd
+
+
+# formats the labeled corpus of a run can be written in
+OUTPUT_FORMATS = ["csv", "parquet"]
+
+# file name of the labeled corpus, without its extension
+LABELED_CORPUS = "labeled_corpus"
+
+
+def labeled_corpus_path(directory: str) -> str:
+    """
+    Finds the labeled corpus of a run, in whichever format it was written.
+
+    Args:
+        directory (str): The output directory of the run.
+
+    Returns:
+        str: The path of labeled_corpus.parquet or labeled_corpus.csv.
+    """
+    for output_format in reversed(OUTPUT_FORMATS):
+        path = f"{directory}/{LABELED_CORPUS}.{output_format}"
+        if os.path.isfile(path):
+            return path
+    raise Exception(f"No {LABELED_CORPUS}.csv or {LABELED_CORPUS}.parquet in {directory}")
+
+
+def _sidecars(directory: str) -> dict:
+    """
+    Map every column appended to a Parquet labeled corpus to its sidecar file.
+    """
+    prefix = f"{directory}/{LABELED_CORPUS}."
+    return {
+        path[len(prefix) : -len(".parquet")]: path
+        for path in sorted(glob.glob(f"{glob.escape(prefix)}*.parquet"))
+    }
+
+
+def write_labeled_corpus(corpus: pd.DataFrame, directory: str, output_format: str = "csv") -> str:
+    """
+    Writes the labeled corpus of a run.
+
+    Parquet files are zstd compressed with topic_labels dictionary encoded, so the top words of a
+    topic are stored once rather than once per document and read back as a categorical. A corpus
+    written in the other format, and any appended columns, are removed so that readers never pick
+    up the outputs of an earlier run.
+
+    Args:
+        corpus (pd.DataFrame): One row per document.
+        directory (str): The output directory of the run.
+        output_format (str, optional): "csv" or "parquet". Defaults to "csv".
+
+    Returns:
+        str: The path of the labeled corpus.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unknown output format {output_format}, expected one of {OUTPUT_FORMATS}"
+        )
+
+    stale = [f"{directory}/{LABELED_CORPUS}.{f}" for f in OUTPUT_FORMATS if f != output_format]
+    for path in stale + list(_sidecars(directory).values()):
+        if os.path.isfile(path):
+            os.remove(path)
+
+    path = f"{directory}/{LABELED_CORPUS}.{output_format}"
+    if output_format == "csv":
+        corpus.to_csv(path, index=False)
+        return path
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(corpus, preserve_index=False)
+    if "topic_labels" in table.column_names:
+        i = table.column_names.index("topic_labels")
+        table = table.set_column(
+            i, "topic_labels", pc.dictionary_encode(table.column(i))
+        )
+    pq.write_table(table, path, compression="zstd")
+    return path
+
+
+def read_labeled_corpus(directory: str, columns: list = None) -> pd.DataFrame:
+    """
+    Reads the labeled corpus of a run, with the columns appended to it.
+
+    Only the requested columns are read from a Parquet corpus, so reading the labels of a run does
+    not parse its text.
+
+    Args:
+        directory (str): The output directory of the run.
+        columns (list, optional): The columns to read, those the corpus lacks are skipped. Defaults to every column.
+
+    Returns:
+        pd.DataFrame: One row per document.
+    """
+    path = labeled_corpus_path(directory)
+
+    def wanted(column):
+        return columns is None or column in columns
+
+    if path.endswith(".csv"):
+        corpus = pd.read_csv(
+            path, usecols=wanted, dtype={"text": str}, keep_default_na=False
+        )
+    else:
+        import pyarrow.parquet as pq
+
+        sidecars = _sidecars(directory)
+        names = [
+            c for c in pq.read_schema(path).names if c not in sidecars and wanted(c)
+        ]
+        corpus = pd.read_parquet(path, columns=names)
+        for column, sidecar in sidecars.items():
+            if wanted(column):
+                corpus[column] = pd.read_parquet(sidecar)[column].to_numpy()
+
+    if columns is not None:
+        corpus = corpus[[c for c in columns if c in corpus]]
+    return corpus
+
+
+def count_labeled_corpus(directory: str) -> int:
+    """
+    Counts the documents of the labeled corpus of a run.
+
+    Args:
+        directory (str): The output directory of the run.
+
+    Returns:
+        int: The number of rows.
+    """
+    path = labeled_corpus_path(directory)
+    if path.endswith(".csv"):
+        return len(read_labeled_corpus(directory, ["label"]))
+
+    import pyarrow.parquet as pq
+
+    return pq.read_metadata(path).num_rows
+
+
+def append_columns(directory: str, columns: dict) -> str:
+    """
+    Adds columns to the labeled corpus of a run.
+
+    A Parquet corpus gains one labeled_corpus.<column>.parquet sidecar per column, so the text is
+    not rewritten, and appending a column again replaces its sidecar. A CSV corpus is rewritten
+    with the new columns.
+
+    Args:
+        directory (str): The output directory of the run.
+        columns (dict): The values of each new column, one per document.
+
+    Returns:
+        str: The path of the labeled corpus.
+    """
+    path = labeled_corpus_path(directory)
+    rows = count_labeled_corpus(directory)
+    for column, values in columns.items():
+        if len(values) != rows:
+            raise ValueError(
+                f"Column {column} has {len(values)} values for {rows} documents"
+            )
+
+    if path.endswith(".csv"):
+        corpus = read_labeled_corpus(directory)
+        for column, values in columns.items():
+            corpus[column] = values
+        corpus.to_csv(path, index=False)
+        return path
+
+    for column, values in columns.items():
+        pd.DataFrame({column: values}).to_parquet(
+            f"{directory}/{LABELED_CORPUS}.{column}.parquet",
+            index=False,
+            compression="zstd",
+        )
+    return path
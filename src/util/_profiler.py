@@ -0,0 +1,240 @@
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - resource is POSIX only
+    resource = None
+
+
+def _peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of the process so far, in MB.
+    """
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return peak / 2**20 if os.uname().sysname == "Darwin" else peak / 2**10
+
+
+def _rss_mb() -> float:
+    """
+    Returns the current resident set size of the process, in MB.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+def _high_water_mark_mb() -> float:
+    """
+    Returns the resident set size high-water mark of the process, VmHWM, in MB, or None off Linux.
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _reset_high_water_mark() -> bool:
+    """
+    Resets VmHWM to the current resident set size, returning whether the kernel allowed it.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class _RSSSampler(threading.Thread):
+    """
+    Samples the resident set size in the background, for kernels whose high-water mark cannot be reset.
+    """
+
+    # seconds between samples
+    INTERVAL = 0.01
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = _rss_mb()
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.INTERVAL):
+            self.peak = max(self.peak, _rss_mb())
+
+    def stop(self) -> float:
+        self.done.set()
+        self.join()
+        return max(self.peak, _rss_mb())
+
+
+def _children_cpu_seconds() -> float:
+    """
+    Returns the CPU time used by finished child processes, e.g. sentiment and rendering workers.
+    """
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class StageProfiler:
+    """
+    Records the wall time, CPU time, memory and throughput of each stage of a run.
+
+    The peak memory of a stage is its own: the kernel's high-water mark is reset when the stage
+    starts, or, where it cannot be, the resident set size is sampled in a background thread. Only
+    where neither works is the lifetime peak of the process reported. Each stage records which of
+    these its "peak_rss_source" is: "high_water_mark", "sampled" or "lifetime".
+
+    Args:
+        detailed (bool, optional): Whether to also run cProfile over every stage and print its
+            timings as it ends. Defaults to False.
+
+    Methods:
+        stage: Context manager measuring one stage.
+        write: Writes run_profile.json, and the cProfile dumps, to a directory.
+    """
+
+    def __init__(self, detailed: bool = False):
+        self.detailed = detailed
+        self.stages = []
+        self.profiles = []
+        self.start = time.perf_counter()
+        # the peak of each running stage before its nested stages reset the high-water mark
+        self._peaks = []
+        self._can_reset = (
+            _high_water_mark_mb() is not None and _reset_high_water_mark()
+        )
+        self._can_sample = os.path.isfile("/proc/self/statm")
+
+    def _start_peak(self):
+        """
+        Starts measuring the peak memory of a stage.
+        """
+        if self._can_reset:
+            if self._peaks:
+                # keep what the enclosing stage reached before the reset
+                self._peaks[-1] = max(self._peaks[-1], _high_water_mark_mb())
+            self._peaks.append(0.0)
+            _reset_high_water_mark()
+            return "high_water_mark", None
+        if self._can_sample:
+            sampler = _RSSSampler()
+            sampler.start()
+            return "sampled", sampler
+        return "lifetime", None
+
+    def _stop_peak(self, source: str, sampler) -> float:
+        """
+        Returns the peak memory of a stage, in MB.
+        """
+        if source == "high_water_mark":
+            peak = max(self._peaks.pop(), _high_water_mark_mb())
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            return peak
+        if source == "sampled":
+            return sampler.stop()
+        return _peak_rss_mb()
+
+    @contextmanager
+    def stage(self, name: str, items: int = None):
+        """
+        Measures one stage.
+
+        Args:
+            name (str): The name of the stage.
+            items (int, optional): The number of documents the stage processes, to report throughput.
+
+        Yields:
+            dict: The record of the stage, whose "items" may be set inside the stage when the number
+            of documents is only known once it is streamed.
+        """
+        record = {"stage": name, "items": items}
+        profile = cProfile.Profile() if self.detailed else None
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        children = _children_cpu_seconds()
+        source, sampler = self._start_peak()
+
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+
+            wall = time.perf_counter() - wall
+            peak = self._stop_peak(source, sampler)
+            items = record.pop("items")
+            record.update(
+                {
+                    "wall_seconds": wall,
+                    "cpu_seconds": time.process_time() - cpu,
+                    "children_cpu_seconds": _children_cpu_seconds() - children,
+                    "rss_mb": _rss_mb(),
+                    "peak_rss_mb": peak,
+                    "peak_rss_source": source,
+                    "items": items,
+                    "items_per_second": items / wall if items and wall > 0 else None,
+                }
+            )
+            self.stages.append(record)
+            if profile is not None:
+                self.profiles.append((len(self.stages) - 1, name, profile))
+
+            # the timings of a plain run are only written to run_profile.json
+            if self.detailed:
+                throughput = (
+                    f", {record['items_per_second']:.1f} docs/s"
+                    if record["items_per_second"]
+                    else ""
+                )
+                print(f"[profile] {name}: {wall:.2f}s{throughput}")
+
+    def write(self, directory: str = ""):
+        """
+        Writes run_profile.json, and the cProfile dumps, to a directory.
+
+        Args:
+            directory (str, optional): The output directory. Defaults to the working directory.
+        """
+        if directory != "" and directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        else:
+            directory = "."
+
+        profile = {
+            "total_wall_seconds": time.perf_counter() - self.start,
+            # resetting the high-water mark also lowers ru_maxrss, so the stage peaks count too
+            "peak_rss_mb": max(
+                [_peak_rss_mb()] + [stage["peak_rss_mb"] for stage in self.stages]
+            ),
+            "stages": self.stages,
+        }
+        with open(f"{directory}/run_profile.json", "w") as f:
+            json.dump(profile, f, indent=4)
+
+        if self.profiles:
+            os.makedirs(f"{directory}/profiles", exist_ok=True)
+            for index, name, stats in self.profiles:
+                slug = re.sub(r"[^\w.-]+", "_", name)
+                stats.dump_stats(f"{directory}/profiles/{index:02d}_{slug}.prof")
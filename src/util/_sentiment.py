@@ -0,0 +1,298 @@
+import multiprocessing
+import os
+import numpy as np
+
+# the scorer of a pool worker process, built by _init_worker
+_WORKER_SCORER = None
+
+# environment variables capping the intra-op threads of torch and the BLAS libraries
+THREAD_VARIABLES = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]
+
+
+def _init_worker(model: str, batch_size: int, threads: int, sentiment_pipeline=None):
+    """
+    Initializes a sentiment worker process.
+
+    Workers are spawned with the thread variables already set, so torch reads them when it is first
+    imported; the torch thread count is pinned again here in case the pipeline imported it earlier.
+    The pipeline is the one handed to the parent scorer, or is built from the model name.
+    """
+    global _WORKER_SCORER
+
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    _WORKER_SCORER = SentimentScorer(model, batch_size, sentiment_pipeline)
+    _WORKER_SCORER.build_pipeline()
+
+
+def _score_shard(chunks: list) -> np.ndarray:
+    return _WORKER_SCORER._score_chunks(chunks)
+
+
+class SentimentScorer:
+    """
+    A batched sentiment engine around a Huggingface text classification pipeline.
+
+    Documents are split into chunks of at most the model's maximum number of tokens, the chunks are
+    sorted by token length so that each batch is padded as little as possible, and the chunk scores
+    are pooled back into one mean score per document.
+
+    Args:
+        model (str, optional): A pipeline task or model name. Defaults to the "sentiment-analysis" pipeline.
+        batch_size (int, optional): The number of chunks per forward pass. Defaults to 32.
+        sentiment_pipeline (optional): An already built pipeline to use instead of `model`.
+        workers (int, optional): The number of worker processes. Defaults to 1, which scores in process.
+            Every worker loads its own copy of the model, while the parent only loads the tokenizer.
+
+    Methods:
+        build_pipeline: Builds the Huggingface pipeline.
+        build_tokenizer: Builds the tokenizer of the pipeline, without its model.
+        chunk: Splits documents into chunks that fit the model.
+        score: Scores a list of documents.
+    """
+
+    # hard cap on chunk length, matching the positional limit of BERT style classifiers
+    MAX_TOKENS = 512
+
+    # number of documents tokenized at once when measuring lengths
+    TOKENIZE_BATCH = 10000
+
+    # number of batches in each shard handed to a worker process
+    BATCHES_PER_SHARD = 8
+
+    def __init__(
+        self,
+        model: str = "",
+        batch_size: int = 32,
+        sentiment_pipeline=None,
+        workers: int = 1,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.pipeline = sentiment_pipeline
+        self.workers = max(1, workers)
+        # whether the pipeline was built from `model` rather than handed in
+        self._built_pipeline = False
+        self._tokenizer = None
+
+    def build_pipeline(self):
+        """
+        Builds the Huggingface pipeline.
+
+        Returns:
+            The sentiment pipeline.
+        """
+        if self.pipeline is not None:
+            return self.pipeline
+
+        from transformers import pipeline
+        from transformers.pipelines import SUPPORTED_TASKS, TASK_ALIASES
+
+        if self.model == "":
+            self.pipeline = pipeline("sentiment-analysis")
+        elif self.model in SUPPORTED_TASKS or self.model in TASK_ALIASES:
+            self.pipeline = pipeline(self.model)
+        else:
+            self.pipeline = pipeline("sentiment-analysis", model=self.model)
+        self._built_pipeline = True
+
+        return self.pipeline
+
+    def build_tokenizer(self):
+        """
+        Builds the tokenizer of the pipeline, without loading the model weights.
+
+        Returns:
+            The tokenizer of the pipeline.
+        """
+        if self.pipeline is not None:
+            return self.pipeline.tokenizer
+
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            from transformers.pipelines import (
+                PIPELINE_REGISTRY,
+                get_default_model_and_revision,
+            )
+
+            # a task name loads the default model of its task, as build_pipeline does
+            model, revision = self.model, None
+            if self.model == "" or self.model in PIPELINE_REGISTRY.get_supported_tasks():
+                task = self.model if self.model != "" else "sentiment-analysis"
+                _, targeted_task, task_options = PIPELINE_REGISTRY.check_task(task)
+                model, revision = get_default_model_and_revision(
+                    targeted_task, "pt", task_options
+                )
+            self._tokenizer = AutoTokenizer.from_pretrained(model, revision=revision)
+
+        return self._tokenizer
+
+    @property
+    def model_id(self) -> str:
+        """
+        Identifies the model behind the scores without loading it.
+
+        Pipeline task names resolve to the task's default model, which depends on the installed
+        transformers version, so the version is part of their id.
+        """
+        if self.pipeline is not None:
+            config = getattr(getattr(self.pipeline, "model", None), "config", None)
+            name = getattr(config, "_name_or_path", "")
+            if name:
+                return name
+
+        task = self.model if self.model != "" else "sentiment-analysis"
+        if "/" in task:
+            return task
+
+        from importlib.metadata import PackageNotFoundError, version
+
+        try:
+            return f"{task}@transformers-{version('transformers')}"
+        except PackageNotFoundError:
+            return task
+
+    def _max_tokens(self, tokenizer) -> int:
+        max_length = min(
+            getattr(tokenizer, "model_max_length", self.MAX_TOKENS), self.MAX_TOKENS
+        )
+        return max_length - tokenizer.num_special_tokens_to_add(pair=False)
+
+    def chunk(self, texts: list):
+        """
+        Splits documents into chunks that fit the model.
+
+        Documents that fit are passed through unchanged. Longer documents are cut on token boundaries,
+        using the tokenizer's character offsets so every chunk is a slice of the original text.
+
+        Args:
+            texts (list): The documents to split.
+
+        Returns:
+            tuple: The chunk texts, the document index of each chunk and the token length of each chunk.
+        """
+        # with worker processes the model is only loaded by the workers
+        if self.workers > 1:
+            tokenizer = self.build_tokenizer()
+        else:
+            tokenizer = self.build_pipeline().tokenizer
+        max_tokens = self._max_tokens(tokenizer)
+        use_offsets = getattr(tokenizer, "is_fast", False)
+
+        chunks = []
+        doc_index = []
+        lengths = []
+
+        for start in range(0, len(texts), self.TOKENIZE_BATCH):
+            batch = [str(text) for text in texts[start : start + self.TOKENIZE_BATCH]]
+            encoded = tokenizer(
+                batch,
+                add_special_tokens=False,
+                truncation=False,
+                return_offsets_mapping=use_offsets,
+                verbose=False,
+            )
+
+            for i, text in enumerate(batch):
+                ids = encoded["input_ids"][i]
+                if len(ids) <= max_tokens:
+                    chunks.append(text)
+                    doc_index.append(start + i)
+                    lengths.append(len(ids))
+                    continue
+
+                for begin in range(0, len(ids), max_tokens):
+                    end = min(begin + max_tokens, len(ids))
+                    if use_offsets:
+                        offsets = encoded["offset_mapping"][i]
+                        piece = text[offsets[begin][0] : offsets[end - 1][1]]
+                    else:
+                        piece = tokenizer.decode(ids[begin:end])
+                    chunks.append(piece)
+                    doc_index.append(start + i)
+                    lengths.append(end - begin)
+
+        return chunks, np.asarray(doc_index, dtype=np.int64), np.asarray(lengths)
+
+    def _score_chunks(self, chunks: list) -> np.ndarray:
+        """
+        Runs the pipeline over chunks that are already sorted by length.
+        """
+        if len(chunks) == 0:
+            return np.empty(0, dtype=np.float64)
+        results = self.build_pipeline()(
+            chunks, batch_size=self.batch_size, truncation=True
+        )
+        return np.fromiter(
+            (result["score"] for result in results), dtype=np.float64, count=len(chunks)
+        )
+
+    def _score_chunks_parallel(self, chunks: list) -> np.ndarray:
+        """
+        Scores sorted chunks across a pool of worker processes.
+
+        Workers are spawned rather than forked: a fork after torch or CUDA have started their thread
+        pools can deadlock, and a forked child keeps the parent's thread count whatever
+        OMP_NUM_THREADS says. Each worker therefore loads its own copy of the model, with its thread
+        count capped so that the workers do not oversubscribe the cores. Shards are consumed from the
+        pool's task queue and their scores come back in submission order.
+        """
+        shard_size = self.batch_size * self.BATCHES_PER_SHARD
+        shards = [
+            chunks[i : i + shard_size] for i in range(0, len(chunks), shard_size)
+        ]
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+
+        # a pipeline built from the model name is rebuilt by each worker, one handed in is pickled
+        given = None if self._built_pipeline else self.pipeline
+
+        # spawned workers read the environment of the parent when the pool starts them
+        saved = {name: os.environ.get(name) for name in THREAD_VARIABLES}
+        os.environ.update({name: str(threads) for name in THREAD_VARIABLES})
+        try:
+            pool = multiprocessing.get_context("spawn").Pool(
+                processes=min(self.workers, len(shards)),
+                initializer=_init_worker,
+                initargs=(self.model, self.batch_size, threads, given),
+            )
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+        with pool:
+            scores = list(pool.imap(_score_shard, shards))
+
+        return np.concatenate(scores)
+
+    def score(self, texts: list) -> np.ndarray:
+        """
+        Scores a list of documents.
+
+        Args:
+            texts (list): The documents to score.
+
+        Returns:
+            np.ndarray: The mean chunk score of each document.
+        """
+        chunks, doc_index, lengths = self.chunk(texts)
+
+        # bucket chunks of similar length together so batches carry little padding
+        order = np.argsort(lengths, kind="stable")
+        scores = np.empty(len(chunks), dtype=np.float64)
+        sorted_chunks = [chunks[i] for i in order]
+        if self.workers > 1 and len(sorted_chunks) > self.batch_size:
+            scores[order] = self._score_chunks_parallel(sorted_chunks)
+        else:
+            scores[order] = self._score_chunks(sorted_chunks)
+
+        totals = np.bincount(doc_index, weights=scores, minlength=len(texts))
+        counts = np.bincount(doc_index, minlength=len(texts))
+        return totals / np.maximum(counts, 1)
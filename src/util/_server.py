@@ -0,0 +1,115 @@
+import json
+import os
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LabelRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves a labeling service over HTTP.
+
+    Routes:
+        POST /label: {"documents": ["...", ...]} returns {"results": [...]}, one result per document.
+        GET /metrics: The latency percentiles, queue depth and batch counts of the service.
+        GET /health: {"status": "ok"}.
+
+    The service is set on the server, see make_servers.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    # largest request body accepted, in bytes
+    MAX_BODY = 64 * 2**20
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send_json(200, self.server.service.metrics())
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/label":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        if length > self.MAX_BODY:
+            self._send_json(413, {"error": "Request body too large"})
+            return
+
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            documents = body.get("documents")
+            if not isinstance(documents, list) or not all(
+                isinstance(d, str) for d in documents
+            ):
+                raise ValueError('Expected {"documents": [<text>, ...]}')
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            results = self.server.service.label(documents)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+
+        self._send_json(200, {"results": results})
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # unix socket clients have no address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    A threading HTTP server listening on a Unix domain socket.
+    """
+
+    daemon_threads = True
+
+
+def make_servers(service, host: str = None, port: int = None, socket_path: str = None) -> list:
+    """
+    Builds the HTTP servers of a labeling service.
+
+    Args:
+        service: An object with label(documents) and metrics() methods.
+        host (str, optional): The host to listen on over TCP.
+        port (int, optional): The TCP port, 0 picks a free port. No TCP server is built when None.
+        socket_path (str, optional): The path of a Unix socket to listen on as well.
+
+    Returns:
+        list: The servers, not yet serving.
+    """
+    servers = []
+
+    if port is not None:
+        server = ThreadingHTTPServer((host or "127.0.0.1", port), LabelRequestHandler)
+        server.daemon_threads = True
+        servers.append(server)
+
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        servers.append(UnixHTTPServer(socket_path, LabelRequestHandler))
+
+    for server in servers:
+        server.service = service
+
+    return servers
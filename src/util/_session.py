@@ -1,6 +1,13 @@
+from __future__ import annotations
+
 from src.builders._tm_factory import TopicModelFactory
 from src.builders._tu_factory import TunerFactory
-from bertopic import BERTopic
+from src.util._cache import DEFAULT_CACHE_DIR
+from src.loading._dedup import find_duplicates
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bertopic import BERTopic
 
 
 class Session:
@@ -12,10 +19,24 @@ class Session:
         config_topic_model (dict): The configuration for the topic model.
         logs (dict): The logs for errors and menu choice data.
         plot_dir (str): The directory to save plots.
+        cache_dir (str): The root directory of the embedding cache.
+        cache_reductions (bool): Whether fitted reducers are cached under cache_dir, only for a cache_dir chosen by the user.
+        embeddings (np.ndarray): The float32 document embeddings of the last fit, shared by every later stage.
+        projection (np.ndarray): The cached 2d layout of the embeddings.
+        projection_mode (str): How the 2d layout is computed, see TopicDriver._reduce_embeddings_dimensions.
+        sentiment (str): The pipeline task or model used to score sentiment.
+        sentiment_batch_size (int): The number of text chunks per sentiment forward pass.
+        sentiment_workers (int): The number of sentiment worker processes, each holding a copy of the model.
+        render_workers (int): The number of processes rendering per-topic figures.
+        duplicates (DuplicateGroups): The duplicate groups of the loaded corpus when it was deduplicated.
+        dedup_mode (str): How the corpus was deduplicated, "exact" or "near", so a resample is deduplicated alike.
+        profile (bool): Whether runs dump a cProfile of every stage next to run_profile.json.
+        output_format (str): The format the labeled corpus of a run is written in, "csv" or "parquet".
         topic_model_factory (TopicModelFactory): The factory for creating topic models.
 
     Methods:
         set_data: Set the data for topic modeling.
+        deduplicate: Replace the data with one representative per duplicate group.
         set_config_topic_model: Set the configuration for the topic model.
         initialize_topic_model_factory: Initialize the topic model factory.
         get_log: Get the log.
@@ -40,6 +61,21 @@ class Session:
 
         self.tuner_factory = TunerFactory()
         self.data_path = data_path
+        self.cache_dir = DEFAULT_CACHE_DIR
+        # fitted reducers are pickled into the reduction cache, so it is only used in a cache
+        # directory the user chose and trusts, never in the shared default
+        self.cache_reductions = False
+        self.embeddings = None
+        self.projection = None
+        self.projection_mode = "auto"
+        self.sentiment = ""
+        self.sentiment_batch_size = 32
+        self.sentiment_workers = 1
+        self.render_workers = 1
+        self.duplicates = None
+        self.dedup_mode = None
+        self.profile = False
+        self.output_format = "csv"
 
     def set_data(self, data):
         """
@@ -55,6 +91,30 @@ class Session:
         self.data = data
         return self.data
 
+    def deduplicate(self, mode: str = "exact"):
+        """
+        Replace the data with one representative per duplicate group.
+
+        The groups are kept in `duplicates` so that results can be broadcast back to every copy.
+
+        Args:
+            mode (str): "exact" to group identical texts, "near" to also group near duplicates.
+
+        Returns:
+            list: The deduplicated data.
+
+        """
+        if mode not in ("exact", "near"):
+            raise ValueError(f"Unknown dedup mode {mode}, expected 'exact' or 'near'")
+
+        self.dedup_mode = mode
+        self.duplicates = find_duplicates(self.data, near=mode == "near")
+        self.data = self.duplicates.unique()
+        print(
+            f"Deduplicated {len(self.duplicates.documents)} documents into {len(self.data)} unique documents"
+        )
+        return self.data
+
     def set_config_topic_model(self, config):
         """
         Set the configuration for the topic model.
@@ -100,13 +160,16 @@ class Session:
     def get_logs(self, name):
         return self.logs[name]
 
-    def build_topic_model(self, from_file: bool = False, config: dict = {}) -> BERTopic:
+    def build_topic_model(
+        self, from_file: bool = False, config: dict = {}, online: bool = False
+    ) -> BERTopic:
         """
         Build the topic model.
 
         Args:
             from_file (bool): Whether to build the topic model from file.
             config (dict): The configuration for building the topic model.
+            online (bool): Whether to build a topic model fitted batch by batch with partial_fit.
 
         Returns:
             BERTopic: The built topic model.
@@ -114,7 +177,8 @@ class Session:
         """
         if from_file:
             self.topic_model_factory.build_embedding_model(
-                self.config_topic_model["embedding_model"]
+                self.config_topic_model["embedding_model"],
+                self.config_topic_model.get("embedding_revision"),
             )
             # Correct way to pass the sub-dictionary for UMAP model configuration
             umap_model_name = list(self.config_topic_model["umap_model"].keys())[0]
@@ -135,12 +199,16 @@ class Session:
             )
 
             self.topic_model_factory.build_vectorizer_model(
-                self.config_topic_model["vectorizer_model"]
+                self.config_topic_model["vectorizer_model"], online=online
             )
             self.topic_model_factory.build_ctfidf_model(
                 self.config_topic_model["ctfidf_model"]
             )
-            return self.topic_model_factory.build_topic_model()
+            if online:
+                return self.topic_model_factory.build_online_topic_model()
+            return self.topic_model_factory.build_topic_model(
+                cache_dir=self.cache_dir if self.cache_reductions else None
+            )
         else:
             # gather all data logs
             config = self.logs["data"]
@@ -199,7 +267,9 @@ class Session:
 
             self.topic_model_factory.build_fine_tune(fine_tune)
 
-            return self.topic_model_factory.build_topic_model()
+            return self.topic_model_factory.build_topic_model(
+                cache_dir=self.cache_dir if self.cache_reductions else None
+            )
 
     def build_tuner(self, from_file: bool = False):
         if from_file:
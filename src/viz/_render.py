@@ -0,0 +1,80 @@
+import datetime
+import multiprocessing
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+
+class TopicLog:
+    """
+    Collects the log entries of one rendering task.
+
+    Stands in for the session inside worker processes, which cannot write to the parent's logs.
+    """
+
+    def __init__(self):
+        self.logs = {"errors": []}
+
+    def log(self, name, log):
+        self.logs.setdefault(name, []).append(log)
+
+
+def _init_worker(initializer=None):
+    """
+    Switches a worker to the headless Agg backend and runs the preloading initializer.
+    """
+    import matplotlib.pyplot as plt
+
+    plt.switch_backend("Agg")
+    if initializer is not None:
+        initializer()
+
+
+def _run_task(task, item) -> list:
+    """
+    Runs one rendering task and returns its errors instead of raising them.
+    """
+    log = TopicLog()
+    try:
+        task(item, log)
+    except Exception as e:
+        print(e)
+        log.log("errors", {str(datetime.datetime.now()): traceback.format_exc()})
+    return log.logs["errors"]
+
+
+def render_topics(task, items: list, session, workers: int = 1, initializer=None):
+    """
+    Renders per-topic figures, fanning the work out to a pool of spawned processes.
+
+    Args:
+        task (callable): A picklable function called as task(item, log) for every item.
+        items (list): The per-topic work items, e.g. Zipf file names.
+        session (Session): The session collecting the errors of every task.
+        workers (int, optional): The number of worker processes. Defaults to 1, which renders in process.
+        initializer (callable, optional): Preloads shared resources once per worker.
+
+    Returns:
+        int: The number of tasks that failed.
+    """
+    if workers <= 1 or len(items) <= 1:
+        results = [_run_task(task, item) for item in items]
+    else:
+        # rendering follows embedding and sentiment, whose thread pools make a fork unsafe, and
+        # the initializer loads what each worker needs anyway
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(items)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(initializer,),
+        ) as pool:
+            results = list(
+                pool.map(_run_task, [task] * len(items), items, chunksize=4)
+            )
+
+    failed = 0
+    for errors in results:
+        for error in errors:
+            session.log("errors", error)
+        failed += len(errors) > 0
+
+    return failed
@@ -1,18 +1,34 @@
+from __future__ import annotations
+
 import pandas as pd
+import numpy as np
 import os
 import math
 import webbrowser
-from bertopic import BERTopic
+from typing import TYPE_CHECKING
 from src.util._session import Session
 from src.viz._ous_viz import HeatMaps
+from src.viz._render import render_topics
 from src.loading._dataloader import DataLoader
+from src.util._labeled_corpus import append_columns, count_labeled_corpus
 import sys
+import collections
+import collections.abc
+
+# shifterator 0.3.0, its last release, still looks up collections.Mapping, removed in Python 3.10
+if not hasattr(collections, "Mapping"):
+    collections.Mapping = collections.abc.Mapping
+
 import shifterator as sh
 import matplotlib.pyplot as plt
 from sklearn.decomposition import TruncatedSVD
 import warnings
 import datetime
 import traceback
+from functools import lru_cache, partial
+
+if TYPE_CHECKING:
+    from bertopic import BERTopic
 
 # ignore warnings
 warnings.filterwarnings("ignore")
@@ -97,7 +113,7 @@ def visualize(model: BERTopic, session: Session, directory: str = "", data: list
 
 def _visualize_topics_over_time(model: BERTopic, session: Session, directory: str = ""):
     session_data = session.data
-    docs = pd.read_csv(session.data_path)
+    docs = loader._read_columns(session.data_path, ["text", "date"])
 
     # get timestamps for each document in the session
     session_data = pd.DataFrame(session_data, columns=["text"])
@@ -121,15 +137,19 @@ def _visualize_topics_over_time(model: BERTopic, session: Session, directory: st
     # convert the dates to int since epoch
     timestamps = [int(ts.timestamp()) for ts in timestamps]
 
-    df = pd.read_csv(f"{directory}/labeled_corpus.csv")
-    if df.shape[0] != len(timestamps):
-        diff = abs(df.shape[0]) - len(timestamps)
-        if df.shape[0] > len(timestamps):
-            df = df.iloc[: df.shape[0] - diff]
-        else:
-            timestamps = timestamps[: df.shape[0]]
-    df["timestamp"] = timestamps
-    df.to_csv(f"{directory}/labeled_corpus.csv", index=False)
+    # add the timestamps to the labeled corpus without rewriting its text
+    rows = count_labeled_corpus(directory)
+    if rows < len(timestamps):
+        timestamps = timestamps[:rows]
+    # documents without a timestamp keep their row with an empty one
+    append_columns(
+        directory,
+        {
+            "timestamp": pd.array(
+                timestamps + [None] * (rows - len(timestamps)), dtype="Int64"
+            )
+        },
+    )
 
 
     docs = docs["text"].to_list()
@@ -245,8 +265,24 @@ def _visualize_documents(model: BERTopic, session: Session, directory: str = "")
     Returns:
         None
     """
+    embeddings = session.embeddings
+    if embeddings is None:
+        embeddings = model._extract_embeddings(session.data)
+
+    # reuse the 2d layout cached by the topic driver instead of fitting another UMAP
+    reduced_embeddings = getattr(session, "projection", None)
+    if reduced_embeddings is None and os.path.isfile(f"{directory}/projection_2d.npy"):
+        reduced_embeddings = np.load(f"{directory}/projection_2d.npy")
+    if reduced_embeddings is not None and len(reduced_embeddings) != len(session.data):
+        reduced_embeddings = None
+
     try:
-        doc_viz = model.visualize_documents(docs=session.data, sample=0.05)
+        doc_viz = model.visualize_documents(
+            docs=session.data,
+            embeddings=embeddings,
+            reduced_embeddings=reduced_embeddings,
+            sample=0.05,
+        )
 
         if directory:
             doc_viz.write_html(f"{directory}/document_viz.html")
@@ -265,7 +301,8 @@ def _visualize_documents(model: BERTopic, session: Session, directory: str = "")
         hierarchical_docs = model.visualize_hierarchical_documents(
             docs=session.data,
             hierarchical_topics=hierarchical_topics,
-            embeddings=model._extract_embeddings(session.data),
+            embeddings=embeddings,
+            reduced_embeddings=reduced_embeddings,
             nr_levels=math.ceil(math.sqrt(len(hierarchical_topics) // 2)),
             level_scale="log",
         )
@@ -300,6 +337,71 @@ def _visualize_terms(model: BERTopic, session: Session, directory: str = ""):
         session.log("errors", {str(datetime.datetime.now()): traceback.format_exc()})
 
 
+@lru_cache(maxsize=None)
+def _load_labmt(path: str = "src/viz/LABMT.csv") -> pd.Series:
+    """
+    Loads the LabMT lexicon once per process as a hash index from word to happiness score.
+
+    Args:
+        path (str, optional): The path to the LabMT csv. Defaults to "src/viz/LABMT.csv".
+
+    Returns:
+        pd.Series: The happiness score of each word, indexed by word.
+    """
+    labmt = pd.read_csv(path)
+    return labmt.drop_duplicates(subset=["Word"]).set_index("Word")["Happiness Score"]
+
+
+def _filter_through_lens(
+    words: pd.DataFrame, labmt: pd.Series, lens_min: float = 4, lens_max: float = 6
+) -> pd.DataFrame:
+    """
+    Keeps the words of a Zipf table whose LabMT score falls outside of the neutral lens.
+
+    Args:
+        words (pd.DataFrame): A Zipf table with "types" and "counts" columns.
+        labmt (pd.Series): The LabMT index from _load_labmt.
+        lens_min (float, optional): The lower bound of the lens. Defaults to 4.
+        lens_max (float, optional): The upper bound of the lens. Defaults to 6.
+
+    Returns:
+        pd.DataFrame: The "types", "counts" and "score" of the words kept.
+    """
+    scores = words["types"].map(labmt)
+    mask = scores.notna() & ((scores < lens_min) | (scores > lens_max))
+    return pd.DataFrame(
+        {
+            "types": words["types"][mask].values,
+            "counts": words["counts"][mask].values,
+            "score": scores[mask].values,
+        }
+    )
+
+
+@lru_cache(maxsize=None)
+def _load_ous(path: str = "src/viz/NRC-VAD.txt") -> pd.DataFrame:
+    """
+    Loads the NRC-VAD lexicon once per process.
+    """
+    return pd.read_csv(path, delimiter=" ")
+
+
+def _init_render_worker():
+    """
+    Preloads the lexicons once in every rendering worker.
+    """
+    _load_labmt()
+    _load_ous()
+
+
+def _topic_files(directory: str) -> list:
+    """
+    Lists the per-topic Zipf files written by the topic driver.
+    """
+    files = os.listdir(f"{directory}/topics")
+    return sorted(f for f in files if f.endswith("_zipf.csv") and "sample" not in f)
+
+
 def _visualize_word_shifts(session: Session, directory: str = ""):
     """
     Visualizes word shifts between topics and samples.
@@ -308,91 +410,76 @@ def _visualize_word_shifts(session: Session, directory: str = ""):
         session (Session): The session object.
         directory (str, optional): The directory path. Defaults to "".
 
-    Raises:
-        ValueError: If the number of topics is not equal to the number of samples.
-
     Returns:
         None
     """
     try:
         # in directory, there is a sub directory named topics. For each topic, there is a file named topic_zipf.csv
         # and topic_sample_zipf.csv.
-        # get all files in directory/topics
-        files = os.listdir(f"{directory}/topics")
+        files = _topic_files(directory)
+
+        render_topics(
+            partial(_render_word_shift, directory),
+            files,
+            session,
+            workers=getattr(session, "render_workers", 1),
+            initializer=_init_render_worker,
+        )
 
-        samples = [f for f in files if "sample" in f]
-        files = [f for f in files if "sample" not in f]
+    except Exception as e:
+        print(e)
+        session.log("errors", {str(datetime.datetime.now()): traceback.format_exc()})
 
-        labmt = pd.read_csv("src/viz/LABMT.csv")
 
-        # calculate sentiment of corpus
+def _render_word_shift(directory: str, file: str, session, lens_min=4, lens_max=6):
+    """
+    Renders the word shift graph of one topic against its sample.
 
-        lens_min = 4
-        lens_max = 6
+    Args:
+        directory (str): The directory path.
+        file (str): The name of the topic's Zipf file.
+        session: Collects the errors of this topic.
+        lens_min (float, optional): The lower bound of the LabMT lens. Defaults to 4.
+        lens_max (float, optional): The upper bound of the LabMT lens. Defaults to 6.
+    """
+    sample_file = file.replace("_zipf.csv", "_sample_zipf.csv")
+    if not os.path.isfile(f"{directory}/topics/{sample_file}"):
+        return
 
-        for i, file in enumerate(files):
-            topic_words = pd.read_csv(f"{directory}/topics/{file}")
-            sample_words = pd.read_csv(f"{directory}/topics/{samples[i]}")
+    labmt = _load_labmt()
 
-            # turn the types and counts columns into dicts
-            topic_words = dict(zip(topic_words["types"], topic_words["counts"]))
+    topic_words = pd.read_csv(f"{directory}/topics/{file}")
+    sample_words = pd.read_csv(f"{directory}/topics/{sample_file}")
 
-            sample_words = dict(zip(sample_words["types"], sample_words["counts"]))
+    # filter through lens
+    topic_words = _filter_through_lens(topic_words, labmt, lens_min, lens_max)
+    sample_words = _filter_through_lens(sample_words, labmt, lens_min, lens_max)
 
-            # filter through lens
-            topic_words = {
-                k: v
-                for k, v in topic_words.items()
-                if k in labmt["Word"].values
-                and (
-                    labmt[labmt["Word"] == k]["Happiness Score"].values[0] < lens_min
-                    or labmt[labmt["Word"] == k]["Happiness Score"].values[0] > lens_max
-                )
-            }
-
-            sample_words = {
-                k: v
-                for k, v in sample_words.items()
-                if k in labmt["Word"].values
-                and (
-                    labmt[labmt["Word"] == k]["Happiness Score"].values[0] < lens_min
-                    or labmt[labmt["Word"] == k]["Happiness Score"].values[0] > lens_max
-                )
-            }
-
-            sample_total_counts = sum(sample_words.values())
-
-            if sample_total_counts:
-                sample_sentiment = {
-                    k: v
-                    / sample_total_counts
-                    * labmt[labmt["Word"] == k]["Happiness Score"].values[0]
-                    for k, v in sample_words.items()
-                }
-                sample_full_sentiment = sum(sample_sentiment.values())
-
-                shift_graph = sh.WeightedAvgShift(
-                    type2freq_1=sample_words,
-                    type2freq_2=topic_words,
-                    type2score_1="labMT_English",
-                    type2score_2="labMT_English",
-                    reference_value=sample_full_sentiment,
-                    handle_missing_scores="exclude",
-                )
+    sample_total_counts = sample_words["counts"].sum()
 
-                plt.figure(figsize=(10, 10))
+    if sample_total_counts:
+        sample_full_sentiment = float(
+            (
+                sample_words["counts"] / sample_total_counts * sample_words["score"]
+            ).sum()
+        )
 
-                g = shift_graph.get_shift_graph(show_plot=False)
+        shift_graph = sh.WeightedAvgShift(
+            type2freq_1=dict(zip(sample_words["types"], sample_words["counts"])),
+            type2freq_2=dict(zip(topic_words["types"], topic_words["counts"])),
+            type2score_1="labMT_English",
+            type2score_2="labMT_English",
+            reference_value=sample_full_sentiment,
+            handle_missing_scores="exclude",
+        )
 
-                plt.savefig(
-                    f"{directory}/topics/{file.split(sep='.')[0]}_wordshift.png"
-                )
+        plt.figure(figsize=(10, 10))
 
-                plt.close()
+        g = shift_graph.get_shift_graph(show_plot=False)
 
-    except Exception as e:
-        print(e)
-        session.log("errors", {str(datetime.datetime.now()): traceback.format_exc()})
+        plt.savefig(f"{directory}/topics/{file.split(sep='.')[0]}_wordshift.png")
+
+        plt.close()
 
 
 def _safe_read_csv(file_path, session):
@@ -486,66 +573,80 @@ def _visualize_power_danger_structure(session, directory):
         None
     """
 
-    ous = pd.read_csv("src/viz/NRC-VAD.txt", delimiter=" ")
+    ous = _load_ous()
     if ous is None:
         return
 
-    for file in os.listdir(f"{directory}/topics"):
-        if file.endswith(".csv") and "sample" not in file:
-            df = _safe_read_csv(os.path.join(f"{directory}/topics", file), session)
-            if df is not None:
-                df_transformed, df = _process_dataframe_for_visualization(
-                    df, ous, session
+    render_topics(
+        partial(_render_power_danger_structure, directory),
+        _topic_files(directory),
+        session,
+        workers=getattr(session, "render_workers", 1),
+        initializer=_init_render_worker,
+    )
+
+
+def _render_power_danger_structure(directory: str, file: str, session):
+    """
+    Performs the PDS calculation of one topic and renders its heatmaps.
+
+    Args:
+        directory (str): The directory path.
+        file (str): The name of the topic's Zipf file.
+        session: Collects the errors of this topic.
+    """
+    ous = _load_ous()
+
+    df = _safe_read_csv(os.path.join(f"{directory}/topics", file), session)
+    if df is not None:
+        df_transformed, df = _process_dataframe_for_visualization(df, ous, session)
+        if df_transformed is not None:
+            file_base_name = os.path.splitext(file)[0]
+            try:
+                _visualize_heatmap_from_df(
+                    df_transformed,
+                    "Power",
+                    "Danger",
+                    directory,
+                    file_base_name,
+                    session,
+                )
+
+                _visualize_heatmap_from_df(
+                    df_transformed,
+                    "Power",
+                    "Structure",
+                    directory,
+                    file_base_name,
+                    session,
+                )
+
+                _visualize_heatmap_from_df(
+                    df_transformed,
+                    "Danger",
+                    "Structure",
+                    directory,
+                    file_base_name,
+                    session,
+                )
+            except Exception as e:
+                print(e)
+                session.log(
+                    "errors",
+                    {str(datetime.datetime.now()): traceback.format_exc()},
+                )
+
+            try:
+                df = pd.merge(df, df_transformed, left_index=True, right_index=True)
+
+                df.to_csv(
+                    f"{directory}/topics/{file_base_name}_transformed.csv",
+                    index=False,
+                )
+
+            except Exception as e:
+                print(e)
+                session.log(
+                    "errors",
+                    {str(datetime.datetime.now()): traceback.format_exc()},
                 )
-                if df_transformed is not None:
-                    file_base_name = os.path.splitext(file)[0]
-                    try:
-                        _visualize_heatmap_from_df(
-                            df_transformed,
-                            "Power",
-                            "Danger",
-                            directory,
-                            file_base_name,
-                            session,
-                        )
-
-                        _visualize_heatmap_from_df(
-                            df_transformed,
-                            "Power",
-                            "Structure",
-                            directory,
-                            file_base_name,
-                            session,
-                        )
-
-                        _visualize_heatmap_from_df(
-                            df_transformed,
-                            "Danger",
-                            "Structure",
-                            directory,
-                            file_base_name,
-                            session,
-                        )
-                    except Exception as e:
-                        print(e)
-                        session.log(
-                            "errors",
-                            {str(datetime.datetime.now()): traceback.format_exc()},
-                        )
-
-                    try:
-                        df = pd.merge(
-                            df, df_transformed, left_index=True, right_index=True
-                        )
-
-                        df.to_csv(
-                            f"{directory}/topics/{file_base_name}_transformed.csv",
-                            index=False,
-                        )
-
-                    except Exception as e:
-                        print(e)
-                        session.log(
-                            "errors",
-                            {str(datetime.datetime.now()): traceback.format_exc()},
-                        )
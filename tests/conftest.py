@@ -1,5 +1,7 @@
 # conftest.py
+import pickle
 import pytest
+import numpy as np
 import pandas as pd
 import sys
 import os
@@ -7,6 +9,10 @@ import os
 # Add the source directory to the system path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
+from drivers._shard_driver import ShardDriver
+from util._sentiment import SentimentScorer
+from util._session import Session
+
 
 # Define the sample_data fixture
 @pytest.fixture
@@ -23,3 +29,174 @@ def sample_data():
         }
     )
     return data
+
+
+# Stand-ins shared by the driver tests, handed out by the fixtures below. The classes live at
+# module level so that spawned workers, which unpickle them by module name, can import them.
+
+
+class WhitespaceTokenizer:
+    """A fast tokenizer stand-in splitting on spaces and reporting character offsets."""
+
+    is_fast = True
+
+    def __init__(self, model_max_length=512):
+        self.model_max_length = model_max_length
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+    def __call__(self, texts, return_offsets_mapping=False, **kwargs):
+        input_ids, offsets = [], []
+        for text in texts:
+            spans, position = [], 0
+            for word in text.split(" "):
+                if word:
+                    spans.append((position, position + len(word)))
+                position += len(word) + 1
+            input_ids.append(list(range(len(spans))))
+            offsets.append(spans)
+        encoded = {"input_ids": input_ids}
+        if return_offsets_mapping:
+            encoded["offset_mapping"] = offsets
+        return encoded
+
+
+class LengthEncoder:
+    """Embeds a document by its length, padded with ones, and records every batch it encodes."""
+
+    def __init__(self, dimension=2):
+        self.dimension = dimension
+        self.batches = []
+        self.progress_bars = []
+
+    def encode(self, docs, show_progress_bar=True):
+        self.batches.append(len(docs))
+        self.progress_bars.append(show_progress_bar)
+        return np.array(
+            [[len(d)] + [1.0] * (self.dimension - 1) for d in docs], dtype=np.float32
+        )
+
+
+class ParityModel:
+    """Assigns documents to topic 0 or 1 by the parity of their length, and "noise" to -1."""
+
+    TOPICS = {-1: [("noise", 1.0)], 0: [("even", 1.0)], 1: [("odd", 1.0)]}
+
+    def __init__(self, probability=None, topics=None):
+        self.probability = probability
+        self.topics = topics or self.TOPICS
+        self.umap_model = None
+        self.fitted = []
+        self.merged = 1
+
+    def fit_transform(self, docs, embeddings=None):
+        self.fitted = list(docs)
+        return self.transform(docs, embeddings)
+
+    def get_topics(self):
+        return self.topics
+
+    def get_topic(self, topic):
+        return self.get_topics().get(topic, False)
+
+    def transform(self, docs, embeddings=None):
+        assert len(embeddings) == len(docs)
+        topics = [-1 if d.startswith("noise") else len(d) % 2 for d in docs]
+        if self.probability is None:
+            return topics, None
+        # one row of probabilities per document, a scalar is the probability of its topic
+        return topics, np.tile(self.probability, (len(docs), 1))
+
+    def save(self, path, serialization="safetensors", **kwargs):
+        os.makedirs(path, exist_ok=True)
+        with open(f"{path}/model.pkl", "wb") as f:
+            pickle.dump(self, f)
+
+
+class WordCountPipeline:
+    """Scores a chunk by its number of words and records each call."""
+
+    def __init__(self, model_max_length=512):
+        self.tokenizer = WhitespaceTokenizer(model_max_length)
+        self.calls = []
+
+    def __call__(self, texts, batch_size=1, truncation=True):
+        self.calls.append(list(texts))
+        return [{"label": "POSITIVE", "score": len(t.split()) / 10} for t in texts]
+
+
+class StandInShardDriver(ShardDriver):
+    """Fits ParityModel on LengthEncoder embeddings, in this process or a spawned shard worker."""
+
+    def _build_shard_model(self):
+        self.session.topic_model_factory.embedding_model = LengthEncoder()
+        return ParityModel()
+
+    def _load_shard_model(self, model_dir):
+        with open(f"{model_dir}/model.pkl", "rb") as f:
+            return pickle.load(f)
+
+    def _merge_models(self, models):
+        merged = models[0]
+        merged.merged = len(models)
+        return merged
+
+    def _build_sentiment_scorer(self):
+        return SentimentScorer(sentiment_pipeline=WordCountPipeline())
+
+    def _visualize(self, model, directory):
+        pass
+
+
+def _stand_in_session(**kwargs):
+    session = Session(**kwargs)
+    session.cache_dir = None
+    session.topic_model_factory.embedding_model = LengthEncoder()
+    return session
+
+
+@pytest.fixture
+def length_encoder():
+    return LengthEncoder
+
+
+@pytest.fixture
+def parity_model():
+    return ParityModel
+
+
+@pytest.fixture
+def whitespace_tokenizer():
+    return WhitespaceTokenizer
+
+
+@pytest.fixture
+def word_count_pipeline():
+    return WordCountPipeline
+
+
+@pytest.fixture
+def stand_in_session():
+    """
+    Builds sessions that embed with LengthEncoder and cache nothing.
+    """
+    return _stand_in_session
+
+
+@pytest.fixture
+def shard_driver():
+    """
+    Builds a StandInShardDriver over the given documents, written to <directory>/corpus.csv.
+    """
+
+    def build(directory, texts):
+        session = _stand_in_session(
+            save_dir=directory, data_path=f"{directory}/corpus.csv"
+        )
+        pd.DataFrame({"text": texts}).to_csv(f"{directory}/corpus.csv", index=False)
+        driver = StandInShardDriver(session)
+        driver.BATCH_SIZE = 2
+        return driver
+
+    return build
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from util._ann import IVFIndex
+
+
+def _clustered(n=3000, dims=16, centers=30, seed=0):
+    rng = np.random.default_rng(seed)
+    means = rng.normal(size=(centers, dims))
+    labels = rng.integers(0, centers, n)
+    return (means[labels] + 0.3 * rng.normal(size=(n, dims))).astype(np.float32), labels
+
+
+def _exact(embeddings, query, k):
+    vectors = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return np.argsort(-(vectors @ (query / np.linalg.norm(query))))[:k]
+
+
+def test_search_matches_exact_search(tmpdir):
+    embeddings, labels = _clustered()
+    IVFIndex.build(embeddings, labels, n_lists=20).save(str(tmpdir))
+    index = IVFIndex.load(str(tmpdir))
+
+    results = index.search(embeddings[:50], k=10, n_probe=4)
+
+    recall = np.mean(
+        [len(set(ids) & set(_exact(embeddings, q, 10))) / 10 for (ids, _), q in zip(results, embeddings)]
+    )
+    assert recall > 0.95
+    for ids, scores in results:
+        assert np.all(np.diff(scores) <= 0)
+    # every document finds itself first
+    assert [ids[0] for ids, _ in results] == list(range(50))
+
+
+def test_small_corpora_are_searched_exactly():
+    embeddings, _ = _clustered(n=500)
+    index = IVFIndex.build(embeddings, ids=np.arange(500) + 1000)
+
+    assert len(index.centroids) == 1
+    ids, scores = index.search(embeddings[7], k=5)[0]
+    assert list(ids) == list(_exact(embeddings, embeddings[7], 5) + 1000)
+    assert scores[0] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_search_within_a_topic():
+    embeddings, labels = _clustered()
+    index = IVFIndex.build(embeddings, labels, n_lists=20)
+
+    ids, _ = index.search(embeddings[0], k=1000, label=3)[0]
+    assert len(ids) == np.sum(labels == 3)
+    assert set(labels[ids]) == {3}
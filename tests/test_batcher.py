@@ -0,0 +1,77 @@
+import threading
+import time
+import pytest
+from util._batcher import MicroBatcher
+
+
+class RecordingProcess:
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        time.sleep(self.delay)
+        return [item * 2 for item in items]
+
+
+def test_concurrent_requests_share_batches():
+    process = RecordingProcess(delay=0.01)
+    batcher = MicroBatcher(process, max_batch_size=8, max_latency_ms=50).start()
+    results = {}
+
+    def request(i):
+        results[i] = batcher.submit([i, i + 100])
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.stop()
+
+    # every caller gets back the results of its own documents
+    assert results == {i: [2 * i, 2 * (i + 100)] for i in range(12)}
+    assert len(process.batches) < 12
+    assert max(len(batch) for batch in process.batches) <= 8
+
+    stats = batcher.stats()
+    assert stats["requests"] == 12
+    assert stats["documents"] == 24
+    assert stats["queue_depth"] == 0
+    assert stats["max_queue_depth"] >= 2
+    assert 0 < stats["latency_ms"]["p50"] <= stats["latency_ms"]["p99"]
+
+
+def test_deadline_flushes_a_partial_batch():
+    process = RecordingProcess()
+    batcher = MicroBatcher(process, max_batch_size=1000, max_latency_ms=5).start()
+
+    start = time.perf_counter()
+    assert batcher.submit([1, 2, 3]) == [2, 4, 6]
+    assert time.perf_counter() - start < 1
+    batcher.stop()
+
+    assert process.batches == [[1, 2, 3]]
+
+
+def test_errors_reach_every_caller_of_the_batch():
+    def fail(items):
+        raise ValueError("model failed")
+
+    batcher = MicroBatcher(fail, max_latency_ms=1).start()
+    with pytest.raises(ValueError, match="model failed"):
+        batcher.submit(["a"])
+
+    # the worker keeps serving after a failed batch
+    batcher.process = RecordingProcess()
+    assert batcher.submit([1]) == [2]
+    batcher.stop()
+
+
+def test_empty_request_and_stopped_batcher():
+    batcher = MicroBatcher(RecordingProcess())
+    assert batcher.submit([]) == []
+    with pytest.raises(Exception):
+        batcher.submit([1])
+    assert batcher.stats()["latency_ms"]["p50"] is None
@@ -0,0 +1,53 @@
+import copy
+import numpy as np
+from benchmarks._corpus import zipf_corpus
+from benchmarks.run_benchmarks import compare, run_size
+
+
+def test_zipf_corpus_is_reproducible():
+    corpus = zipf_corpus(200, seed=1)
+    assert len(corpus) == 200
+    assert corpus == zipf_corpus(200, seed=1)
+    assert corpus != zipf_corpus(200, seed=2)
+
+
+def test_zipf_corpus_frequencies_fall_with_rank():
+    words = " ".join(zipf_corpus(2000, vocab_size=5000)).replace(".", "").split()
+    _, counts = np.unique(words, return_counts=True)
+    counts = np.sort(counts)[::-1]
+    # the most frequent word is roughly twice as frequent as the second, as Zipf's law predicts
+    assert 1.5 < counts[0] / counts[1] < 3
+    assert counts[0] > 100 * counts[1000]
+
+
+def test_run_size_records_every_stage():
+    result = run_size(300)
+    stages = [s["stage"] for s in result["stages"]]
+
+    for stage in ["embed", "fit", "sentiment", "save_corpus", "zipf", "formatter", "word_shifts"]:
+        assert stage in stages
+    assert result["documents"] == 300
+    assert result["peak_rss_mb"] > 0
+
+
+def test_compare_flags_regressions():
+    stage = {"stage": "zipf", "wall_seconds": 1.0, "items_per_second": 1000.0}
+    baseline = {"results": [{"documents": 1000, "peak_rss_mb": 100.0, "stages": [stage]}]}
+
+    report = copy.deepcopy(baseline)
+    assert compare(report, baseline, threshold=0.25) == []
+
+    report["results"][0]["stages"][0]["items_per_second"] = 500.0
+    report["results"][0]["peak_rss_mb"] = 200.0
+    regressions = compare(report, baseline, threshold=0.25)
+    assert len(regressions) == 2
+    assert "zipf at 1000 documents" in regressions[0]
+
+    # a stage of the baseline that was skipped is a regression
+    report["results"][0]["stages"] = []
+    report["results"][0]["peak_rss_mb"] = 100.0
+    assert compare(report, baseline) == ["zipf at 1000 documents did not run"]
+
+    # sizes missing from the baseline are not compared
+    report["results"][0]["documents"] = 10
+    assert compare(report, baseline) == []
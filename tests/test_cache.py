@@ -0,0 +1,191 @@
+import os
+import sys
+import types
+import numpy as np
+import pytest
+from sklearn.decomposition import PCA
+from builders._tm_factory import TopicModelFactory
+from util._cache import (
+    EmbeddingCache,
+    ReductionCache,
+    SentimentCache,
+    cache_usage,
+    hash_text,
+    prune_cache,
+)
+
+
+class CountingEncoder:
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.seen = []
+
+    def __call__(self, docs):
+        self.seen.extend(docs)
+        return np.array([[len(d)] * self.dim for d in docs], dtype=np.float64)
+
+
+def test_hash_text_normalizes():
+    assert hash_text("vaccine ") == hash_text("vaccine")
+    assert hash_text("vaccine") != hash_text("Vaccine")
+
+
+def test_get_or_compute_only_encodes_misses(tmpdir):
+    encoder = CountingEncoder()
+    cache = EmbeddingCache(str(tmpdir), "all-MiniLM-L6-v2")
+
+    first = cache.get_or_compute(["a", "bb", "a"], encoder)
+    assert first.dtype == np.float32
+    assert first.shape == (3, 4)
+    assert encoder.seen == ["a", "bb"]
+
+    second = cache.get_or_compute(["bb", "ccc"], encoder)
+    assert encoder.seen == ["a", "bb", "ccc"]
+    assert np.array_equal(second[0], first[1])
+    assert second[1][0] == 3
+
+
+def test_cache_persists_across_instances(tmpdir):
+    encoder = CountingEncoder()
+    EmbeddingCache(str(tmpdir), "user/model", "v1").get_or_compute(["x", "yy"], encoder)
+
+    reopened = EmbeddingCache(str(tmpdir), "user/model", "v1")
+    assert len(reopened) == 2
+    embeddings = reopened.get_or_compute(["yy", "x"], encoder)
+    assert encoder.seen == ["x", "yy"]
+    assert embeddings[0][0] == 2
+
+    other_revision = EmbeddingCache(str(tmpdir), "user/model", "v2")
+    assert len(other_revision) == 0
+
+
+def test_sentiment_cache_scores_misses_once(tmpdir):
+    scored = []
+
+    def score(texts):
+        scored.extend(texts)
+        return np.array([len(t) / 10 for t in texts])
+
+    cache = SentimentCache(str(tmpdir), "distilbert-sst2")
+    assert np.allclose(cache.get_or_compute(["ab", "c", "ab"], score), [0.2, 0.1, 0.2])
+    assert scored == ["ab", "c"]
+    cache.close()
+
+    reopened = SentimentCache(str(tmpdir), "distilbert-sst2")
+    assert np.allclose(reopened.get_or_compute(["c", "def"], score), [0.1, 0.3])
+    assert scored == ["ab", "c", "def"]
+    assert np.isnan(SentimentCache(str(tmpdir), "other-model").lookup([hash_text("c")])[0])
+
+
+def test_reduction_cache_keys_on_embeddings_and_config(tmpdir):
+    embeddings = np.random.default_rng(0).normal(size=(30, 6)).astype(np.float32)
+    cache = ReductionCache(str(tmpdir))
+    reducer = PCA(n_components=2)
+
+    key = cache.key(embeddings, reducer)
+    assert cache.get(key) == (None, None)
+    assert key != cache.key(embeddings, PCA(n_components=3))
+    assert key != cache.key(embeddings[:10], reducer)
+
+    reduced = reducer.fit_transform(embeddings)
+    cache.put(key, reduced, reducer)
+
+    cached, fitted = ReductionCache(str(tmpdir)).get(key)
+    assert np.array_equal(cached, reduced)
+    assert np.allclose(fitted.transform(embeddings), reduced)
+
+
+def test_prune_cache_evicts_least_recently_used(tmpdir):
+    encoder = CountingEncoder(dim=64)
+    old = EmbeddingCache(str(tmpdir), "user/model", "a" * 40)
+    old.get_or_compute([str(i) for i in range(50)], encoder)
+    new = EmbeddingCache(str(tmpdir), "user/model", "b" * 40)
+    new.get_or_compute([str(i) for i in range(50)], encoder)
+    os.utime(old.directory, (0, 0))
+
+    usage = cache_usage(str(tmpdir))
+    assert usage[f"embeddings/user__model/{'a' * 40}"] > 50 * 64 * 4
+
+    evicted = prune_cache(str(tmpdir), usage[f"embeddings/user__model/{'b' * 40}"])
+    assert evicted == [f"embeddings/user__model/{'a' * 40}"]
+    assert not os.path.isdir(old.directory)
+    assert len(EmbeddingCache(str(tmpdir), "user/model", "b" * 40)) == 50
+
+
+def test_prune_cache_skips_directories_being_written(tmpdir):
+    fcntl = pytest.importorskip("fcntl")
+    encoder = CountingEncoder(dim=64)
+    busy = EmbeddingCache(str(tmpdir), "user/model", "a" * 40)
+    busy.get_or_compute([str(i) for i in range(50)], encoder)
+    idle = EmbeddingCache(str(tmpdir), "user/model", "b" * 40)
+    idle.get_or_compute([str(i) for i in range(50)], encoder)
+    os.utime(busy.directory, (0, 0))
+
+    # another job holds the lock of the least recently used directory while it appends
+    with open(busy.lock_path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        evicted = prune_cache(str(tmpdir), 0)
+        fcntl.flock(handle, fcntl.LOCK_UN)
+
+    assert evicted == [f"embeddings/user__model/{'b' * 40}"]
+    assert len(EmbeddingCache(str(tmpdir), "user/model", "a" * 40)) == 50
+
+    # a cache whose directory was evicted under it starts again instead of failing
+    encoder.seen.clear()
+    assert idle.get_or_compute(["1", "new"], encoder)[0][0] == 1
+    assert encoder.seen == ["1", "new"]
+    assert len(EmbeddingCache(str(tmpdir), "user/model", "b" * 40)) == 2
+
+
+def test_resolve_revision_reads_the_pinned_commit(tmpdir, monkeypatch):
+    refs = tmpdir.mkdir("models--sentence-transformers--all-MiniLM-L6-v2").mkdir("refs")
+    refs.join("main").write("c" * 40 + "\n")
+    monkeypatch.setenv("HF_HUB_CACHE", str(tmpdir))
+
+    assert TopicModelFactory._resolve_revision("all-MiniLM-L6-v2") == "c" * 40
+    assert TopicModelFactory._resolve_revision("all-MiniLM-L6-v2", "d" * 40) == "d" * 40
+    assert TopicModelFactory._resolve_revision(str(tmpdir), "v1") == "v1"
+
+
+def test_resolve_revision_asks_the_hub_only_when_online(tmpdir, monkeypatch):
+    class HfHubHTTPError(Exception):
+        pass
+
+    calls = []
+
+    def model_info(repo_id, revision=None):
+        calls.append(repo_id)
+        if repo_id == "user/missing":
+            raise HfHubHTTPError("404")
+        return types.SimpleNamespace(sha="e" * 40)
+
+    hub = types.ModuleType("huggingface_hub")
+    hub.model_info = model_info
+    hub.utils = types.ModuleType("huggingface_hub.utils")
+    hub.utils.HfHubHTTPError = HfHubHTTPError
+    monkeypatch.setitem(sys.modules, "huggingface_hub", hub)
+    monkeypatch.setitem(sys.modules, "huggingface_hub.utils", hub.utils)
+    monkeypatch.setenv("HF_HUB_CACHE", str(tmpdir))
+    monkeypatch.delenv("HF_HUB_OFFLINE", raising=False)
+    monkeypatch.delenv("TRANSFORMERS_OFFLINE", raising=False)
+
+    assert TopicModelFactory._resolve_revision("user/model") == "e" * 40
+    assert TopicModelFactory._resolve_revision("user/missing", "v1") == "v1"
+
+    monkeypatch.setenv("TRANSFORMERS_OFFLINE", "1")
+    assert TopicModelFactory._resolve_revision("user/model", "v1") == "v1"
+    assert calls == ["user/model", "user/missing"]
+
+
+def test_cache_reads_keys_appended_by_other_jobs(tmpdir):
+    encoder = CountingEncoder()
+    first = EmbeddingCache(str(tmpdir), "user/model", "v1")
+    second = EmbeddingCache(str(tmpdir), "user/model", "v1")
+
+    first.get_or_compute(["x", "yy"], encoder)
+    second.get_or_compute(["zzz"], encoder)
+    # the second cache picked up the keys of the first when it appended its own
+    assert len(second) == 3
+    assert second.get_or_compute(["x"], encoder)[0][0] == 1
+    assert encoder.seen == ["x", "yy", "zzz"]
+    assert second._keys_offset == os.path.getsize(second.keys_path)
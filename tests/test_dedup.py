@@ -0,0 +1,35 @@
+import numpy as np
+from loading._dedup import DuplicateGroups, MinHashLSH, find_duplicates
+
+
+def test_exact_duplicates_ignore_case_and_whitespace():
+    groups = find_duplicates(["Get vaccinated!", "other", "get  vaccinated! ", "other"])
+
+    assert groups.inverse.tolist() == [0, 1, 0, 1]
+    assert groups.counts.tolist() == [2, 2]
+    assert groups.unique() == ["Get vaccinated!", "other"]
+
+
+def test_groups_are_numbered_by_first_occurrence():
+    groups = DuplicateGroups(["a", "b", "c", "d"], np.array([7, 3, 7, 5]))
+
+    assert groups.inverse.tolist() == [0, 1, 0, 2]
+    assert groups.representatives.tolist() == [0, 1, 3]
+
+
+def test_near_duplicates_are_grouped():
+    text = "the vaccine rollout in our county was slow and poorly organized and nobody answered the phone"
+    documents = [text, "completely unrelated remark about the weather today", text + "!!"]
+
+    assert len(find_duplicates(documents)) == 3
+    groups = find_duplicates(documents, near=True)
+    assert groups.inverse.tolist() == [0, 1, 0]
+    assert groups.counts.tolist() == [2, 1]
+
+
+def test_minhash_estimates_jaccard_similarity():
+    lsh = MinHashLSH(num_perm=256, bands=32)
+    signatures = lsh.signatures(["abcdefghijklmnop", "abcdefghijklmnop", "zyxwvutsrq"])
+
+    assert (signatures[0] == signatures[1]).all()
+    assert (signatures[0] == signatures[2]).mean() < 0.1
@@ -79,4 +79,30 @@ def test_zipf_data_to_json(formatter):
         7: {"types": "job", "counts": 1, "probs": 0.1, "total_unique": 8}
     }
     result = formatter.zipf_data_to_json(posts, comments)
-    assert result == expected_result
\ No newline at end of file
+    assert result == expected_result
+
+
+def test_count_words_keeps_documents_apart(formatter):
+    formatter.BLOCK_SIZE = 2
+    result = formatter.count_words(["end", "start. end", "!!!", "Start"])
+    assert list(result.items()) == [("end", 2), ("start", 2)]
+
+
+def test_count_words_strips_punctuation(formatter):
+    result = formatter.count_words(["Don't stop,\tbelieving!! ... stop"])
+    assert list(result.items()) == [("dont", 1), ("stop", 2), ("believing", 1)]
+
+
+def test_document_term_matrix_matches_zipf(formatter):
+    posts = ["This is a post.", "Another post."]
+    comments = ["Nice post!", "Great job!"]
+    matrix, types = formatter.document_term_matrix(posts + comments)
+
+    assert matrix.shape == (4, 8)
+    assert list(types) == ["this", "is", "a", "post", "another", "nice", "great", "job"]
+
+    expected_result = formatter.zipf_data_to_dataframe(posts, comments)
+    assert formatter.counts_to_dataframe(matrix.sum(axis=0), types).equals(expected_result)
+    assert formatter.counts_to_dataframe(matrix[[0, 1]].sum(axis=0), types).equals(
+        formatter.zipf_data_to_dataframe(posts)
+    )
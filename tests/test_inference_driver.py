@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from drivers._inference_driver import InferenceDriver
+from util._profiler import StageProfiler
+
+
+@pytest.fixture
+def wordy_parity_model(parity_model):
+    """
+    Builds ParityModels describing topic 1 with two words and returning per topic probabilities.
+    """
+    topics = {-1: [("noise", 1.0)], 0: [("even", 1.0)], 1: [("odd", 1.0), ("words", 0.5)]}
+    return lambda: parity_model(probability=[0.2, 0.8], topics=topics)
+
+
+def test_transform_file_streams_batches(tmpdir, stand_in_session, wordy_parity_model):
+    directory = str(tmpdir)
+    texts = ["ab", "abc", "noise x", "", "abcd", "a"]
+    pd.DataFrame({"text": texts}).to_csv(f"{directory}/new.csv", index=False)
+
+    driver = InferenceDriver(stand_in_session())
+    encoder = driver.session.topic_model_factory.embedding_model
+    driver.BATCH_SIZE = 2
+    driver.profiler = StageProfiler()
+
+    path = driver.transform_file(wordy_parity_model(), f"{directory}/new.csv", directory)
+    assignments = pd.read_csv(path)
+
+    assert encoder.batches == [2, 2, 1]
+    assert assignments["text"].tolist() == ["ab", "abc", "noise x", "abcd", "a"]
+    # outliers take the label after the last topic, as in labeled_corpus.csv
+    assert assignments["label"].tolist() == [0, 1, 3, 0, 1]
+    assert assignments["topic_labels"].tolist() == ["even", "odd words", "noise", "even", "odd words"]
+    assert np.allclose(assignments["probability"], 0.8)
+    assert driver.profiler.stages[0]["items"] == 5
+
+
+def test_transform_file_overwrites_assignments(tmpdir, stand_in_session, wordy_parity_model):
+    directory = str(tmpdir)
+    pd.DataFrame({"text": ["ab", "abc"]}).to_csv(f"{directory}/new.csv", index=False)
+
+    driver = InferenceDriver(stand_in_session())
+
+    driver.transform_file(wordy_parity_model(), f"{directory}/new.csv", directory)
+    path = driver.transform_file(wordy_parity_model(), f"{directory}/new.csv", directory)
+
+    assert len(pd.read_csv(path)) == 2
+
+
+def test_transform_file_opens_the_embedding_cache_once(tmpdir, stand_in_session, wordy_parity_model):
+    directory = str(tmpdir)
+    pd.DataFrame({"text": ["ab", "abc", "abcd", "a", "ab"]}).to_csv(
+        f"{directory}/new.csv", index=False
+    )
+
+    driver = InferenceDriver(stand_in_session())
+    driver.session.cache_dir = f"{directory}/cache"
+    factory = driver.session.topic_model_factory
+    encoder = factory.embedding_model
+    factory.embedding_model_name = "length"
+    driver.BATCH_SIZE = 2
+    driver.profiler = StageProfiler()
+
+    opened = []
+    open_embedding_cache = factory.open_embedding_cache
+
+    def counting_open(cache_dir):
+        opened.append(cache_dir)
+        return open_embedding_cache(cache_dir)
+
+    factory.open_embedding_cache = counting_open
+
+    driver.transform_file(wordy_parity_model(), f"{directory}/new.csv", directory)
+    assert opened == [f"{directory}/cache"]
+    # the repeated "ab" of the last batch was cached by the first
+    assert encoder.batches == [2, 2]
+
+    driver.transform_file(wordy_parity_model(), f"{directory}/new.csv", directory)
+    assert encoder.batches == [2, 2]
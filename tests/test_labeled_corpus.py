@@ -0,0 +1,82 @@
+import os
+import pandas as pd
+import pytest
+from util._labeled_corpus import (
+    append_columns,
+    count_labeled_corpus,
+    read_labeled_corpus,
+    write_labeled_corpus,
+)
+
+
+def _corpus():
+    return pd.DataFrame(
+        {
+            "text": ["a b", "nan", "c d e", ""],
+            "label": [0, 1, 0, 2],
+            "sentiment": [0.1, 0.2, 0.3, 0.4],
+            "topic_labels": ["cats dogs", "rain", "cats dogs", ""],
+        }
+    )
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet"])
+def test_write_and_read_round_trip(tmpdir, output_format):
+    directory = str(tmpdir)
+    path = write_labeled_corpus(_corpus(), directory, output_format)
+
+    assert path.endswith(f"labeled_corpus.{output_format}")
+    corpus = read_labeled_corpus(directory)
+    assert corpus["text"].tolist() == ["a b", "nan", "c d e", ""]
+    assert corpus["topic_labels"].astype(str).tolist() == _corpus()["topic_labels"].tolist()
+    assert read_labeled_corpus(directory, ["topic_labels", "label", "missing"]).columns.tolist() == [
+        "topic_labels",
+        "label",
+    ]
+
+
+def test_parquet_dictionary_encodes_topic_labels(tmpdir):
+    import pyarrow.parquet as pq
+
+    directory = str(tmpdir)
+    path = write_labeled_corpus(_corpus(), directory, "parquet")
+
+    assert str(pq.read_schema(path).field("topic_labels").type).startswith("dictionary")
+    assert isinstance(read_labeled_corpus(directory)["topic_labels"].dtype, pd.CategoricalDtype)
+
+
+def test_append_columns_writes_a_sidecar(tmpdir):
+    directory = str(tmpdir)
+    write_labeled_corpus(_corpus(), directory, "parquet")
+    before = os.path.getmtime(f"{directory}/labeled_corpus.parquet")
+
+    append_columns(directory, {"timestamp": pd.array([1, 2, None, 4], dtype="Int64")})
+    append_columns(directory, {"timestamp": pd.array([5, 6, 7, 8], dtype="Int64")})
+
+    assert os.path.getmtime(f"{directory}/labeled_corpus.parquet") == before
+    assert read_labeled_corpus(directory, ["timestamp"])["timestamp"].tolist() == [5, 6, 7, 8]
+    assert count_labeled_corpus(directory) == 4
+
+    with pytest.raises(ValueError):
+        append_columns(directory, {"extra": [1, 2]})
+
+
+def test_append_columns_rewrites_a_csv(tmpdir):
+    directory = str(tmpdir)
+    write_labeled_corpus(_corpus(), directory)
+
+    append_columns(directory, {"timestamp": pd.array([1, None, 3, 4], dtype="Int64")})
+
+    corpus = pd.read_csv(f"{directory}/labeled_corpus.csv")
+    assert corpus.columns.tolist()[-1] == "timestamp"
+    assert corpus["timestamp"].isna().tolist() == [False, True, False, False]
+
+
+def test_writing_another_format_removes_stale_outputs(tmpdir):
+    directory = str(tmpdir)
+    write_labeled_corpus(_corpus(), directory, "parquet")
+    append_columns(directory, {"timestamp": [1, 2, 3, 4]})
+
+    write_labeled_corpus(_corpus(), directory, "csv")
+
+    assert sorted(os.listdir(directory)) == ["labeled_corpus.csv"]
@@ -121,3 +121,52 @@ def test_invalid_filetype():
 def test_invalid_config_file():
     with pytest.raises(Exception):
         cli = LNLPCLI(global_data_path="tests/test_data/data.csv", global_config_path="tests/test_data/config.txt")
+
+
+def test_load_json_lines_compressed(tmpdir):
+    import gzip
+    import json
+
+    path = str(tmpdir.join("data.jsonl.gz"))
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for record in [{"text": "a", "id": 1}, {"text": None}, {"text": ""}, {"text": "b"}]:
+            f.write(json.dumps(record) + "\n")
+
+    assert loader._load_data(path) == ["a", "b"]
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".feather"])
+def test_load_arrow_formats(tmpdir, extension):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    table = pa.table({"id": [1, 2, 3, 4], "text": ["a", None, "", "b"]})
+    path = str(tmpdir.join("data" + extension))
+    if extension == ".parquet":
+        pq.write_table(table, path)
+    else:
+        feather.write_feather(table, path)
+
+    assert loader._load_data(path) == ["a", "b"]
+    assert list(loader._read_columns(path, ["text"]).columns) == ["text"]
+
+
+def test_iter_chunks_streams_csv_in_projected_chunks(tmpdir):
+    path = str(tmpdir.join("data.csv"))
+    with open(path, "w") as f:
+        f.write('id,text,author\n1,a,x\n2,,y\n3,"",z\n4,nan,w\n5,b,v\n6,"c, d",u\n7,0,t\n')
+
+    chunked = DataLoader()
+    chunked.CHUNK_SIZE = 3
+    chunks = list(chunked._iter_chunks(path, ["text", "missing"]))
+
+    # 7 rows in chunks of 3, with only the text column read, as strings
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert all(list(chunk.columns) == ["text"] for chunk in chunks)
+
+    cleaned = [chunked._clean_text(chunk["text"]) for chunk in chunks]
+    # null, empty and "nan" rows are dropped within their own chunk
+    assert cleaned == [["a"], ["b", "c, d"], ["0"]]
+    assert chunked._load_data(path) == ["a", "b", "c, d", "0"]
+    assert chunked._load_data(path) == loader._load_data(path)
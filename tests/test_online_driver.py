@@ -0,0 +1,139 @@
+import json
+import os
+import pandas as pd
+import pytest
+from drivers._online_driver import OnlineDriver
+
+
+# crashes already simulated, the pickled checkpoints cannot carry this
+CRASHES = []
+
+
+class CountingModel:
+    """Records every document it is fitted on, and fails once on a given batch to simulate a crash."""
+
+    def __init__(self, fail_on_batch=None):
+        self.embedding_model = "embedder"
+        self.seen = []
+        self.batches = 0
+        self.fail_on_batch = fail_on_batch
+
+    def partial_fit(self, docs, embeddings=None):
+        assert len(embeddings) == len(docs)
+        self.batches += 1
+        if self.batches == self.fail_on_batch and not CRASHES:
+            CRASHES.append(self.batches)
+            raise RuntimeError("crash")
+        self.seen.extend(docs)
+        return self
+
+    def get_topics(self):
+        return {0: [("even", 1.0)], 1: [("odd", 1.0)]}
+
+    def get_topic(self, topic):
+        return self.get_topics().get(topic, False)
+
+    def transform(self, docs, embeddings=None):
+        return [len(d) % 2 for d in docs], None
+
+    def save(self, path, serialization="safetensors", **kwargs):
+        os.makedirs(path, exist_ok=True)
+
+
+@pytest.fixture
+def online_driver(stand_in_session):
+    """
+    Builds an OnlineDriver over <directory>/corpus.csv that fits the given model.
+    """
+
+    def build(directory, model):
+        driver = OnlineDriver(stand_in_session(data_path=f"{directory}/corpus.csv"))
+        driver.BATCH_SIZE = 2
+        driver.CHECKPOINT_EVERY = 1
+        driver._build_online_model = lambda: model
+        return driver
+
+    return build
+
+
+def _write_corpus(directory, texts):
+    pd.DataFrame({"text": texts}).to_csv(f"{directory}/corpus.csv", index=False)
+
+
+def test_run_online_checkpoints_and_labels(tmpdir, online_driver):
+    directory = str(tmpdir)
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+    _write_corpus(directory, texts)
+
+    model = CountingModel()
+    online_driver(directory, model).run_online(directory=directory)
+
+    assert model.seen == texts
+    with open(f"{directory}/checkpoint/state.json") as f:
+        state = json.load(f)
+    assert state["complete"]
+    assert state["documents"] == 5
+    assert state["batches"] == 3
+
+    assignments = pd.read_csv(f"{directory}/assignments.csv")
+    assert assignments["label"].tolist() == [1, 0, 1, 0, 1]
+    assert os.path.isfile(f"{directory}/run_profile.json")
+
+
+def test_resume_continues_after_the_last_checkpoint(tmpdir, online_driver):
+    directory = str(tmpdir)
+    texts = ["a", "bb", "ccc", "dddd", "eeeee", "ffffff"]
+    _write_corpus(directory, texts)
+    CRASHES.clear()
+
+    with pytest.raises(RuntimeError):
+        driver = online_driver(directory, CountingModel(fail_on_batch=3))
+        driver.run_online(directory=directory)
+
+    driver = online_driver(directory, None)
+    driver.run_online(directory=directory, resume=directory)
+
+    model, state = driver.load_checkpoint(f"{directory}/checkpoint")
+    # every document is fitted exactly once across the crash
+    assert model.seen == texts
+    assert state["total_documents"] == 6
+    # the embedding model is not pickled with the checkpoint
+    assert model.embedding_model is None
+
+
+def test_resume_with_new_data_updates_the_model(tmpdir, online_driver):
+    directory = str(tmpdir)
+    _write_corpus(directory, ["a", "bb"])
+    online_driver(directory, CountingModel()).run_online(directory=directory)
+
+    _write_corpus(directory, ["ccc"])
+    driver = online_driver(directory, None)
+    driver.run_online(directory=directory, resume=directory)
+
+    model, state = driver.load_checkpoint(directory)
+    assert model.seen == ["a", "bb", "ccc"]
+    assert state["documents"] == 1
+    assert state["total_documents"] == 3
+
+
+def test_partial_fit_opens_the_embedding_cache_once(tmpdir, online_driver):
+    directory = str(tmpdir)
+    _write_corpus(directory, ["a", "bb", "ccc", "dddd", "eeeee"])
+
+    driver = online_driver(directory, CountingModel())
+    driver.session.cache_dir = f"{directory}/cache"
+    factory = driver.session.topic_model_factory
+    factory.embedding_model_name = "length"
+
+    opened = []
+    open_embedding_cache = factory.open_embedding_cache
+
+    def counting_open(cache_dir):
+        opened.append(cache_dir)
+        return open_embedding_cache(cache_dir)
+
+    factory.open_embedding_cache = counting_open
+    driver.run_online(directory=directory)
+
+    # once for the three fitted batches and once for labeling the file
+    assert opened == [f"{directory}/cache"] * 2
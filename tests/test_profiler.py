@@ -0,0 +1,94 @@
+import json
+import os
+import pstats
+from util._profiler import StageProfiler
+
+
+def test_stages_are_recorded(tmpdir):
+    profiler = StageProfiler()
+    with profiler.stage("embed", 1000):
+        sum(range(10000))
+    with profiler.stage("visualize"):
+        pass
+
+    profiler.write(str(tmpdir))
+
+    with open(os.path.join(str(tmpdir), "run_profile.json")) as f:
+        profile = json.load(f)
+    assert [s["stage"] for s in profile["stages"]] == ["embed", "visualize"]
+    embed = profile["stages"][0]
+    assert embed["items"] == 1000
+    assert embed["items_per_second"] > 0
+    assert embed["wall_seconds"] >= 0
+    assert embed["peak_rss_mb"] > 0
+    assert profile["stages"][1]["items_per_second"] is None
+    assert not os.path.exists(os.path.join(str(tmpdir), "profiles"))
+
+
+def test_stage_is_recorded_when_it_raises():
+    profiler = StageProfiler()
+    try:
+        with profiler.stage("fit", 10):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert profiler.stages[0]["stage"] == "fit"
+
+
+def test_detailed_profiles_are_dumped(tmpdir):
+    profiler = StageProfiler(detailed=True)
+    with profiler.stage("map topics", 10):
+        sorted(range(1000), key=lambda x: -x)
+
+    profiler.write(str(tmpdir))
+
+    path = os.path.join(str(tmpdir), "profiles", "00_map_topics.prof")
+    assert os.path.exists(path)
+    assert pstats.Stats(path).total_calls > 0
+
+
+def test_stages_are_printed_only_when_detailed(capsys):
+    with StageProfiler().stage("fit", 10):
+        pass
+    assert capsys.readouterr().out == ""
+
+    with StageProfiler(detailed=True).stage("fit", 10):
+        pass
+    assert capsys.readouterr().out.startswith("[profile] fit: ")
+
+
+def test_peak_memory_is_measured_per_stage():
+    import numpy as np
+
+    profiler = StageProfiler()
+    with profiler.stage("allocate"):
+        block = np.ones(2**25, dtype=np.uint8)
+        del block
+    with profiler.stage("idle"):
+        pass
+
+    allocate, idle = profiler.stages
+    assert allocate["peak_rss_source"] in ("high_water_mark", "sampled", "lifetime")
+    assert allocate["peak_rss_mb"] >= allocate["rss_mb"] + 16
+    if idle["peak_rss_source"] != "lifetime":
+        # the 32 MB block freed in the first stage does not count towards the second
+        assert idle["peak_rss_mb"] < allocate["peak_rss_mb"] - 16
+
+
+def test_peak_memory_is_sampled_without_high_water_mark():
+    import time
+    import numpy as np
+
+    profiler = StageProfiler()
+    profiler._can_reset = False
+    with profiler.stage("allocate"):
+        block = np.ones(2**25, dtype=np.uint8)
+        time.sleep(0.1)
+        del block
+
+    stage = profiler.stages[0]
+    if profiler._can_sample:
+        assert stage["peak_rss_source"] == "sampled"
+        assert stage["peak_rss_mb"] >= stage["rss_mb"] + 16
+    else:
+        assert stage["peak_rss_source"] == "lifetime"
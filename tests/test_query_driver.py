@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from drivers._query_driver import QueryDriver
+from util._ann import IVFIndex
+from util._session import Session
+
+
+class VowelEncoder:
+    def encode(self, docs, show_progress_bar=True):
+        return np.array(
+            [[d.count("a") + 0.1, d.count("o") + 0.1, d.count("u") + 0.1] for d in docs],
+            dtype=np.float32,
+        )
+
+
+def test_query_joins_results_with_the_labeled_corpus(tmpdir):
+    directory = str(tmpdir)
+    texts = ["banana", "foo boo", "lulu", "papaya", "zoo moo"]
+    pd.DataFrame(
+        {
+            "text": texts,
+            "label": [0, 1, 2, 0, 1],
+            "x": np.zeros(5),
+            "topic_labels": ["fruit", "animal", "name", "fruit", "animal"],
+        }
+    ).to_csv(f"{directory}/labeled_corpus.csv", index=False)
+
+    session = Session()
+    session.topic_model_factory.embedding_model = VowelEncoder()
+    IVFIndex.build(VowelEncoder().encode(texts), labels=[0, 1, 2, 0, 1]).save(
+        f"{directory}/ann_index"
+    )
+
+    driver = QueryDriver(session)
+    results = driver.query(directory, ["kakadu", "oooh"], top_k=2)
+
+    assert results[0]["text"].tolist() == ["banana", "papaya"]
+    assert results[0]["row"].tolist() == [0, 3]
+    assert results[1]["topic_labels"].tolist() == ["animal", "animal"]
+    assert "x" not in results[0]
+
+    within = driver.search(["oooh"], top_k=5, topic=2)[0]
+    assert within["text"].tolist() == ["lulu"]
@@ -0,0 +1,48 @@
+import os
+from viz._render import render_topics
+from util._session import Session
+
+
+def _write_topic(item, log):
+    if item == "bad":
+        raise ValueError("cannot render topic")
+    if item == "warn":
+        log.log("errors", {"warning": item})
+    with open(os.path.join(os.environ["RENDER_TEST_DIR"], f"{item}.txt"), "w") as f:
+        f.write(item)
+
+
+def test_render_topics_collects_errors(tmpdir, monkeypatch):
+    monkeypatch.setenv("RENDER_TEST_DIR", str(tmpdir))
+    session = Session()
+
+    failed = render_topics(_write_topic, ["a", "bad", "b", "warn"], session, workers=2)
+
+    assert failed == 2
+    assert len(session.logs["errors"]) == 2
+    assert os.path.isfile(os.path.join(str(tmpdir), "a.txt"))
+    assert os.path.isfile(os.path.join(str(tmpdir), "b.txt"))
+    assert not os.path.isfile(os.path.join(str(tmpdir), "bad.txt"))
+
+
+# set in the test process only, a forked worker would inherit it
+PARENT_STATE = []
+
+
+def _write_parent_state(item, log):
+    with open(os.path.join(os.environ["RENDER_TEST_DIR"], f"{item}.txt"), "w") as f:
+        f.write(str(len(PARENT_STATE)))
+
+
+def test_render_topics_spawns_workers(tmpdir, monkeypatch):
+    monkeypatch.setenv("RENDER_TEST_DIR", str(tmpdir))
+    PARENT_STATE.append("parent")
+
+    try:
+        render_topics(_write_parent_state, ["a", "b"], Session(), workers=2)
+    finally:
+        PARENT_STATE.clear()
+
+    for item in ["a", "b"]:
+        with open(os.path.join(str(tmpdir), f"{item}.txt")) as f:
+            assert f.read() == "0"
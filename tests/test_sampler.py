@@ -0,0 +1,30 @@
+import numpy as np
+from loading._sampler import ReservoirSampler
+
+
+def test_sample_is_reproducible_and_unique():
+    stream = list(range(1000))
+    first = ReservoirSampler.sample_from(stream, 10)
+    second = ReservoirSampler.sample_from(iter([stream[:300], stream[300:]]), 10)
+
+    assert len(first) == 10
+    assert len(set(first)) == 10
+    assert set(first) <= set(stream)
+    assert first == ReservoirSampler.sample_from(stream, 10)
+    assert len(second) == 10
+
+
+def test_sample_smaller_stream_keeps_everything():
+    assert ReservoirSampler.sample_from(["a", "b", "c"], 10) == ["a", "b", "c"]
+
+
+def test_sample_is_uniform():
+    counts = np.zeros(20)
+    for seed in range(2000):
+        sampler = ReservoirSampler(5, seed=seed)
+        for start in range(0, 20, 7):
+            sampler.extend(list(range(start, min(start + 7, 20))))
+        counts[sampler.sample()] += 1
+
+    # every item is kept with probability 5 / 20
+    assert np.allclose(counts / 2000, 0.25, atol=0.05)
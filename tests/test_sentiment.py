@@ -0,0 +1,103 @@
+import os
+import sys
+import types
+import numpy as np
+import pytest
+from util._sentiment import SentimentScorer
+
+
+@pytest.fixture
+def pipeline(word_count_pipeline):
+    """
+    Builds WordCountPipelines whose model takes six tokens.
+    """
+    return lambda: word_count_pipeline(model_max_length=6)
+
+
+def test_chunk_splits_on_token_boundaries(pipeline):
+    scorer = SentimentScorer(sentiment_pipeline=pipeline())
+    chunks, doc_index, lengths = scorer.chunk(["a b", "one two three four five six seven"])
+
+    assert chunks == ["a b", "one two three four", "five six seven"]
+    assert list(doc_index) == [0, 1, 1]
+    assert list(lengths) == [2, 4, 3]
+
+
+def test_score_pools_chunks_per_document(pipeline):
+    word_counts = pipeline()
+    scorer = SentimentScorer(batch_size=2, sentiment_pipeline=word_counts)
+    scores = scorer.score(["a b", "one two three four five six seven", "x"])
+
+    assert np.allclose(scores, [0.2, 0.35, 0.1])
+    # chunks are scored shortest first in a single batched call
+    assert word_counts.calls == [["x", "a b", "five six seven", "one two three four"]]
+
+
+def test_score_with_workers_matches_serial(pipeline):
+    texts = [" ".join(["w"] * (i % 9 + 1)) for i in range(40)]
+
+    serial = SentimentScorer(batch_size=2, sentiment_pipeline=pipeline()).score(texts)
+    parallel = SentimentScorer(
+        batch_size=2, sentiment_pipeline=pipeline(), workers=2
+    ).score(texts)
+
+    assert np.allclose(serial, parallel)
+
+
+class ThreadCountPipeline:
+    """Scores a chunk by the thread cap of the process scoring it."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def __call__(self, texts, batch_size=1, truncation=True):
+        threads = float(os.environ["OMP_NUM_THREADS"])
+        return [{"label": "POSITIVE", "score": threads} for t in texts]
+
+
+def test_workers_start_with_capped_threads(monkeypatch, whitespace_tokenizer):
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    texts = [" ".join(["w"] * (i % 9 + 1)) for i in range(40)]
+
+    pipeline = ThreadCountPipeline(whitespace_tokenizer(model_max_length=6))
+    scores = SentimentScorer(batch_size=2, sentiment_pipeline=pipeline, workers=2).score(texts)
+
+    assert np.all(scores == max(1, (os.cpu_count() or 1) // 2))
+    assert "OMP_NUM_THREADS" not in os.environ
+
+
+def test_chunk_with_workers_only_loads_the_tokenizer(monkeypatch, whitespace_tokenizer):
+    loaded = []
+
+    def from_pretrained(model, revision=None):
+        loaded.append((model, revision))
+        return whitespace_tokenizer(model_max_length=6)
+
+    # stands in for transformers, which the workers need but the parent should not import
+    transformers = types.ModuleType("transformers")
+    transformers.AutoTokenizer = types.SimpleNamespace(from_pretrained=from_pretrained)
+    pipelines = types.ModuleType("transformers.pipelines")
+    pipelines.PIPELINE_REGISTRY = types.SimpleNamespace(
+        get_supported_tasks=lambda: ["sentiment-analysis"],
+        check_task=lambda task: (task, {"default": "distilbert"}, None),
+    )
+    pipelines.get_default_model_and_revision = lambda targeted, framework, options: (
+        targeted["default"],
+        "af0f99b",
+    )
+    monkeypatch.setitem(sys.modules, "transformers", transformers)
+    monkeypatch.setitem(sys.modules, "transformers.pipelines", pipelines)
+
+    def build_pipeline():
+        raise AssertionError("the parent built the model")
+
+    models = [("org/sentiment", ("org/sentiment", None)), ("", ("distilbert", "af0f99b"))]
+    for model, expected in models:
+        scorer = SentimentScorer(model, workers=2)
+        scorer.build_pipeline = build_pipeline
+        chunks, _, _ = scorer.chunk(["a b", "one two three four five six seven"])
+
+        assert chunks == ["a b", "one two three four", "five six seven"]
+        assert loaded[-1] == expected
+        scorer.chunk(["a b"])
+        assert loaded.count(expected) == 1
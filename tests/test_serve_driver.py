@@ -0,0 +1,114 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import numpy as np
+import pytest
+from drivers._serve_driver import ServeDriver
+from util._sentiment import SentimentScorer
+from util._server import make_servers
+
+
+@pytest.fixture
+def serve_driver(stand_in_session, parity_model, word_count_pipeline):
+    """
+    Builds a started ServeDriver over ParityModel, scoring sentiment with WordCountPipeline.
+    """
+
+    def build(session=None, workers=1):
+        driver = ServeDriver(session or stand_in_session())
+        driver._build_sentiment_scorer = lambda: SentimentScorer(
+            sentiment_pipeline=word_count_pipeline(), workers=workers
+        )
+        driver.load("output/model", model=parity_model(probability=0.5))
+        return driver.start(max_batch_size=16, max_latency_ms=5)
+
+    return build
+
+
+def test_label_returns_topic_and_sentiment(serve_driver):
+    driver = serve_driver()
+    results = driver.label(["ab", "a b c", "noise here"])
+    driver.stop()
+
+    # outliers take the label after the last topic, as in labeled_corpus.csv
+    assert [r["topic"] for r in results] == [0, 1, 3]
+    assert [r["topic_label"] for r in results] == ["even", "odd", "noise"]
+    assert np.allclose([r["sentiment"] for r in results], [0.1, 0.3, 0.2])
+    assert results[0]["probability"] == 0.5
+
+
+def _request(connection, method, path, body=None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+class UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def test_http_and_unix_socket(tmpdir, serve_driver):
+    driver = serve_driver()
+    socket_path = os.path.join(str(tmpdir), "bertcli.sock")
+    servers = make_servers(driver, "127.0.0.1", 0, socket_path)
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        port = servers[0].server_address[1]
+        tcp = http.client.HTTPConnection("127.0.0.1", port)
+        status, payload = _request(
+            tcp, "POST", "/label", json.dumps({"documents": ["ab", "abc"]})
+        )
+        assert status == 200
+        assert [r["topic"] for r in payload["results"]] == [0, 1]
+
+        status, payload = _request(tcp, "POST", "/label", json.dumps({"text": "ab"}))
+        assert status == 400
+
+        unix = UnixConnection(socket_path)
+        status, payload = _request(
+            unix, "POST", "/label", json.dumps({"documents": ["noise"]})
+        )
+        assert status == 200
+        assert payload["results"][0]["topic_label"] == "noise"
+
+        status, metrics = _request(unix, "GET", "/metrics")
+        assert status == 200
+        assert metrics["requests"] == 2
+        assert metrics["queue_depth"] == 0
+        assert metrics["latency_ms"]["p99"] is not None
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        driver.stop()
+
+
+def test_serving_is_quiet_uncached_and_single_process(
+    tmpdir, capsys, stand_in_session, serve_driver
+):
+    session = stand_in_session()
+    session.cache_dir = str(tmpdir)
+    encoder = session.topic_model_factory.embedding_model
+    driver = serve_driver(session, workers=4)
+    capsys.readouterr()
+
+    driver.label(["ab", "a b c"])
+    driver.label(["ab"])
+    driver.stop()
+
+    assert driver.scorer.workers == 1
+    assert encoder.progress_bars == [False, False]
+    # request text is not written to the embedding cache
+    assert os.listdir(str(tmpdir)) == []
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,103 @@
+import json
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+
+
+TEXTS = ["a", "bb b", "ccc", "noise dd", "eeeee", "ff", "g g g"]
+
+
+def test_split_round_robins_documents(tmpdir, shard_driver):
+    directory = str(tmpdir)
+    plan = shard_driver(directory, TEXTS).split(f"{directory}/corpus.csv", directory, 3)
+
+    assert plan["shard_documents"] == [3, 2, 2]
+    shard = pd.read_csv(f"{directory}/shards/shard_1.csv")
+    assert shard["text"].tolist() == ["bb b", "eeeee"]
+    assert os.path.isfile(f"{directory}/shards/plan.json")
+
+
+def test_fit_shard_writes_marker_and_skips_done_shards(tmpdir, shard_driver):
+    directory = str(tmpdir)
+    driver = shard_driver(directory, TEXTS)
+    driver.split(f"{directory}/corpus.csv", directory, 2)
+
+    shard_dir = driver.fit_shard(directory, 1)
+    with open(f"{shard_dir}/DONE") as f:
+        marker = json.load(f)
+    assert marker["documents"] == 3
+
+    # a requeued task does not fit the shard again
+    os.remove(f"{shard_dir}/model/model.pkl")
+    driver.fit_shard(directory, 1)
+    assert not os.path.isfile(f"{shard_dir}/model/model.pkl")
+
+
+def test_merge_needs_every_shard(tmpdir, shard_driver):
+    directory = str(tmpdir)
+    driver = shard_driver(directory, TEXTS)
+    driver.split(f"{directory}/corpus.csv", directory, 2)
+    driver.fit_shard(directory, 0)
+
+    with pytest.raises(Exception, match=r"\[1\]"):
+        driver.merge(directory)
+
+
+def test_run_local_writes_a_regular_run(tmpdir, shard_driver):
+    directory = str(tmpdir)
+    driver = shard_driver(directory, TEXTS)
+    driver.run_local(f"{directory}/corpus.csv", directory, 3, workers=2)
+
+    for i in range(3):
+        assert os.path.isfile(f"{directory}/shards/{i}/DONE")
+
+    corpus = pd.read_csv(f"{directory}/labeled_corpus.csv")
+    # documents come back in the order of the data file
+    assert corpus["text"].tolist() == TEXTS
+    # outliers take the label after the last topic of the merged model
+    assert corpus["label"].tolist() == [1, 0, 1, 3, 1, 0, 1]
+    assert corpus["topic_labels"].tolist()[:4] == ["odd", "even", "odd", "noise"]
+    assert "sentiment" in corpus
+    for name in ["run_manifest.json", "topic_size_distribution.csv", "run_profile.json"]:
+        assert os.path.isfile(f"{directory}/{name}")
+
+    with open(f"{directory}/model/model.pkl", "rb") as f:
+        assert pickle.load(f).merged == 3
+
+
+def test_merge_streams_embeddings_through_one_cache(tmpdir, shard_driver):
+    directory = str(tmpdir)
+    driver = shard_driver(directory, TEXTS)
+    driver.session.cache_dir = f"{directory}/cache"
+    factory = driver.session.topic_model_factory
+    factory.embedding_model_name = "length"
+    driver.split(f"{directory}/corpus.csv", directory, 2)
+    driver.fit_shard(directory, 0)
+    driver.fit_shard(directory, 1)
+
+    opened = []
+    open_embedding_cache = factory.open_embedding_cache
+
+    def counting_open(cache_dir):
+        opened.append(cache_dir)
+        return open_embedding_cache(cache_dir)
+
+    factory.open_embedding_cache = counting_open
+    driver.merge(directory)
+
+    assert opened == [f"{directory}/cache"]
+    # the embeddings only live on disk while the outputs are written
+    assert not os.path.isfile(f"{directory}/shards/embeddings.npy")
+    assert driver.session.embeddings is None
+    assert len(pd.read_csv(f"{directory}/labeled_corpus.csv")) == len(TEXTS)
+
+
+def test_merged_runs_project_linearly(tmpdir, shard_driver):
+    driver = shard_driver(str(tmpdir), TEXTS)
+
+    modes = [("auto", "pca"), ("knn", "pca"), ("reduced", "pca"), ("random", "random")]
+    for mode, resolved in modes:
+        driver.session.projection_mode = mode
+        assert driver._resolve_projection_mode(np.zeros((4, 3))) == resolved
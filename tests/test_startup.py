@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+
+# modules that must only be imported once a model is built or a run is visualized
+HEAVY_MODULES = [
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "bertopic",
+    "umap",
+    "hdbscan",
+    "sklearn",
+    "scipy",
+    "matplotlib",
+    "shifterator",
+    "datasets",
+    "peft",
+    "langchain",
+]
+
+# generous bounds, a regression to eager imports costs several seconds and hundreds of MB
+MAX_SECONDS = 5.0
+MAX_RSS_MB = 400
+
+STARTUP = """
+import json, resource, sys, time
+
+start = time.perf_counter()
+sys.path.append("src")
+from src._lnlpcli import LNLPCLI
+from src.menus._landing import Landing
+from util._session import Session
+
+Landing(Session()).display()
+seconds = time.perf_counter() - start
+
+print(json.dumps({
+    "seconds": seconds,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy": [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+
+def measure_startup():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", f"HEAVY = {HEAVY_MODULES!r}\n" + STARTUP],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_landing_menu_does_not_import_backends():
+    assert measure_startup()["heavy"] == []
+
+
+def test_startup_time_and_memory_are_bounded():
+    startup = measure_startup()
+    print(f"time to landing menu: {startup['seconds']:.2f}s, peak RSS: {startup['rss_mb']:.0f}MB")
+
+    assert startup["seconds"] < MAX_SECONDS
+    assert startup["rss_mb"] < MAX_RSS_MB
@@ -0,0 +1,136 @@
+import os
+import numpy as np
+from drivers._sweep_driver import SweepDriver
+from util._sentiment import SentimentScorer
+
+
+def test_expand_grid():
+    driver = SweepDriver()
+    combinations = driver.expand_grid(
+        {
+            "embedding_model": ["all-MiniLM-L6-v2", "sentence-transformers/all-mpnet-base-v2"],
+            "umap_model": [{"umap": {"n_components": 5}}, {"pca": {"n_components": 5}}],
+            "hdbscan_model": {"kmeans": {"n_clusters": 4}},
+            "vectorizer_model": {"min_df": 2},
+        }
+    )
+
+    names = [name for name, _ in combinations]
+    assert len(combinations) == 4
+    assert names[0] == "all-MiniLM-L6-v2_umap_kmeans"
+    assert names[3] == "sentence-transformers-all-mpnet-base-v2_pca_kmeans"
+
+    config = combinations[1][1]
+    assert config["umap_model"] == {"pca": {"n_components": 5}}
+    assert config["hdbscan_model"] == {"kmeans": {"n_clusters": 4}}
+    assert config["vectorizer_model"] == {"min_df": 2}
+    assert config["ctfidf_model"] == {}
+
+
+def test_expand_grid_names_are_unique():
+    driver = SweepDriver()
+    combinations = driver.expand_grid(
+        {"umap_model": [{"pca": {"n_components": 5}}, {"pca": {"n_components": 10}}]}
+    )
+
+    assert [name for name, _ in combinations] == ["default_pca_default", "default_pca_default_1"]
+
+
+class CountingReducer:
+    """Keeps the first n_components columns of the embeddings, and records every fit."""
+
+    def __init__(self, fits, n_components=2):
+        self.fits = fits
+        self.n_components = n_components
+
+    def get_params(self, deep=True):
+        return {"n_components": self.n_components}
+
+    def fit_transform(self, X, y=None):
+        self.fits.append(self.n_components)
+        return self.transform(X)
+
+    def transform(self, X):
+        return np.asarray(X)[:, : self.n_components]
+
+
+class BinningModel:
+    """Clusters documents by their first reduced coordinate, binned into n_clusters topics."""
+
+    def __init__(self, umap_model, n_clusters):
+        self.umap_model = umap_model
+        self.n_clusters = n_clusters
+
+    def fit_transform(self, docs, embeddings=None):
+        self.umap_model.fit(embeddings)
+        reduced = self.umap_model.transform(embeddings)
+        return (reduced[:, 0] % self.n_clusters).astype(int).tolist(), None
+
+    def get_topics(self):
+        return {t: [(f"topic{t}", 1.0)] for t in range(self.n_clusters)}
+
+    def get_topic(self, topic):
+        return self.get_topics().get(topic, False)
+
+    def save(self, path, serialization="safetensors", **kwargs):
+        os.makedirs(path, exist_ok=True)
+
+
+def test_run_grid_shares_embeddings_and_reductions(
+    tmpdir, monkeypatch, stand_in_session, length_encoder, word_count_pipeline
+):
+    monkeypatch.setattr("src.viz._tm_viz.visualize", lambda *args, **kwargs: None)
+    directory = str(tmpdir)
+
+    session = stand_in_session()
+    session.data = [" ".join(["w"] * (i % 5 + 1)) for i in range(12)]
+    session.projection_mode = "pca"
+    factory = session.topic_model_factory
+    encoders = {"mini": length_encoder(dimension=3), "mpnet": length_encoder(dimension=3)}
+    fits = []
+
+    # stands in for the factory, building each combination from its configuration
+    def build_topic_model(from_file=False):
+        config = session.config_topic_model
+        factory.embedding_model_name = config["embedding_model"]
+        factory.embedding_model = encoders[config["embedding_model"]]
+        reducer = CountingReducer(fits, **list(config["umap_model"].values())[0])
+        return BinningModel(reducer, **list(config["hdbscan_model"].values())[0])
+
+    session.build_topic_model = build_topic_model
+
+    driver = SweepDriver(session)
+    driver._build_sentiment_scorer = lambda: SentimentScorer(
+        sentiment_pipeline=word_count_pipeline()
+    )
+
+    projections = {}
+    run_model = driver.run_model
+
+    def recording_run_model(model, output):
+        run_model(model, output)
+        projections[os.path.basename(output)] = driver.session.projection
+
+    driver.run_model = recording_run_model
+    driver.run_grid(
+        {
+            "embedding_model": ["mini", "mpnet"],
+            "umap_model": [{"umap": {"n_components": 2}}, {"pca": {"n_components": 3}}],
+            "hdbscan_model": [{"kmeans": {"n_clusters": 2}}, {"hdbscan": {"n_clusters": 3}}],
+        },
+        directory,
+    )
+
+    # one encoder pass per embedding model and one fit per reducer configuration
+    assert [encoder.batches for encoder in encoders.values()] == [[12], [12]]
+    assert sorted(fits) == [2, 2, 3, 3]
+
+    assert len(projections) == 8
+    for name in projections:
+        assert os.path.isfile(f"{directory}/{name}/labeled_corpus.csv")
+
+    # clusterers on the same reduction share its 2d layout, other reductions lay out again
+    assert projections["mini_umap_kmeans"] is projections["mini_umap_hdbscan"]
+    assert projections["mpnet_pca_kmeans"] is projections["mpnet_pca_hdbscan"]
+    assert projections["mini_umap_kmeans"] is not projections["mini_pca_kmeans"]
+    assert projections["mini_umap_kmeans"] is not projections["mpnet_umap_kmeans"]
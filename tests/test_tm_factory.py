@@ -73,3 +73,48 @@ def test_build_topic_model(sample_data):
     factory.build_ctfidf_model({"bm25_weighting": True})
     topic_model = factory.build_topic_model()
     assert topic_model is not None
+
+
+def test_precomputed_reducer_reuses_reduction():
+    import numpy as np
+    from sklearn.decomposition import PCA
+    from builders._tm_factory import PrecomputedReducer
+
+    embeddings = np.random.default_rng(0).normal(size=(20, 6))
+    reducer = PrecomputedReducer.fit_reducer(PCA(n_components=2), embeddings)
+
+    assert reducer.fit(embeddings) is reducer
+    assert reducer.transform(embeddings) is reducer.reduced
+    assert reducer.transform(embeddings[:3]).shape == (3, 2)
+    assert reducer.components_.shape == (2, 6)
+
+
+def test_cached_reducer_skips_fitting_on_hit(tmpdir):
+    import numpy as np
+    from sklearn.decomposition import PCA
+    from builders._tm_factory import CachedReducer
+
+    embeddings = np.random.default_rng(0).normal(size=(20, 6)).astype(np.float32)
+
+    first = CachedReducer(PCA(n_components=2), str(tmpdir)).fit(embeddings)
+    assert first.key is not None
+
+    def fail(X, y=None):
+        raise AssertionError("the cached reduction should be reused")
+
+    reducer = PCA(n_components=2)
+    reducer.fit_transform = fail
+    second = CachedReducer(reducer, str(tmpdir)).fit(embeddings)
+    assert second.key == first.key
+    assert np.array_equal(second.transform(embeddings), first.reduced)
+
+
+def test_build_partial_fit_models(sample_data):
+    factory = TopicModelFactory()
+    factory.upload_data(sample_data)
+    reducer = factory.build_dim_red_model("incremental pca", {"n_components": 2})
+    cluster_model = factory.build_cluster_model("minibatch kmeans", {"n_clusters": 2})
+    assert hasattr(reducer, "partial_fit")
+    assert hasattr(cluster_model, "partial_fit")
+    assert factory.dimension_reduction_model == reducer
+    assert factory.clustering_model == cluster_model
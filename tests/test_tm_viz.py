@@ -4,7 +4,7 @@ import pandas as pd
 from util._session import Session
 from drivers._tm_driver import TopicDriver
 from util._formatter import DataFormatter
-from viz._tm_viz import visualize, _visualize_topics, _visualize_documents, _visualize_terms,_visualize_word_shifts, _visualize_heatmap_from_df, _visualize_power_danger_structure, _process_dataframe_for_visualization, _safe_read_csv
+from viz._tm_viz import visualize, _visualize_topics, _visualize_documents, _visualize_terms,_visualize_word_shifts, _visualize_heatmap_from_df, _visualize_power_danger_structure, _process_dataframe_for_visualization, _safe_read_csv, _load_labmt, _filter_through_lens
 
 session = Session()
 
@@ -45,3 +45,15 @@ def test_visualize_word_shifts():
     _visualize_word_shifts(session, 'output')
 
     assert os.path.exists("output/topics/0_zipf_wordshift.png")
+
+
+def test_filter_through_lens():
+    labmt = _load_labmt()
+    assert _load_labmt() is labmt
+
+    words = pd.DataFrame({"types": ["laughter", "the", "hate", "notaword"], "counts": [3, 5, 2, 1]})
+    filtered = _filter_through_lens(words, labmt)
+
+    assert filtered["types"].tolist() == ["laughter", "hate"]
+    assert filtered["counts"].tolist() == [3, 2]
+    assert filtered["score"].tolist() == [labmt["laughter"], labmt["hate"]]
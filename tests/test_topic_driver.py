@@ -5,6 +5,9 @@ from bertopic import BERTopic
 from drivers._tm_driver import TopicDriver
 from util._formatter import DataFormatter
 import pandas as pd
+import numpy as np
+from sklearn.decomposition import PCA
+from util._session import Session
 
 def test_save_zipf_distribution(tmpdir):
     driver = TopicDriver()
@@ -113,3 +116,58 @@ def test_map_topics_to_documents(tmpdir):
     assert session_data.shape == (10, 2)
     assert embeddings.shape == (10, 384)
 
+def test_reduce_embeddings_projection_modes(tmpdir):
+    embeddings = np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+
+    driver = TopicDriver()
+    driver.session = Session()
+
+    for mode in ["pca", "random"]:
+        driver.session.projection = None
+        driver.session.projection_mode = mode
+        reduced_embeddings = driver._reduce_embeddings_dimensions(embeddings)
+        assert reduced_embeddings.shape == (50, 2)
+        assert list(reduced_embeddings.columns) == ["x", "y"]
+
+def test_reduce_embeddings_reuses_fitted_reducer(tmpdir):
+    embeddings = np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+    reducer = PCA(n_components=5).fit(embeddings)
+
+    driver = TopicDriver()
+    driver.session = Session()
+    directory = str(tmpdir)
+
+    assert driver._resolve_projection_mode(embeddings, reducer) == "reduced"
+    reduced_embeddings = driver._reduce_embeddings_dimensions(embeddings, reducer, directory)
+
+    assert reduced_embeddings.shape == (50, 2)
+    assert os.path.isfile(f"{directory}/projection_2d.npy")
+    assert np.allclose(np.load(f"{directory}/projection_2d.npy"), reduced_embeddings.values)
+
+def test_broadcast_duplicates_weights_zipf(tmpdir):
+    driver = TopicDriver()
+    driver.session = Session(data=["a b", "c", "a  b", "A b"])
+    driver.session.deduplicate("exact")
+    assert driver.session.data == ["a b", "c"]
+
+    session_data = pd.DataFrame({"text": driver.session.data, "label": [0, 1]})
+    corpus, weights = driver._broadcast_duplicates(session_data)
+
+    assert corpus["text"].tolist() == ["a b", "c", "a  b", "A b"]
+    assert corpus["dup_group"].tolist() == [0, 1, 0, 0]
+    assert corpus["weight"].tolist() == [3, 1, 3, 3]
+    assert weights.tolist() == [3, 1]
+    assert "weight" not in session_data
+
+    directory = str(tmpdir)
+    driver._save_zipf_distribution(session_data, directory, DataFormatter(), weights)
+    zipf = pd.read_csv(f"{directory}/topics/0_zipf.csv")
+    assert zipf.set_index("types")["counts"].to_dict() == {"a": 3, "b": 3}
+
+def test_broadcast_duplicates_rejects_resampled_data():
+    driver = TopicDriver()
+    driver.session = Session(data=["a b", "c", "a  b", "A b"])
+    driver.session.deduplicate("exact")
+
+    with pytest.raises(Exception, match="deduplicate it again"):
+        driver._broadcast_duplicates(pd.DataFrame({"text": ["c"], "label": [0]}))
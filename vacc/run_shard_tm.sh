@@ -0,0 +1,14 @@
+#!/bin/sh
+
+#shard and merge topic modeling for corpora too large for a single run_tm.sh allocation
+#usage: ./run_shard_tm.sh <num_shards> --data=<file> --save_dir=<dir> [--tmconfig=<file>]
+#the jobs only coordinate through files under <save_dir>/shards: a requeued fit task skips
+#its shard once it is done, and merge lists the shards that are still missing
+num_shards=$1
+shift
+
+split=$(sbatch --parsable --job-name=nllp-split run_tm.sh --shard=split --num_shards=$num_shards "$@")
+#one array task per shard, each in its own run_tm.sh allocation
+fit=$(sbatch --parsable --dependency=afterok:$split --array=0-$((num_shards - 1)) --job-name=nllp-fit run_tm.sh --shard=fit "$@")
+#merging only reassigns documents, but holds the labeled corpus of every shard
+sbatch --dependency=afterok:$fit --mem=64G --time=6:00:00 --job-name=nllp-merge run_tm.sh --shard=merge "$@"
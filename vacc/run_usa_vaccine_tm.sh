@@ -5,11 +5,13 @@ save_dir="output"
 data="tests/test_data/usa-vaccine-comments.csv"
 num_samples=5000
 #example sweep over LLMs, Dim Red algos, and Clustering algos with default sklearn parameters
+#all combinations run in a single job, embedding once per LLM and reducing once per Dim Red algo
+sweep=""
 for i in $(seq 1 6); do
     for j in $(seq 1 3); do
         for k in $(seq 1 3); do
-            sequence="1,1${i},2${j},3${k},9"
-            sbatch -N1 -n1 run_tm.sh $save_dir"/${sequence}" $data $num_samples $sequence &
+            sweep="${sweep}1,1${i},2${j},3${k},9;"
         done
     done
-done
\ No newline at end of file
+done
+sbatch -N1 -n1 --time=12:00:00 run_tm.sh --save_dir=$save_dir --data=$data --num_samples=$num_samples --sweep="$sweep"